@@ -1,20 +1,221 @@
-from django.contrib import admin
-from .models import Metric
+"""
+Admin for the (large) Metric table.
+
+Every changelist query is bounded: the row count is estimated or capped,
+the workflow/branch filter choices and the date drill-down come from the
+small day-rollup table instead of DISTINCT scans over Metric, and the
+actions work through the selection in fixed-size chunks.
+"""
+
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Max, Min, QuerySet
+from django.http import StreamingHttpResponse
+from django.utils.functional import cached_property
+
+from . import caching, rollups, stats
+from .models import Metric, MetricRollup
+
+# Chunk size of the bulk actions
+ACTION_CHUNK = 1000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator whose count never scans the table.
+
+    An exact count of at most ``cap`` + 1 rows comes first, so small and
+    filtered result sets are counted exactly and a broad filter shows "cap"
+    results rather than counting millions. Only an unfiltered changelist
+    past the cap falls back to the planner's row estimate (PostgreSQL) or
+    the id span (other databases), both O(1).
+    """
+
+    cap = 10000
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        probed = qs.order_by()[:self.cap + 1].count()
+        if probed <= self.cap:
+            return probed
+        if not qs.query.where:
+            return max(_estimate_rows(qs), self.cap)
+        return self.cap
+
+
+def _estimate_rows(qs):
+    connection = connections[qs.db]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [qs.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= 0:
+            return row[0]
+    # MIN/MAX of the primary key are single index lookups
+    span = qs.order_by().aggregate(lo=Min("pk"), hi=Max("pk"))
+    return 0 if span["lo"] is None else span["hi"] - span["lo"] + 1
+
+
+class RollupDatesQuerySet(QuerySet):
+    """
+    Metric queryset whose datetimes() (used by the date_hierarchy
+    drill-down) reads the day rollups instead of truncating every row.
+
+    Only the date range of the filtered rows is taken from Metric (MIN/MAX
+    on the created_at index); a listed period can therefore hold rows that
+    other changelist filters exclude.
+    """
+
+    def datetimes(self, field_name, kind, order="ASC", tzinfo=None):
+        if field_name != "created_at" or kind not in ("year", "month", "day"):
+            return super().datetimes(field_name, kind, order, tzinfo)
+        span = self.aggregate(first=Min("created_at"), last=Max("created_at"))
+        if span["first"] is None:
+            return []
+        return MetricRollup.objects.filter(
+            granularity=rollups.DAY,
+            bucket__gte=rollups.floor_bucket(span["first"], rollups.DAY),
+            bucket__lte=span["last"],
+        ).datetimes("bucket", kind, order, tzinfo)
+
+
+class RollupValueFilter(admin.SimpleListFilter):
+    """Filter whose choices are the distinct values in the day rollups."""
+
+    def lookups(self, request, model_admin):
+        values = (
+            MetricRollup.objects.filter(granularity=rollups.DAY)
+            .exclude(**{self.parameter_name: ""})
+            .order_by(self.parameter_name)
+            .values_list(self.parameter_name, flat=True)
+            .distinct()
+        )
+        return [(value, value) for value in values]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class WorkflowFilter(RollupValueFilter):
+    title = "workflow"
+    parameter_name = "workflow"
+
+
+class BranchFilter(RollupValueFilter):
+    title = "branch"
+    parameter_name = "branch"
 
 
-@admin.register(Metric)
 class MetricAdmin(admin.ModelAdmin):
     list_display = (
         "created_at",
         "source",
         "workflow",
         "branch",
-        "lce",    # Layer Cache Efficiency
-        "prt",    # Pipeline Recovery Time
-        "smo",    # Secrets Mgmt Overhead
-        "dept",   # Dynamic Env Provisioning Time
-        "clbc",   # Cross-Layer Build Consistency
+        "run_id",
+        "lce",
+        "prt",
+        "smo",
+        "dept",
+        "clbc",
+        "app_lat",
     )
-    list_filter = ("source", "workflow", "branch", "created_at")
-    search_fields = ("run_id", "branch", "commit_sha", "notes")
+    list_filter = ("source", WorkflowFilter, BranchFilter)
+    date_hierarchy = "created_at"  # bench_metric_created index
+    # Exact / prefix lookups only; "contains" would scan every row
+    search_fields = ("=run_id", "=commit_sha", "^branch")
     ordering = ("-created_at",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ("export_csv", "delete_in_chunks")
+
+    # lce, prt, ... columns showing the long-named model fields (METRIC_FIELDS)
+    @admin.display(description="LCE", ordering="layer_cache_efficiency")
+    def lce(self, obj):
+        return obj.layer_cache_efficiency
+
+    @admin.display(description="PRT", ordering="pipeline_recovery_time")
+    def prt(self, obj):
+        return obj.pipeline_recovery_time
+
+    @admin.display(description="SMO", ordering="secrets_mgmt_overhead")
+    def smo(self, obj):
+        return obj.secrets_mgmt_overhead
+
+    @admin.display(description="DEPT", ordering="dynamic_env_time")
+    def dept(self, obj):
+        return obj.dynamic_env_time
+
+    @admin.display(description="CLBC", ordering="cross_layer_consistency")
+    def clbc(self, obj):
+        return obj.cross_layer_consistency
+
+    @admin.display(description="APP_LAT", ordering="app_latency")
+    def app_lat(self, obj):
+        return obj.app_latency
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        return RollupDatesQuerySet(model=qs.model, query=qs.query, using=qs._db)
+
+    def get_actions(self, request):
+        # The stock delete action loads every selected object (and its
+        # related rows) into memory for the confirmation page.
+        actions = super().get_actions(request)
+        actions.pop("delete_selected", None)
+        return actions
+
+    @admin.action(description="Export selected metrics as CSV")
+    def export_csv(self, request, queryset):
+        from . import export
+
+        response = StreamingHttpResponse(
+            export.stream(queryset, "csv", chunk_size=ACTION_CHUNK),
+            content_type=export.CONTENT_TYPES["csv"],
+        )
+        response["Content-Disposition"] = 'attachment; filename="metrics.csv"'
+        return response
+
+    @admin.action(description="Delete selected metrics (in chunks)", permissions=["delete"])
+    def delete_in_chunks(self, request, queryset):
+        deleted, last = 0, 0
+        touched = set()
+        ids = queryset.order_by("pk").values_list("pk", flat=True)
+        while True:
+            chunk = list(ids.filter(pk__gt=last)[:ACTION_CHUNK])
+            if not chunk:
+                break
+            doomed = Metric.objects.filter(pk__in=chunk)
+            touched.update(
+                (source, workflow, branch, rollups.floor_bucket(created_at, rollups.MINUTE))
+                for source, workflow, branch, created_at in doomed.order_by().values_list(
+                    "source", "workflow", "branch", "created_at")
+            )
+            with transaction.atomic():
+                doomed.delete()
+            deleted += len(chunk)
+            last = chunk[-1]
+
+        if deleted:
+            # Only the buckets that held deleted rows are regrouped
+            with transaction.atomic():
+                rollups.refresh(touched)
+                stats.refresh({(source, workflow, created_at)
+                               for source, workflow, _branch, created_at in touched})
+                caching.bump_version()
+        self.message_user(
+            request,
+            f"Deleted {deleted} metrics and updated the rollups and sketches. Regression "
+            "baselines still include them until `manage.py rebuild_rollups --baselines` runs.",
+            messages.SUCCESS,
+        )
+
+
+admin.site.register(Metric, MetricAdmin)
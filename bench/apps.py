@@ -1,5 +1,49 @@
 from django.apps import AppConfig
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_migrate
+
+
+def backfill_derived_tables(sender, apps=None, using=DEFAULT_DB_ALIAS, verbosity=1, **kwargs):
+    """
+    Build the sketches and regression baselines of existing metrics.
+
+    Their tables (migrations 0010 and 0011) start out empty on a database
+    that already holds metrics: without this, percentiles are empty and
+    regression detection starts cold until someone rebuilds them by hand.
+    Runs after ``migrate``, and does something only while a table is empty.
+    """
+    if using != DEFAULT_DB_ALIAS:
+        return
+    if apps is None:  # sent by flush, on a fully migrated database
+        from django.apps import apps
+    try:  # the historical models: the tables may not exist yet
+        empty = [
+            name for name in ("MetricSketch", "MetricBaseline")
+            if not apps.get_model("bench", name).objects.exists()
+        ]
+    except LookupError:
+        return
+    if not empty or not apps.get_model("bench", "Metric").objects.exists():
+        return
+
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+
+    from . import regressions, stats
+
+    executor = MigrationExecutor(connection)
+    if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+        return  # migrated part way: the rebuilds use the current models
+    for name, rebuild in (("MetricSketch", stats.rebuild), ("MetricBaseline", regressions.rebuild)):
+        if name in empty:
+            if verbosity:
+                print(f"Backfilling {name} from the existing metrics")
+            rebuild()
+
 
 class BenchConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "bench"
+
+    def ready(self):
+        post_migrate.connect(backfill_derived_tables, sender=self)
@@ -0,0 +1,290 @@
+"""
+Columnar archive files for raw Metric rows past their retention window.
+
+bench.retention moves old rows out of the database into segment files
+under BENCH_ARCHIVE_DIR/<source>/, one or more per UTC day:
+
+    <YYYY-MM-DD>-<first id>-<last id>.bma
+
+A segment is a small JSON header followed by one block per column.
+Numeric columns (id, created_at as epoch microseconds, the metrics) are
+raw little-endian int64/float64 arrays, 8-byte aligned, read through mmap
+and memoryview.cast() without copying. Text columns (workflow, run_id, ...)
+are zlib-compressed JSON lists, decoded only when a row is materialized.
+
+Readers work a day at a time and yield rows in (created_at, id) order,
+shaped like ``Metric.objects.values(*FIELDS)`` rows, so the read APIs can
+merge them with database rows.
+"""
+
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Q
+
+from .filters import FILTER_PARAMS, parse_time
+from .models import METRIC_FIELDS, RetentionState
+
+MAGIC = b"BMA1"
+SUFFIX = ".bma"
+
+TEXT_COLUMNS = ("workflow", "run_id", "run_attempt", "branch", "commit_sha", "notes")
+FLOAT_COLUMNS = tuple(long_key for _, long_key in METRIC_FIELDS)
+# Row fields, as in Metric.objects.values(*FIELDS)
+FIELDS = ("id", "created_at", "source") + TEXT_COLUMNS + FLOAT_COLUMNS
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_ONE_DAY = timedelta(days=1)
+
+
+def archive_dir():
+    return Path(settings.BENCH_ARCHIVE_DIR)
+
+
+def archived_q(field):
+    """
+    Q matching rows whose ``field`` (created_at, bucket, ...) falls before
+    their source's archive horizon, i.e. whose raw rows are archived.
+    """
+    q = Q()
+    for source, before in RetentionState.objects.values_list("source", "archived_before"):
+        q |= Q(source=source, **{f"{field}__lt": before})
+    return q
+
+
+def horizon(source=None):
+    """Latest archive horizon of ``source`` (any source if None), or None."""
+    qs = RetentionState.objects.all()
+    if source:
+        qs = qs.filter(source=source)
+    return max(qs.values_list("archived_before", flat=True), default=None)
+
+
+def covers(source=None, start=None):
+    """Whether a window starting at ``start`` reaches archived rows of ``source``."""
+    before = horizon(source)
+    return before is not None and (start is None or start < before)
+
+
+def _micros(dt):
+    return (dt - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(us):
+    return _EPOCH + timedelta(microseconds=us)
+
+
+def _numeric(typecode, values):
+    data = array(typecode, values)
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def write_segment(source, day, rows):
+    """
+    Write ``rows`` (values() dicts of one source and UTC ``day``, sorted by
+    created_at, id) as a segment; returns its path.
+
+    A segment with the same id range already on disk (from an earlier run
+    that stopped before deleting the rows) is left as it is.
+    """
+    path = archive_dir() / source / f"{day:%Y-%m-%d}-{rows[0]['id']}-{rows[-1]['id']}{SUFFIX}"
+    if path.exists():
+        return path
+
+    blocks = [
+        ("id", "q", _numeric("q", [r["id"] for r in rows])),
+        ("created_at", "q", _numeric("q", [_micros(r["created_at"]) for r in rows])),
+    ]
+    blocks += [(name, "d", _numeric("d", [r[name] for r in rows])) for name in FLOAT_COLUMNS]
+    blocks += [
+        (name, "z", zlib.compress(json.dumps([r[name] for r in rows]).encode("utf-8"), 6))
+        for name in TEXT_COLUMNS
+    ]
+
+    # Offsets are relative to the end of the (padded) header
+    columns, offset = {}, 0
+    for name, kind, data in blocks:
+        columns[name] = [kind, offset, len(data)]
+        offset += len(data) + (-len(data) % 8)
+    header = json.dumps({"rows": len(rows), "columns": columns}).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(MAGIC + struct.pack("<I", len(header)) + header)
+        for _name, _kind, data in blocks:
+            fh.write(data + b"\0" * (-len(data) % 8))
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+class Segment:
+    """Read access to one segment file (use as a context manager)."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.source = self.path.parent.name
+        with open(self.path, "rb") as fh:
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:4] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{self.path} is not a metric archive segment")
+        (header_len,) = struct.unpack_from("<I", self._map, 4)
+        header = json.loads(self._map[8:8 + header_len])
+        self._data_start = 8 + header_len
+        self.rows = header["rows"]
+        self._columns = header["columns"]
+        self._views = []
+
+    def column(self, name):
+        """A memoryview ("q"/"d") for numeric columns, a list for text columns."""
+        kind, offset, length = self._columns[name]
+        start = self._data_start + offset
+        if kind == "z":
+            return json.loads(zlib.decompress(self._map[start:start + length]))
+        if sys.byteorder != "little":
+            values = array(kind, self._map[start:start + length])
+            values.byteswap()
+            return values
+        view = memoryview(self._map)[start:start + length].cast(kind)
+        self._views.append(view)
+        return view
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def iter_rows(self, start=None, end=None, filters=None):
+        """values()-style rows within [start, end) matching ``filters``."""
+        ids, times = self.column("id"), self.column("created_at")
+        lo = 0 if start is None else _bisect(times, _micros(start))
+        hi = self.rows if end is None else _bisect(times, _micros(end))
+        if lo >= hi:
+            return
+        text = {name: self.column(name) for name in TEXT_COLUMNS}
+        floats = {name: self.column(name) for name in FLOAT_COLUMNS}
+        for i in range(lo, hi):
+            if filters and any(text[name][i] != value for name, value in filters.items()):
+                continue
+            row = {"id": ids[i], "created_at": _from_micros(times[i]), "source": self.source}
+            for name in TEXT_COLUMNS:
+                row[name] = text[name][i]
+            for name in FLOAT_COLUMNS:
+                row[name] = floats[name][i]
+            yield row
+
+
+def _bisect(values, target):
+    """First index whose value is >= target (values sorted ascending)."""
+    lo, hi = 0, len(values)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if values[mid] < target:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _segment_days(sources):
+    """{day: [paths]} for the segments of ``sources`` (None = all)."""
+    root = archive_dir()
+    if not root.is_dir():
+        return {}
+    days = {}
+    for source_dir in root.iterdir():
+        if not source_dir.is_dir() or (sources and source_dir.name not in sources):
+            continue
+        for path in source_dir.glob(f"*{SUFFIX}"):
+            day = datetime.strptime(path.name[:10], "%Y-%m-%d").replace(tzinfo=dt_timezone.utc)
+            days.setdefault(day, []).append(path)
+    return days
+
+
+def iter_rows(source=None, start=None, end=None, reverse=False, **filters):
+    """
+    Archived rows of ``source`` (all sources if None) in [start, end),
+    oldest first (newest first with ``reverse``). ``filters`` are exact
+    matches on the text columns (workflow, branch, commit_sha, ...).
+    """
+    filters = {name: value for name, value in filters.items() if value}
+    days = _segment_days({source} if source else None)
+    for day in sorted(days, reverse=reverse):
+        if (start is not None and day + _ONE_DAY <= start) or (end is not None and day >= end):
+            continue
+        rows, seen = [], set()
+        for path in days[day]:
+            with Segment(path) as segment:
+                for row in segment.iter_rows(start, end, filters):
+                    # A re-run can archive a row twice if it stopped between
+                    # writing a segment and deleting the rows
+                    if row["id"] not in seen:
+                        seen.add(row["id"])
+                        rows.append(row)
+        rows.sort(key=lambda r: (r["created_at"], r["id"]), reverse=reverse)
+        yield from rows
+
+
+def query(params, reverse=False):
+    """
+    Archived rows matching the filter_metrics() parameters (FILTER_PARAMS,
+    start, end); empty when the window ends after the archive horizon.
+    """
+    source = params.get("source") or None
+    start = parse_time(params.get("start"))
+    end = parse_time(params.get("end"))
+    if not covers(source, start):
+        return iter(())
+    filters = {name: params.get(name) for name in FILTER_PARAMS if name != "source"}
+    return iter_rows(source, start, end, reverse=reverse, **filters)
+
+
+def _key(row):
+    return row["created_at"], row["id"]
+
+
+def newest(rows, limit, source=None, start=None, end=None, after=None, **filters):
+    """
+    Merge archived rows into ``rows``, the newest-first database rows of a
+    query capped at ``limit``; returns the newest ``limit`` of both.
+
+    ``after`` is a keyset cursor (created_at, id): only rows before it
+    count. The archive is only opened when some of its rows can make the
+    cut, i.e. when ``rows`` is short or reaches back past the horizon.
+    """
+    before = horizon(source)
+    if before is None or (start is not None and start >= before):
+        return rows
+    if len(rows) >= limit and rows[limit - 1]["created_at"] >= before:
+        return rows
+    if after is not None:
+        # Whole microseconds: the segment times are epoch microseconds
+        cap = after[0] + timedelta(microseconds=1)
+        end = cap if end is None else min(end, cap)
+    archived = iter_rows(source, start, end, reverse=True, **filters)
+    if after is not None:
+        archived = (row for row in archived if _key(row) < after)
+    return list(islice(heapq.merge(rows, archived, key=_key, reverse=True), limit))
@@ -0,0 +1,82 @@
+"""
+Move legacy core.CICDRun rows into bench.Metric.
+
+CICDRun predates Metric and carries the same metrics under upper-case
+names (plus APP_LAT). Rows are read in primary-key order with iterator()
+and written with store_metrics() one chunk per transaction, so the
+rollups, sketches and regression baselines include them and memory stays
+flat. Each copied row gets run_id "cicdrun-<pk>": the run-key dedupe makes
+a re-run (e.g. after an interruption) skip what was already moved.
+"""
+
+from django.db import transaction
+
+from core.models import CICDRun
+
+from .ingest import VALID_SOURCES, store_metrics
+from .models import Metric
+
+RUN_ID_PREFIX = "cicdrun-"
+
+# CICDRun field -> Metric field
+FIELD_MAP = {
+    "LCE": "layer_cache_efficiency",
+    "PRT": "pipeline_recovery_time",
+    "SMO": "secrets_mgmt_overhead",
+    "DEPT": "dynamic_env_time",
+    "CLBC": "cross_layer_consistency",
+    "APP_LAT": "app_latency",
+    "timestamp": "created_at",
+    "pipeline_ref": "workflow",
+    "commit_sha": "commit_sha",
+}
+
+
+def metric_from_run(run):
+    """Unsaved Metric for a CICDRun, or None if its source is unknown."""
+    source = run.source.strip().lower()
+    if source not in VALID_SOURCES:
+        return None
+    fields = {metric_field: getattr(run, run_field) for run_field, metric_field in FIELD_MAP.items()}
+    return Metric(source=source, run_id=f"{RUN_ID_PREFIX}{run.pk}", run_attempt="1", **fields)
+
+
+def _chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def backfill(chunk_size=2000, delete=False, report=None):
+    """
+    Copy every CICDRun into Metric; with ``delete`` the copied CICDRun rows
+    are deleted in the same transaction. Returns a stats dict.
+    """
+    stats = {"runs": 0, "stored": 0, "already_moved": 0, "skipped": 0, "deleted": 0}
+    rows = CICDRun.objects.order_by("pk").iterator(chunk_size=chunk_size)
+    for runs in _chunked(rows, chunk_size):
+        moved, metrics = [], []
+        for run in runs:
+            metric = metric_from_run(run)
+            if metric is None:
+                stats["skipped"] += 1
+                continue
+            moved.append(run.pk)
+            metrics.append(metric)
+
+        with transaction.atomic():
+            stored = store_metrics(metrics, chunk_size=chunk_size)
+            if delete:
+                stats["deleted"] += CICDRun.objects.filter(pk__in=moved).delete()[0]
+
+        stats["runs"] += len(runs)
+        stats["stored"] += len(stored)
+        stats["already_moved"] += len(metrics) - len(stored)
+        if report:
+            report(stats)
+    return stats
@@ -0,0 +1,164 @@
+"""
+Response caching for the read-only metrics APIs.
+
+Cached responses are keyed by a data version token that is replaced every
+time new metrics are committed (see bench.ingest.store_metrics), so an
+ingest invalidates every cached variant at once without having to know
+which keys exist. Each cached body carries a strong ETag; a poll whose
+If-None-Match matches gets a 304 straight from the cache.
+
+The token lives in a small mmap'd file (BENCH_CACHE_VERSION_PATH) shared
+by every gunicorn worker: a random epoch drawn when the file is created,
+and a counter every bump increments. The responses themselves may stay
+in a per-process cache: an ingest handled by one worker changes the key
+all of them look up. Reading the token is a struct read, no I/O.
+"""
+
+import fcntl
+import hashlib
+import mmap
+import os
+import secrets
+import struct
+import threading
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+
+_VERSION = struct.Struct("<QQ")  # epoch, counter
+
+
+class VersionFile:
+    """The data version token, in a file shared between workers."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _map(self):
+        pid = os.getpid()
+        if self._pid != pid:  # first use, or we are a freshly forked worker
+            with self._lock:
+                if self._pid != pid:
+                    self._open()
+                    self._pid = pid
+        return self._m
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < _VERSION.size:
+                os.ftruncate(self._fd, _VERSION.size)
+                os.pwrite(self._fd, _VERSION.pack(secrets.randbits(64), 0), 0)
+            self._m = mmap.mmap(self._fd, _VERSION.size)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def read(self):
+        epoch, counter = _VERSION.unpack_from(self._map(), 0)
+        return f"{epoch:x}.{counter}"
+
+    def bump(self):
+        m = self._map()
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            epoch, counter = _VERSION.unpack_from(m, 0)
+            _VERSION.pack_into(m, 0, epoch, counter + 1)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+
+_version_file = None
+
+
+def get_version_file():
+    """This process's VersionFile for settings.BENCH_CACHE_VERSION_PATH."""
+    global _version_file
+    if _version_file is None or _version_file.path != settings.BENCH_CACHE_VERSION_PATH:
+        _version_file = VersionFile(settings.BENCH_CACHE_VERSION_PATH)
+    return _version_file
+
+
+def data_version():
+    """Current data version token."""
+    return get_version_file().read()
+
+
+def bump_version():
+    """Invalidate all cached metric responses once the transaction commits."""
+    transaction.on_commit(lambda: get_version_file().bump())
+
+
+def _cache_key(request, version):
+    params = sorted(request.GET.lists())
+    digest = hashlib.sha1(repr((request.path, params)).encode("utf-8")).hexdigest()
+    return f"bench:metrics:resp:{version}:{digest}"
+
+
+def _entry_for(response):
+    """(content, content_type, etag) to cache, or None if not cacheable."""
+    if response.status_code != 200 or response.streaming:
+        return None
+    etag = '"%s"' % hashlib.sha1(response.content).hexdigest()
+    return (response.content, response["Content-Type"], etag)
+
+
+def _respond(request, entry):
+    content, content_type, etag = entry
+    response = HttpResponse(content, content_type=content_type)
+    response["ETag"] = etag
+    response["Cache-Control"] = "no-cache"
+    return get_conditional_response(request, etag=etag, response=response) or response
+
+
+def cached_metrics_view(view):
+    """
+    Cache successful GET responses of ``view`` per path and query string.
+
+    Adds a strong ETag and answers matching If-None-Match with 304.
+    Works for both sync and async views.
+    """
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return await view(request, *args, **kwargs)
+
+            key = _cache_key(request, data_version())
+            entry = await cache.aget(key)
+            if entry is None:
+                response = await view(request, *args, **kwargs)
+                entry = _entry_for(response)
+                if entry is None:
+                    return response
+                await cache.aset(key, entry, settings.BENCH_METRICS_CACHE_TTL)
+            return _respond(request, entry)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view(request, *args, **kwargs)
+
+        key = _cache_key(request, data_version())
+        entry = cache.get(key)
+        if entry is None:
+            response = view(request, *args, **kwargs)
+            entry = _entry_for(response)
+            if entry is None:
+                return response
+            cache.set(key, entry, settings.BENCH_METRICS_CACHE_TTL)
+        return _respond(request, entry)
+
+    return wrapper
@@ -0,0 +1,71 @@
+"""
+Side-by-side comparison of CI/CD sources (GitHub Actions, Jenkins, AWS
+CodePipeline).
+
+Per-source (optionally per-workflow) count, mean, std, min and max come
+from one GROUP BY over the rollup buckets covering the window (see
+bench.rollups.grouped), so the cost depends on the number of buckets, not
+on the number of runs. Every pair of sources is then compared per metric:
+
+* delta          - mean(a) - mean(b)
+* relative_delta - delta / |mean(b)|
+* effect_size    - Cohen's d, delta over the pooled standard deviation
+* better         - which source is better, using the metric's direction
+                   from bench.regressions.WORSE
+"""
+
+import math
+from itertools import combinations
+
+from . import rollups
+from .models import METRIC_FIELDS
+from .regressions import WORSE
+
+
+def _pooled_std(na, sa, nb, sb):
+    dof = na + nb - 2
+    if dof <= 0:
+        return 0.0
+    return math.sqrt(((na - 1) * sa * sa + (nb - 1) * sb * sb) / dof)
+
+
+def _metric_delta(short_key, a, b):
+    ma, mb = a[short_key]["avg"], b[short_key]["avg"]
+    delta = ma - mb
+    pooled = _pooled_std(a["count"], a[short_key]["std"], b["count"], b[short_key]["std"])
+    worse = WORSE[short_key] * delta
+    return {
+        "delta": delta,
+        "relative_delta": delta / abs(mb) if mb else None,
+        "effect_size": delta / pooled if pooled else None,
+        "better": None if not worse else (b["source"] if worse > 0 else a["source"]),
+    }
+
+
+def compare(start=None, end=None, workflow=None, sources=None, by_workflow=False):
+    """
+    Returns {"groups": [...], "comparisons": [...]}.
+
+    ``groups`` holds rollups.grouped() rows; ``comparisons`` one entry per
+    pair of sources (within the same workflow when ``by_workflow``).
+    """
+    group_by = ("source", "workflow") if by_workflow else ("source",)
+    filters = {}
+    if workflow:
+        filters["workflow"] = workflow
+    if sources:
+        filters["source__in"] = sources
+    groups = [g for g in rollups.grouped(group_by, start, end, **filters) if g["count"]]
+
+    comparisons = []
+    for a, b in combinations(groups, 2):
+        if by_workflow and a["workflow"] != b["workflow"]:
+            continue
+        entry = {"a": a["source"], "b": b["source"]}
+        if by_workflow:
+            entry["workflow"] = a["workflow"]
+        entry["metrics"] = {
+            short_key: _metric_delta(short_key, a, b) for short_key, _ in METRIC_FIELDS
+        }
+        comparisons.append(entry)
+    return {"groups": groups, "comparisons": comparisons}
@@ -0,0 +1,37 @@
+"""
+Removal of repeated run submissions.
+
+A (source, workflow, run_id, run_attempt) key identifies one CI run
+attempt; retried POSTs used to store it several times. The oldest row of
+each key is kept. Migration 0012, which adds the unique constraint, has
+its own frozen copy of delete_duplicates().
+"""
+
+from django.db.models import Count, Min
+
+RUN_KEY = ("source", "workflow", "run_id", "run_attempt")
+
+
+def duplicate_groups(model):
+    """Keys stored more than once: [{**key, "n": rows, "keep": lowest id}]."""
+    return list(
+        model.objects.exclude(run_id="")
+        .order_by()
+        .values(*RUN_KEY)
+        .annotate(n=Count("id"), keep=Min("id"))
+        .filter(n__gt=1)
+    )
+
+
+def delete_duplicates(model, chunk=500):
+    """Delete every row of a repeated key except its first; returns rows deleted."""
+    deleted = 0
+    for group in duplicate_groups(model):
+        key = {name: group[name] for name in RUN_KEY}
+        ids = list(
+            model.objects.filter(**key).exclude(id=group["keep"]).values_list("id", flat=True)
+        )
+        for i in range(0, len(ids), chunk):
+            model.objects.filter(id__in=ids[i:i + chunk]).delete()
+        deleted += len(ids)
+    return deleted
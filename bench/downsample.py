@@ -0,0 +1,252 @@
+"""
+Server-side downsampling of metric time series for the dashboard chart.
+
+Two methods, both working on flat columns (one list of x values and one
+list of y values per metric) rather than per-row objects:
+
+* ``lttb`` - Largest-Triangle-Three-Buckets: keeps the points that best
+  preserve the visual shape of each series (peaks and dips survive).
+* ``avg``  - fixed-width time buckets with avg/min/max per bucket.
+
+``avg`` is answered from the rollup buckets (bench.rollups), and so is
+``lttb`` once the window holds more than RAW_ROWS_PER_POINT raw rows per
+requested point: LTTB then runs over the bucket means. Either way the
+rollup granularity is the finest that keeps the read to about
+BUCKETS_PER_POINT buckets per point, so the cost follows ``points``, not
+the number of runs in the window. Window edges are widened to whole
+buckets of that granularity.
+
+x values are epoch milliseconds, ready for a linear Chart.js axis.
+"""
+
+from itertools import repeat
+
+from django.db.models import Max, Min, Sum
+
+from . import archive, rollups
+from .models import METRIC_FIELDS, MetricRollup
+
+METHODS = ("lttb", "avg")
+
+# LTTB reads the raw rows only up to this many per requested point
+RAW_ROWS_PER_POINT = 25
+# Rollup buckets read per requested point, at most (unless even day
+# buckets are more)
+BUCKETS_PER_POINT = 10
+
+
+def _column_rows(qs):
+    fields = ["created_at"] + [long_key for _, long_key in METRIC_FIELDS]
+    return qs.order_by("created_at", "id").values_list(*fields)
+
+
+def _column_appender():
+    xs = []
+    columns = {short_key: [] for short_key, _ in METRIC_FIELDS}
+    appenders = [columns[short_key].append for short_key, _ in METRIC_FIELDS]
+
+    def append(created_at, values):
+        xs.append(created_at.timestamp() * 1000.0)
+        for add, value in zip(appenders, values):
+            add(value)
+
+    return xs, columns, append
+
+
+def load_columns(qs, chunk_size=5000):
+    """Read (created_at, metrics...) columns of ``qs`` oldest first."""
+    xs, columns, append = _column_appender()
+    for created_at, *values in _column_rows(qs).iterator(chunk_size=chunk_size):
+        append(created_at, values)
+    return xs, columns
+
+
+async def aload_columns(qs, chunk_size=5000):
+    """Async version of load_columns()."""
+    xs, columns, append = _column_appender()
+    long_keys = [long_key for _, long_key in METRIC_FIELDS]
+    # values() rather than values_list(): on Django 5.0 the latter runs its
+    # query inside the event loop when iterated with aiterator().
+    rows = qs.order_by("created_at", "id").values("created_at", *long_keys)
+    async for row in rows.aiterator(chunk_size=chunk_size):
+        append(row["created_at"], [row[k] for k in long_keys])
+    return xs, columns
+
+
+def archived_columns(source=None, start=None, end=None):
+    """load_columns() for the archived rows of the window (bench.archive)."""
+    xs, columns, append = _column_appender()
+    long_keys = [long_key for _, long_key in METRIC_FIELDS]
+    for row in archive.iter_rows(source, start, end):
+        append(row["created_at"], [row[k] for k in long_keys])
+    return xs, columns
+
+
+def merge_columns(first, second):
+    """Combine two (xs, columns) pairs into one ordered by x."""
+    (xs, columns), (more_xs, more_columns) = first, second
+    xs = xs + more_xs
+    columns = {key: values + more_columns[key] for key, values in columns.items()}
+    if first[0] and more_xs and first[0][-1] > more_xs[0]:
+        # Sources archived up to different days interleave
+        order = sorted(range(len(xs)), key=xs.__getitem__)
+        xs = [xs[i] for i in order]
+        columns = {key: [values[i] for i in order] for key, values in columns.items()}
+    return xs, columns
+
+
+def lttb(xs, ys, threshold):
+    """Return the indices LTTB keeps when reducing (xs, ys) to ``threshold`` points."""
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex.
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        span = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / span
+        avg_y = sum(ys[avg_start:avg_end]) / span
+
+        ax, ay = xs[a], ys[a]
+        dx, dy = ax - avg_x, avg_y - ay
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs(dx * (ys[j] - ay) - (ax - xs[j]) * dy)
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+def bucket(xs, ys, n_buckets):
+    """Split the x range into ``n_buckets`` equal-width buckets (non-empty only)."""
+    return _bucket(xs, repeat(1), ys, ys, ys, n_buckets)
+
+
+def _bucket(xs, counts, sums, mins, maxs, n_buckets):
+    """bucket() over pre-aggregated points (count, sum, min and max each)."""
+    if not xs:
+        return {"t": [], "v": [], "min": [], "max": []}
+    x0, x1 = xs[0], xs[-1]
+    width = (x1 - x0) / n_buckets or 1.0
+
+    out = {"t": [], "v": [], "min": [], "max": []}
+    current, total, count, lo, hi = None, 0.0, 0, 0.0, 0.0
+    for x, n, y, y_lo, y_hi in zip(xs, counts, sums, mins, maxs):
+        k = min(int((x - x0) / width), n_buckets - 1)
+        if k != current:
+            if count:
+                out["t"].append(x0 + (current + 0.5) * width)
+                out["v"].append(total / count)
+                out["min"].append(lo)
+                out["max"].append(hi)
+            current, total, count, lo, hi = k, 0.0, 0, y_lo, y_hi
+        total += y
+        count += n
+        lo = y_lo if y_lo < lo else lo
+        hi = y_hi if y_hi > hi else hi
+    out["t"].append(x0 + (current + 0.5) * width)
+    out["v"].append(total / count)
+    out["min"].append(lo)
+    out["max"].append(hi)
+    return out
+
+
+def downsample(xs, columns, points, method="lttb"):
+    """Downsample every metric column to about ``points`` points."""
+    series = {}
+    for short_key, ys in columns.items():
+        if method == "avg":
+            series[short_key] = bucket(xs, ys, points)
+        else:
+            keep = lttb(xs, ys, points)
+            series[short_key] = {"t": [xs[i] for i in keep], "v": [ys[i] for i in keep]}
+    return series
+
+
+def use_raw_rows(count, points, method):
+    """Whether a window of ``count`` rows is downsampled from its raw rows."""
+    return method == "lttb" and count <= points * RAW_ROWS_PER_POINT
+
+
+def rollup_granularity(start, end, points):
+    """Finest granularity with at most BUCKETS_PER_POINT * points buckets in [start, end)."""
+    for granularity in rollups.GRANULARITIES:
+        if (end - start) / rollups.STEP[granularity] <= points * BUCKETS_PER_POINT:
+            return granularity
+    return rollups.DAY
+
+
+def _span_query(source):
+    qs = MetricRollup.objects.filter(granularity=rollups.DAY)
+    if source:
+        qs = qs.filter(source=source)
+    return qs, {"first": Min("bucket"), "last": Max("bucket")}
+
+
+def _buckets_query(source, start, end, span, points):
+    """Rollup buckets covering the window, summed over workflows and branches."""
+    if span["first"] is None:
+        return None, None
+    # Clamp an open or oversized window to the days that have data
+    last = span["last"] + rollups.STEP[rollups.DAY]
+    start = max(start, span["first"]) if start else span["first"]
+    end = min(end, last) if end else last
+    granularity = rollup_granularity(start, end, points)
+    qs = MetricRollup.objects.filter(
+        granularity=granularity,
+        bucket__gte=rollups.floor_bucket(start, granularity),
+        bucket__lt=rollups.ceil_bucket(end, granularity),
+    )
+    if source:
+        qs = qs.filter(source=source)
+    aggregates = {"n": Sum("count")}
+    for short_key, _ in METRIC_FIELDS:
+        aggregates[f"{short_key}_sum"] = Sum(f"{short_key}_sum")
+        aggregates[f"{short_key}_min"] = Min(f"{short_key}_min")
+        aggregates[f"{short_key}_max"] = Max(f"{short_key}_max")
+    return qs.values("bucket").annotate(**aggregates).order_by("bucket"), granularity
+
+
+def _rollup_downsample(rows, granularity, points, method):
+    # Each bucket is plotted at its middle
+    half = rollups.STEP[granularity].total_seconds() * 500.0 if rows else 0.0
+    xs = [row["bucket"].timestamp() * 1000.0 + half for row in rows]
+    counts = [row["n"] for row in rows]
+    series = {}
+    for short_key, _ in METRIC_FIELDS:
+        sums = [row[f"{short_key}_sum"] for row in rows]
+        if method == "avg":
+            mins = [row[f"{short_key}_min"] for row in rows]
+            maxs = [row[f"{short_key}_max"] for row in rows]
+            series[short_key] = _bucket(xs, counts, sums, mins, maxs, points)
+        else:
+            ys = [total / n for total, n in zip(sums, counts)]
+            keep = lttb(xs, ys, points)
+            series[short_key] = {"t": [xs[i] for i in keep], "v": [ys[i] for i in keep]}
+    return series
+
+
+def rollup_series(source=None, start=None, end=None, points=400, method="avg"):
+    """downsample() of the window, from the rollup buckets instead of the raw rows."""
+    qs, aggregates = _span_query(source)
+    buckets, granularity = _buckets_query(source, start, end, qs.aggregate(**aggregates), points)
+    rows = [] if buckets is None else list(buckets)
+    return _rollup_downsample(rows, granularity, points, method)
+
+
+async def arollup_series(source=None, start=None, end=None, points=400, method="avg"):
+    """Async version of rollup_series()."""
+    qs, aggregates = _span_query(source)
+    buckets, granularity = _buckets_query(source, start, end, await qs.aaggregate(**aggregates), points)
+    rows = [] if buckets is None else [row async for row in buckets]
+    return _rollup_downsample(rows, granularity, points, method)
@@ -0,0 +1,130 @@
+"""
+Streaming CSV / NDJSON export of Metric rows.
+
+Rows are read with ``values_list().iterator(chunk_size=...)`` and encoded
+one chunk at a time, so memory stays flat no matter how many rows are
+exported. Archived rows (bench.archive) are merged in by time. Used by
+/api/metrics/export and ``manage.py export_metrics``; under ASGI the
+endpoint streams through astream().
+"""
+
+import csv
+import heapq
+import io
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+
+from .models import METRIC_FIELDS, Metric
+
+FORMATS = ("csv", "ndjson")
+
+CONTEXT_COLUMNS = ("source", "workflow", "run_id", "run_attempt", "branch", "commit_sha")
+
+# Column names in the exported files (metric columns use the short keys)
+COLUMNS = (
+    ("id", "t")
+    + CONTEXT_COLUMNS
+    + tuple(short_key for short_key, _ in METRIC_FIELDS)
+    + ("notes",)
+)
+
+_DB_FIELDS = (
+    ("id", "created_at")
+    + CONTEXT_COLUMNS
+    + tuple(long_key for _, long_key in METRIC_FIELDS)
+    + ("notes",)
+)
+
+CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def iter_rows(qs=None, chunk_size=2000, archived=()):
+    """
+    Yield export rows (tuples in COLUMNS order), oldest first.
+
+    ``archived`` is an oldest-first iterable of bench.archive rows to
+    merge with the rows of ``qs``.
+    """
+    qs = Metric.objects.all() if qs is None else qs
+    rows = qs.order_by("created_at", "id").values_list(*_DB_FIELDS).iterator(chunk_size=chunk_size)
+    archived = (tuple(row[name] for name in _DB_FIELDS) for row in archived)
+    for row in heapq.merge(archived, rows, key=lambda r: (r[1], r[0])):
+        yield (row[0], row[1].isoformat()) + row[2:]
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_csv(rows, batch_size=500):
+    """Encode rows as CSV text chunks (header first)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    yield buf.getvalue()
+    for batch in _batched(rows, batch_size):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows(batch)
+        yield buf.getvalue()
+
+
+def iter_ndjson(rows, batch_size=500):
+    """Encode rows as NDJSON text chunks, one object per line."""
+    dumps = json.JSONEncoder(separators=(",", ":")).encode
+    for batch in _batched(rows, batch_size):
+        yield "".join(dumps(dict(zip(COLUMNS, row))) + "\n" for row in batch)
+
+
+def encode(rows, fmt, batch_size=500):
+    if fmt == "csv":
+        return iter_csv(rows, batch_size)
+    if fmt == "ndjson":
+        return iter_ndjson(rows, batch_size)
+    raise ValueError(f"Unknown export format: {fmt!r}")
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of text chunks incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(qs, fmt, gzip=False, chunk_size=2000, archived=()):
+    """Full export pipeline: query (+ archive) -> encode -> optional gzip (bytes)."""
+    chunks = encode(iter_rows(qs, chunk_size, archived), fmt)
+    if gzip:
+        return gzip_chunks(chunks)
+    return (chunk.encode("utf-8") for chunk in chunks)
+
+
+async def astream(qs, fmt, gzip=False, chunk_size=2000, archived=()):
+    """
+    stream() as an async iterator, for the ASGI server.
+
+    Given a sync iterator, Django's ASGI handler reads the whole response
+    into a list before sending it; here each chunk is produced on the
+    request's sync thread (where the query's connection lives) and sent
+    before the next one is read.
+    """
+    chunks = stream(qs, fmt, gzip=gzip, chunk_size=chunk_size, archived=archived)
+    next_chunk = sync_to_async(next)
+    try:
+        # next() with a default: StopIteration can't cross sync_to_async
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
@@ -0,0 +1,40 @@
+"""Query-parameter filters shared by the metric read APIs and commands."""
+
+from datetime import timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+# Exact-match filters accepted by the history and export APIs
+FILTER_PARAMS = ("source", "workflow", "branch", "commit_sha")
+
+
+def parse_time(value):
+    """Parse an ISO-8601 parameter; naive values are taken as UTC."""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid datetime: {value!r}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def filter_metrics(qs, params):
+    """
+    Apply FILTER_PARAMS plus an optional ``start``/``end`` window.
+
+    Raises ValueError for unparsable datetimes.
+    """
+    for name in FILTER_PARAMS:
+        value = params.get(name)
+        if value:
+            qs = qs.filter(**{name: value})
+    start = parse_time(params.get("start"))
+    end = parse_time(params.get("end"))
+    if start:
+        qs = qs.filter(created_at__gte=start)
+    if end:
+        qs = qs.filter(created_at__lt=end)
+    return qs
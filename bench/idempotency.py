@@ -0,0 +1,122 @@
+"""
+Idempotency-Key support for the ingest endpoints.
+
+A client that sends ``Idempotency-Key: <unique string>`` can retry a POST
+safely: the first successful response is kept in the cache for
+BENCH_IDEMPOTENCY_TTL seconds and replayed (with ``Idempotent-Replayed:
+true``) for every retry with the same key, without touching the database.
+While the first request is still running, retries get 409; reusing a key
+with a different body gets 422. Keys are scoped to the caller's API key
+name, so two clients picking the same key don't see each other's
+responses.
+
+Retries can land on another gunicorn worker, so with several workers the
+cache must be shared between them (BENCH_CACHE_DIR; entrypoint.sh sets
+one when BENCH_WORKERS > 1).
+"""
+
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+HEADER = "Idempotency-Key"
+
+# How long a request may hold its key before a retry may run it again
+PENDING_TTL = 60
+
+
+def _cache_key(request, name, key):
+    digest = hashlib.sha1(f"{name}\n{request.path}\n{key}".encode("utf-8")).hexdigest()
+    return f"bench:idem:{digest}"
+
+
+def _fingerprint(request):
+    return hashlib.sha1(request.body).hexdigest()
+
+
+def _replay(entry, fingerprint):
+    """Response for a key that is already taken, or None to run the view."""
+    if entry is None:
+        return None
+    state, entry_fingerprint, *stored = entry
+    if entry_fingerprint != fingerprint:
+        return JsonResponse({"error": f"{HEADER} was already used with a different body"}, status=422)
+    if state == "pending":
+        return JsonResponse({"error": f"A request with this {HEADER} is still in progress"}, status=409)
+    status, content, content_type = stored
+    response = HttpResponse(content, status=status, content_type=content_type)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _done(response, fingerprint):
+    """Cache entry for ``response``, or None if it must not be replayed."""
+    if not 200 <= response.status_code < 300 or response.streaming:
+        return None
+    return ("done", fingerprint, response.status_code, response.content, response["Content-Type"])
+
+
+def idempotent(key_name):
+    """
+    Make a POST view honour the Idempotency-Key header.
+
+    ``key_name(request)`` names the caller's API key, or is None for an
+    unauthenticated caller, who can neither take nor replay a key. Works
+    for sync and async views.
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                key, name = request.headers.get(HEADER), key_name(request)
+                if not key or name is None or request.method != "POST":
+                    return await view(request, *args, **kwargs)
+
+                cache_key, fingerprint = _cache_key(request, name, key), _fingerprint(request)
+                if not await cache.aadd(cache_key, ("pending", fingerprint), PENDING_TTL):
+                    replay = _replay(await cache.aget(cache_key), fingerprint)
+                    if replay is not None:
+                        return replay
+                response = None
+                try:
+                    response = await view(request, *args, **kwargs)
+                finally:
+                    entry = _done(response, fingerprint) if response is not None else None
+                    if entry is None:
+                        await cache.adelete(cache_key)
+                    else:
+                        await cache.aset(cache_key, entry, settings.BENCH_IDEMPOTENCY_TTL)
+                return response
+
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key, name = request.headers.get(HEADER), key_name(request)
+            if not key or name is None or request.method != "POST":
+                return view(request, *args, **kwargs)
+
+            cache_key, fingerprint = _cache_key(request, name, key), _fingerprint(request)
+            if not cache.add(cache_key, ("pending", fingerprint), PENDING_TTL):
+                replay = _replay(cache.get(cache_key), fingerprint)
+                if replay is not None:
+                    return replay
+            response = None
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                entry = _done(response, fingerprint) if response is not None else None
+                if entry is None:
+                    cache.delete(cache_key)
+                else:
+                    cache.set(cache_key, entry, settings.BENCH_IDEMPOTENCY_TTL)
+            return response
+
+        return wrapper
+
+    return decorator
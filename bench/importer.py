@@ -0,0 +1,224 @@
+"""
+Bulk import of historical metrics from JSONL / CSV files (optionally gzipped).
+
+The main process reads the file sequentially and hands fixed-size chunks
+of records to a process pool, where each record is decoded and validated
+with bench.ingest.build_metric (so short and long metric keys work exactly
+as in the ingest API). Parsed chunks come back in file order and are
+written with store_metrics() in large bulk_create batches; the byte offset
+reached is saved in an ImportCheckpoint in the same transaction, so an
+interrupted import resumes where the last committed chunk ended.
+
+JSONL rows are ingest payloads, optionally with the original time in "t"
+(or "created_at"). CSV files use the export_metrics columns.
+"""
+
+import csv
+import gzip
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.db import connections, transaction
+
+from .export import COLUMNS
+from .filters import parse_time
+from .ingest import PayloadError, build_metric, store_metrics
+from .models import ImportCheckpoint
+
+FORMATS = ("jsonl", "csv")
+
+_SUFFIX_FORMATS = {".jsonl": "jsonl", ".ndjson": "jsonl", ".csv": "csv"}
+
+# CSV columns that are not part of an ingest payload
+_CSV_SKIP = {"id", "t"}
+
+
+def detect_format(path):
+    path = Path(path)
+    suffixes = path.suffixes
+    if suffixes and suffixes[-1] == ".gz":
+        suffixes = suffixes[:-1]
+    fmt = _SUFFIX_FORMATS.get(suffixes[-1] if suffixes else "")
+    if fmt is None:
+        raise ValueError(f"Can't tell the format of {path.name}; pass --format")
+    return fmt
+
+
+def _open(path):
+    return gzip.open(path, "rb") if str(path).endswith(".gz") else open(path, "rb")
+
+
+def _fingerprint(path):
+    st = os.stat(path)
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def parse_chunk(fmt, header, records, first):
+    """
+    Decode and validate ``records`` (in a pool worker).
+
+    Returns (metrics, errors) where errors are (record number, message);
+    ``first`` is the number of the first record.
+    """
+    metrics, errors = [], []
+    if fmt == "csv":
+        rows = csv.reader(records)
+        for number, row in enumerate(rows, first):
+            try:
+                if len(row) != len(header):
+                    raise PayloadError(f"expected {len(header)} columns, got {len(row)}")
+                values = dict(zip(header, row))
+                payload = {k: v for k, v in values.items() if k not in _CSV_SKIP and v != ""}
+                metrics.append(build_metric(payload, created_at=parse_time(values.get("t"))))
+            except ValueError as exc:  # PayloadError or a bad timestamp
+                errors.append((number, str(exc)))
+        return metrics, errors
+
+    for number, record in enumerate(records, first):
+        if not record.strip():
+            continue
+        try:
+            payload = json.loads(record)
+            if not isinstance(payload, dict):
+                raise PayloadError("Row must be a JSON object")
+            created_at = parse_time(payload.get("t") or payload.get("created_at"))
+            metrics.append(build_metric(payload, created_at=created_at))
+        except ValueError as exc:  # JSONDecodeError, PayloadError or a bad timestamp
+            errors.append((number, str(exc)))
+    return metrics, errors
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:  # "spawn" start method: a fresh interpreter
+        django.setup()
+
+
+def _records(fh, fmt):
+    """Yield (record text, bytes consumed) from the current position."""
+    pending, size = [], 0
+    for raw in fh:
+        pending.append(raw)
+        size += len(raw)
+        # A CSV record ends where its quotes balance (quoted newlines)
+        if fmt == "csv" and sum(chunk.count(b'"') for chunk in pending) % 2:
+            continue
+        yield b"".join(pending).decode("utf-8"), size
+        pending, size = [], 0
+    if pending:
+        yield b"".join(pending).decode("utf-8"), size
+
+
+def _chunks(fh, fmt, offset, chunk_rows, number):
+    """Yield (records, number of the first record, offset after the chunk)."""
+    records = []
+    for record, size in _records(fh, fmt):
+        records.append(record)
+        offset += size
+        if len(records) >= chunk_rows:
+            yield records, number, offset
+            number += len(records)
+            records = []
+    if records:
+        yield records, number, offset
+
+
+class Importer:
+    """Import one or more files; progress goes to ``report(stats)``."""
+
+    def __init__(self, fmt=None, workers=None, chunk_rows=10000, batch_size=5000,
+                 restart=False, report=None, report_every=2.0):
+        self.fmt = fmt
+        self.workers = max(1, (os.cpu_count() or 2) - 1) if workers is None else workers
+        self.chunk_rows = chunk_rows
+        self.batch_size = batch_size
+        self.restart = restart
+        self.report = report
+        self.report_every = report_every
+
+    def import_file(self, path, pool=None):
+        """Import ``path``; returns a stats dict."""
+        path = Path(path).resolve()
+        fmt = self.fmt or detect_format(path)
+        fingerprint = _fingerprint(path)
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            path=str(path), defaults={"fingerprint": fingerprint},
+        )
+        if self.restart or checkpoint.fingerprint != fingerprint:
+            checkpoint.fingerprint, checkpoint.offset, checkpoint.records = fingerprint, 0, 0
+            checkpoint.save()
+
+        stats = {
+            "file": str(path), "format": fmt, "resumed_at_record": checkpoint.records,
+            "records": 0, "stored": 0, "duplicates": 0, "rejected": 0, "errors": [],
+        }
+        started = last_report = time.monotonic()
+
+        with _open(path) as fh:
+            header = None
+            if fmt == "csv":
+                header_line = fh.readline()
+                header = next(csv.reader([header_line.decode("utf-8")]), None) or list(COLUMNS)
+                checkpoint.offset = max(checkpoint.offset, len(header_line))
+            fh.seek(checkpoint.offset)
+
+            chunks = _chunks(fh, fmt, checkpoint.offset, self.chunk_rows, checkpoint.records + 1)
+            for (metrics, errors), count, end_offset in self._parsed(chunks, fmt, header, pool):
+                with transaction.atomic():
+                    stored = store_metrics(metrics, chunk_size=self.batch_size)
+                    checkpoint.offset = end_offset
+                    checkpoint.records += count
+                    checkpoint.save(update_fields=["offset", "records", "updated_at"])
+
+                stats["records"] += count
+                stats["stored"] += len(stored)
+                stats["duplicates"] += len(metrics) - len(stored)
+                stats["rejected"] += len(errors)
+                stats["errors"].extend(errors[:max(0, 20 - len(stats["errors"]))])
+
+                now = time.monotonic()
+                if self.report and now - last_report >= self.report_every:
+                    self._rate(stats, now - started)
+                    self.report(stats)
+                    last_report = now
+
+        self._rate(stats, time.monotonic() - started)
+        return stats
+
+    @staticmethod
+    def _rate(stats, elapsed):
+        stats["elapsed_s"] = round(elapsed, 3)
+        stats["records_per_s"] = round(stats["records"] / elapsed, 1) if elapsed else None
+
+    def _parsed(self, chunks, fmt, header, pool):
+        """Parse chunks (in ``pool`` if given); yield (result, records, offset) in file order."""
+        if pool is None:
+            for records, first, end_offset in chunks:
+                yield parse_chunk(fmt, header, records, first), len(records), end_offset
+            return
+
+        in_flight = deque()
+        for records, first, end_offset in chunks:
+            future = pool.submit(parse_chunk, fmt, header, records, first)
+            in_flight.append((future, len(records), end_offset))
+            if len(in_flight) >= self.workers * 2:
+                future, count, offset = in_flight.popleft()
+                yield future.result(), count, offset
+        while in_flight:
+            future, count, offset = in_flight.popleft()
+            yield future.result(), count, offset
+
+    def run(self, paths):
+        """Import every path; returns a list of per-file stats."""
+        if self.workers <= 1:
+            return [self.import_file(path) for path in paths]
+        # Forked workers must not share the parent's DB connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+            return [self.import_file(path, pool) for path in paths]
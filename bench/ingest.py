@@ -0,0 +1,201 @@
+"""
+Payload handling shared by the metric ingest endpoints.
+
+CI pipelines may send either the short metric keys (lce, prt, ...) or the
+long names that match the Metric columns; both map onto the same fields.
+"""
+
+import asyncio
+import json
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, connections, transaction
+
+from . import caching, regressions, rollups, stats
+from .dedupe import RUN_KEY
+from .models import METRIC_FIELDS, Metric
+
+# Free-text CI/CD context copied straight from the payload
+CONTEXT_FIELDS = ("workflow", "run_id", "run_attempt", "branch", "commit_sha", "notes")
+
+VALID_SOURCES = {value for value, _label in Metric.SOURCE_CHOICES}
+
+
+class PayloadError(ValueError):
+    """Raised when a single metric payload fails validation."""
+
+
+def get_metric_val(payload, short_key, long_key):
+    """Support both short and long keys in a payload (short key wins)."""
+    if short_key in payload:
+        return payload.get(short_key)
+    if long_key in payload:
+        return payload.get(long_key)
+    return None
+
+
+def build_metric(payload, created_at=None):
+    """
+    Validate one payload dict and return an unsaved Metric.
+
+    ``created_at`` overrides the receive time for rows replayed later.
+    """
+    if not isinstance(payload, dict):
+        raise PayloadError("Row must be a JSON object")
+
+    source = payload.get("source", Metric.SOURCE_GITHUB)
+    if source not in VALID_SOURCES:
+        raise PayloadError(f"Unknown source: {source!r}")
+
+    fields = {"source": source}
+    for name in CONTEXT_FIELDS:
+        value = payload.get(name, "")
+        fields[name] = "" if value is None else str(value)
+
+    for short_key, long_key in METRIC_FIELDS:
+        value = get_metric_val(payload, short_key, long_key)
+        if value is None:
+            continue  # fall back to the model default
+        if isinstance(value, bool):
+            raise PayloadError(f"{short_key} must be a number")
+        try:
+            fields[long_key] = float(value)
+        except (TypeError, ValueError):
+            raise PayloadError(f"{short_key} must be a number") from None
+
+    if created_at is not None:
+        fields["created_at"] = created_at
+    return Metric(**fields)
+
+
+def parse_batch(raw):
+    """
+    Split a batch body into a list of decoded rows.
+
+    Accepts either a JSON array of objects or NDJSON (one object per line).
+    Rows that are not valid JSON are returned as PayloadError instances so
+    the caller can report them per row instead of rejecting the whole batch.
+    """
+    text = raw.strip()
+    if text.startswith("["):
+        rows = json.loads(text)  # malformed arrays are a request-level error
+        return list(rows)
+
+    rows = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except json.JSONDecodeError as exc:
+            rows.append(PayloadError(f"Invalid JSON: {exc.msg}"))
+    return rows
+
+
+def _run_key(metric):
+    return (metric.source, metric.workflow, metric.run_id, metric.run_attempt)
+
+
+def _stored_runs(keys, chunk=500):
+    """run key -> id of the stored row, for the keys that are already stored."""
+    by_workflow = {}
+    for source, workflow, run_id, run_attempt in keys:
+        by_workflow.setdefault((source, workflow), set()).add(run_id)
+
+    found = {}
+    keys = set(keys)
+    for (source, workflow), run_ids in by_workflow.items():
+        run_ids = sorted(run_ids)
+        for i in range(0, len(run_ids), chunk):
+            # One IN list per workflow rather than an OR of full keys: SQLite
+            # only uses the partial unique index for a plain conjunction, and
+            # exclude() repeats its condition.
+            rows = (
+                Metric.objects.exclude(run_id="")
+                .filter(source=source, workflow=workflow, run_id__in=run_ids[i:i + chunk])
+                .order_by()
+                .values_list("id", *RUN_KEY)
+            )
+            for pk, *key in rows:
+                if tuple(key) in keys:
+                    found[tuple(key)] = pk
+    return found
+
+
+def _insert(metrics, chunk_size):
+    """Insert the metrics whose run isn't stored yet; repeats get the stored id."""
+    stored_runs = _stored_runs({_run_key(m) for m in metrics if m.run_id})
+    fresh, repeats, first = [], [], {}
+    for m in metrics:
+        key = _run_key(m) if m.run_id else None
+        if key in stored_runs:
+            m.pk = stored_runs[key]
+        elif key in first:
+            repeats.append((m, first[key]))
+        else:
+            if key is not None:
+                first[key] = m
+            fresh.append(m)
+
+    stored = Metric.objects.bulk_create(fresh, batch_size=chunk_size)
+    for m, original in repeats:
+        m.pk = original.pk
+    return stored
+
+
+def store_metrics(metrics, chunk_size=500):
+    """
+    Insert metrics with chunked bulk_create inside one transaction, fold
+    them into the rollups, sketches and regression baselines and
+    invalidate cached API responses.
+
+    A metric whose (source, workflow, run_id, run_attempt) is already
+    stored is not inserted again; it gets the stored row's id. Returns the
+    metrics that were inserted.
+    """
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                stored = _insert(metrics, chunk_size)
+                rollups.apply(stored)
+                stats.apply(stored)
+                regressions.apply(stored)
+                if stored:
+                    caching.bump_version()
+            return stored
+        except IntegrityError:
+            # A concurrent request stored the same run between our lookup
+            # and insert; the second pass finds it.
+            if attempt:
+                raise
+            for m in metrics:
+                m.pk = None
+                m._state.adding = True
+
+
+async def astore_metrics(metrics, chunk_size=500):
+    """
+    Async version of store_metrics().
+
+    Django's async ORM cannot open transactions and the rollup/sketch
+    updates must commit together with the rows, so the write itself runs in
+    a worker thread; the event loop keeps serving other requests meanwhile.
+    """
+    if connections[Metric.objects.db].vendor != "sqlite":
+        return await sync_to_async(store_metrics)(metrics, chunk_size=chunk_size)
+    # SQLite has a single writer: queue writers of this process on the event
+    # loop rather than letting their threads spin on the database file lock.
+    async with _write_lock():
+        return await sync_to_async(store_metrics)(metrics, chunk_size=chunk_size)
+
+
+_write_locks = weakref.WeakKeyDictionary()
+
+
+def _write_lock():
+    loop = asyncio.get_running_loop()
+    lock = _write_locks.get(loop)
+    if lock is None:
+        lock = _write_locks[loop] = asyncio.Lock()
+    return lock
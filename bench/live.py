@@ -0,0 +1,182 @@
+"""
+Server-Sent Events feed of newly ingested metrics (ASGI only).
+
+One Broadcaster per worker process polls the Metric table for rows newer
+than the last one it has seen (a single indexed ``id > n`` query per tick,
+however many dashboards are connected) and fans each new row out to the
+subscribers whose source filter matches, followed by refreshed aggregates
+for the affected sources. Events are formatted once per tick and shared by
+all subscribers, so server work follows the ingest rate rather than the
+number of viewers.
+
+A subscriber that falls too far behind is dropped; the browser reconnects
+with Last-Event-ID and the missed rows are replayed from the database.
+"""
+
+import asyncio
+import json
+
+from django.conf import settings
+from django.db.models import Max
+
+from . import rollups
+from .models import METRIC_FIELDS, Metric
+
+_FIELDS = ["id", "created_at", "source", "workflow", "branch"] + [
+    long_key for _, long_key in METRIC_FIELDS
+]
+
+QUEUE_SIZE = 1000
+
+
+def format_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
+
+
+def _metric_event(row):
+    data = {
+        "id": row[0],
+        "t": row[1].isoformat(),
+        "source": row[2],
+        "workflow": row[3],
+        "branch": row[4],
+    }
+    for (short_key, _), value in zip(METRIC_FIELDS, row[5:]):
+        data[short_key] = value
+    return format_event("metric", data, event_id=row[0])
+
+
+async def _rows_after(after_id, upto_id=None, source=None, limit=500):
+    qs = Metric.objects.filter(id__gt=after_id)
+    if upto_id is not None:
+        qs = qs.filter(id__lte=upto_id)
+    if source:
+        qs = qs.filter(source=source)
+    qs = qs.order_by("id").values_list(*_FIELDS)[:limit]
+    return [row async for row in qs]
+
+
+class Broadcaster:
+    """Per-process poller that fans new Metric rows out to SSE subscribers."""
+
+    def __init__(self, interval=1.0, batch_size=500):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.last_id = None
+        self._subscribers = {}  # queue -> source filter (None = all)
+        self._task = None
+
+    async def subscribe(self, source=None, after_id=None):
+        """
+        Register a subscriber; returns (queue, backlog events).
+
+        ``after_id`` (from Last-Event-ID) replays rows the client missed.
+        """
+        if self.last_id is None:
+            result = await Metric.objects.aaggregate(last=Max("id"))
+            self.last_id = result["last"] or 0
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subscribers[queue] = source
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+        backlog = []
+        if after_id is not None and after_id < self.last_id:
+            upto = self.last_id
+            while True:
+                rows = await _rows_after(after_id, upto, source, self.batch_size)
+                backlog.extend(_metric_event(row) for row in rows)
+                if len(rows) < self.batch_size:
+                    break
+                after_id = rows[-1][0]
+        return queue, backlog
+
+    def unsubscribe(self, queue):
+        self._subscribers.pop(queue, None)
+
+    async def poll_once(self):
+        """Publish rows ingested since the last poll; returns how many."""
+        rows = await _rows_after(self.last_id, limit=self.batch_size)
+        if not rows:
+            return 0
+        self.last_id = rows[-1][0]
+
+        by_source = {}
+        for row in rows:
+            by_source.setdefault(row[2], []).append(_metric_event(row))
+
+        wanted = set(self._subscribers.values())
+        aggregates = {}
+        for source in wanted:
+            if source is None or source in by_source:
+                data = await rollups.asummary(source=source)
+                aggregates[source] = format_event("aggregates", data)
+
+        for queue, source in list(self._subscribers.items()):
+            # A new list each: the per-source ones are shared
+            if source is None:
+                events = [e for per_source in by_source.values() for e in per_source]
+            else:
+                events = list(by_source.get(source, ()))
+            if not events:
+                continue
+            events.append(aggregates[source])
+            if queue.qsize() + len(events) > QUEUE_SIZE:
+                # Too slow: drop it; the client reconnects and replays.
+                self.unsubscribe(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+                continue
+            for event in events:
+                queue.put_nowait(event)
+        return len(rows)
+
+    async def _run(self):
+        while self._subscribers:
+            published = await self.poll_once()
+            if published < self.batch_size:
+                await asyncio.sleep(self.interval)
+
+
+_broadcasters = {}
+
+
+def get_broadcaster():
+    """The Broadcaster bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    broadcaster = _broadcasters.get(loop)
+    if broadcaster is None:
+        for stale in [l for l in _broadcasters if l.is_closed()]:
+            del _broadcasters[stale]
+        broadcaster = _broadcasters[loop] = Broadcaster(
+            interval=settings.BENCH_LIVE_POLL_INTERVAL,
+        )
+    return broadcaster
+
+
+async def event_stream(source=None, after_id=None, heartbeat=None):
+    """Async generator of SSE text for one dashboard connection."""
+    heartbeat = settings.BENCH_LIVE_HEARTBEAT if heartbeat is None else heartbeat
+    broadcaster = get_broadcaster()
+    queue, backlog = await broadcaster.subscribe(source, after_id)
+    try:
+        yield "retry: 3000\n\n"
+        for event in backlog:
+            yield event
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                return
+            yield event
+    finally:
+        broadcaster.unsubscribe(queue)
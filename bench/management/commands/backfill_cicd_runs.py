@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from bench import backfill
+from core.models import CICDRun
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy legacy core.CICDRun rows into bench.Metric in chunks so every "
+        "read path (aggregates, exports, rollups) only has to query Metric. "
+        "Safe to re-run: rows already copied are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000,
+                            help="Rows read and written per transaction.")
+        parser.add_argument("--delete", action="store_true",
+                            help="Delete each CICDRun row once it is copied.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only report how many rows would be copied.")
+
+    def handle(self, *args, **opts):
+        if opts["dry_run"]:
+            self.stdout.write(f"{CICDRun.objects.count()} CICDRun rows to copy")
+            return
+
+        stats = backfill.backfill(
+            chunk_size=opts["chunk_size"],
+            delete=opts["delete"],
+            report=lambda s: self.stderr.write(f"{s['runs']} runs read, {s['stored']} stored"),
+        )
+        self.stdout.write(
+            f"Copied {stats['stored']} of {stats['runs']} CICDRun rows "
+            f"({stats['already_moved']} already copied, {stats['skipped']} with an "
+            f"unknown source left in place, {stats['deleted']} deleted)"
+        )
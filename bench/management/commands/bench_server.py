@@ -0,0 +1,92 @@
+import json
+import tempfile
+from functools import partial
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import setup_databases, teardown_databases
+
+from bench.perf import loadgen
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the ingest/read/dashboard endpoints, in-process or against a "
+        "live server, and print throughput, latency percentiles and DB queries "
+        "per request as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            help="Base URL of a live server (e.g. http://127.0.0.1:8000). "
+                 "Default: run in-process through the Django test client.",
+        )
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument(
+            "--mix", default="ingest=4,data=4,history=1,dashboard=1",
+            help="Weighted scenarios, e.g. ingest=5,batch=1,data=3,data_points=1,"
+                 "stats=1,history=1,dashboard=1",
+        )
+        parser.add_argument("--payload", choices=loadgen.PAYLOAD_SHAPES, default="short",
+                            help="Metric key style in ingest payloads.")
+        parser.add_argument("--batch-size", type=int, default=100,
+                            help="Rows per request for the batch scenario.")
+        parser.add_argument("--warmup", type=int, default=50,
+                            help="Requests sent before measuring.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--use-configured-db", action="store_true",
+            help="In-process mode: write to the configured database instead of a "
+                 "throwaway benchmark database.",
+        )
+        parser.add_argument("-o", "--output", help="Also write the JSON report here.")
+
+    def handle(self, *args, **opts):
+        try:
+            mix = loadgen.parse_mix(opts["mix"], loadgen.scenarios())
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        run = partial(
+            loadgen.run,
+            mix=mix,
+            requests=opts["requests"],
+            concurrency=opts["concurrency"],
+            shape=opts["payload"],
+            batch_size=opts["batch_size"],
+            warmup=opts["warmup"],
+            seed=opts["seed"],
+        )
+
+        if opts["url"]:
+            report = run(partial(loadgen.HttpTransport, opts["url"]))
+            report["mode"] = "http"
+        elif opts["use_configured_db"]:
+            report = run(loadgen.InProcessTransport)
+            report["mode"] = "in-process"
+        else:
+            report = self._run_on_scratch_db(run)
+            report["mode"] = "in-process"
+
+        text = json.dumps(report, indent=2)
+        if opts["output"]:
+            Path(opts["output"]).write_text(text + "\n")
+        self.stdout.write(text)
+
+    def _run_on_scratch_db(self, run):
+        # A file (not in-memory) database so worker threads contend on the
+        # same locks a real deployment would.
+        with tempfile.TemporaryDirectory() as tmp:
+            test_settings = connections["default"].settings_dict.setdefault("TEST", {})
+            previous = test_settings.get("NAME")
+            test_settings["NAME"] = str(Path(tmp) / "bench_server.sqlite3")
+            # All aliases, so "read" (core.routers) mirrors the scratch database
+            old_config = setup_databases(verbosity=0, interactive=False, aliases=set(connections))
+            try:
+                return run(loadgen.InProcessTransport)
+            finally:
+                teardown_databases(old_config, verbosity=0)
+                test_settings["NAME"] = previous
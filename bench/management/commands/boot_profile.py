@@ -0,0 +1,77 @@
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the app in a fresh interpreter the way entrypoint.sh does "
+        "(python -m core.boot, then the WSGI application) and report the "
+        "time spent in each phase as JSON: interpreter, settings, "
+        "fingerprint check, migrate/collectstatic when their inputs "
+        "changed, django.setup(), the WSGI handler, URLconf and views, and "
+        "the first request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=1,
+                            help="Start this many times and report the median of each phase.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report stale migrate/collectstatic steps instead of running them.")
+        parser.add_argument("--legacy", action="store_true",
+                            help="Also time the unconditional 'manage.py migrate' and "
+                                 "'manage.py collectstatic' the entrypoint used to run.")
+        parser.add_argument("-o", "--output", help="Also write the JSON report here.")
+
+    def handle(self, *args, **opts):
+        runs = []
+        for _ in range(max(1, opts["repeat"])):
+            phases = {}
+            if opts["legacy"]:
+                for step in ("migrate", "collectstatic"):
+                    phases[f"legacy_{step}"] = _timed([sys.executable, "manage.py", step, "--noinput"])
+            started = time.monotonic()
+            proc = subprocess.run(
+                [sys.executable, "-m", "core.boot", "--profile", "--started", repr(started)]
+                + (["--dry-run"] if opts["dry_run"] else []),
+                cwd=settings.BASE_DIR, capture_output=True, text=True,
+            )
+            if proc.returncode:
+                raise CommandError(f"Start failed:\n{proc.stderr}")
+            report = json.loads(proc.stdout)
+            phases.update((p["phase"], p["ms"]) for p in report["phases"])
+            runs.append((phases, report))
+
+        phases = {
+            name: round(statistics.median(run[name] for run, _ in runs if name in run), 1)
+            for name in runs[0][0]
+        }
+        result = {
+            "repeat": len(runs),
+            "phases_ms": phases,
+            "total_ms": round(sum(phases.values()), 1),
+            # Paid by every gunicorn worker without --preload, once by the
+            # master with it (the workers fork after the URLconf is loaded)
+            "worker_import_ms": round(sum(
+                phases[name] for name in ("django_setup", "wsgi_application", "urlconf")
+            ), 1),
+            "steps": runs[-1][1]["steps"],
+            "first_request_status": runs[-1][1]["first_request_status"],
+        }
+
+        text = json.dumps(result, indent=2)
+        if opts["output"]:
+            Path(opts["output"]).write_text(text + "\n")
+        self.stdout.write(text)
+
+
+def _timed(cmd):
+    t0 = time.monotonic()
+    subprocess.run(cmd, cwd=settings.BASE_DIR, check=True, stdout=subprocess.DEVNULL)
+    return round((time.monotonic() - t0) * 1000, 1)
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bench import retention
+from bench.models import Metric
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive raw Metric rows older than BENCH_RETENTION_DAYS to columnar "
+        "files under BENCH_ARCHIVE_DIR and delete them from the database, "
+        "keeping their hour/day aggregates. Works in bounded transactions; "
+        "safe to interrupt and re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000,
+                            help="Rows archived and deleted per transaction.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only report how many rows each source would archive.")
+
+    def handle(self, *args, **opts):
+        policy = retention.policy()
+        if not policy:
+            self.stdout.write("No retention configured (BENCH_RETENTION_DAYS)")
+            return
+
+        if opts["dry_run"]:
+            now = timezone.now()
+            for source, keep_days in policy.items():
+                cutoff = retention.cutoff(keep_days, now)
+                expired = Metric.objects.filter(source=source, created_at__lt=cutoff).count()
+                self.stdout.write(f"{source}: {expired} rows before {cutoff:%Y-%m-%d} to archive")
+            return
+
+        for stats in retention.compact(
+            chunk_size=opts["chunk_size"],
+            report=lambda s: self.stderr.write(f"{s['source']}: {s['archived']} rows archived"),
+        ):
+            self.stdout.write(
+                f"{stats['source']}: archived {stats['archived']} rows before "
+                f"{stats['archived_before'][:10]} into {stats['segments']} segments"
+            )
@@ -0,0 +1,94 @@
+import json
+import tempfile
+from functools import partial
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bench.perf import loadgen, servers
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the same load against gunicorn with sync WSGI workers and with "
+        "uvicorn ASGI workers (same worker count, fresh scratch database "
+        "each) and report both plus the ASGI/WSGI ratios as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1,
+                            help="Gunicorn workers for both servers.")
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=32,
+                            help="Concurrent client connections.")
+        parser.add_argument("--mix", default="ingest=4,data=4,history=1,dashboard=1")
+        parser.add_argument("--payload", choices=loadgen.PAYLOAD_SHAPES, default="short")
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--warmup", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--slow-clients", type=int, default=4,
+                            help="Background clients trickling an ingest body "
+                                 "during the run (0 to disable).")
+        parser.add_argument("--slow-seconds", type=float, default=1.0,
+                            help="How long each slow client takes to send its body.")
+        parser.add_argument("--modes", default="wsgi,asgi",
+                            help=f"Comma-separated subset of {', '.join(servers.MODES)}.")
+        parser.add_argument("-o", "--output", help="Also write the JSON report here.")
+
+    def handle(self, *args, **opts):
+        try:
+            mix = loadgen.parse_mix(opts["mix"], loadgen.scenarios())
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        modes = [m.strip() for m in opts["modes"].split(",") if m.strip()]
+        unknown = [m for m in modes if m not in servers.MODES]
+        if unknown:
+            raise CommandError(f"Unknown mode(s): {', '.join(unknown)}")
+
+        run = partial(
+            loadgen.run,
+            mix=mix,
+            requests=opts["requests"],
+            concurrency=opts["concurrency"],
+            shape=opts["payload"],
+            batch_size=opts["batch_size"],
+            warmup=opts["warmup"],
+            seed=opts["seed"],
+        )
+
+        reports = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            template_db = Path(tmp) / "template.sqlite3"
+            servers.migrate(template_db)
+            for mode in modes:
+                self.stderr.write(f"Benchmarking {mode} ({opts['workers']} workers)...")
+                try:
+                    with servers.serve(mode, opts["workers"], template_db) as url:
+                        with loadgen.SlowClients(url, opts["slow_clients"], opts["slow_seconds"],
+                                                 shape=opts["payload"], seed=opts["seed"]) as slow:
+                            reports[mode] = run(partial(loadgen.HttpTransport, url))
+                        reports[mode]["slow_client_requests"] = slow.completed
+                except RuntimeError as exc:
+                    raise CommandError(str(exc))
+
+        result = {
+            "workers": opts["workers"],
+            "slow_clients": opts["slow_clients"],
+            "servers": reports,
+        }
+        if "wsgi" in reports and "asgi" in reports:
+            wsgi, asgi = reports["wsgi"]["overall"], reports["asgi"]["overall"]
+            result["asgi_vs_wsgi"] = {
+                "throughput_ratio": _ratio(asgi["throughput_rps"], wsgi["throughput_rps"]),
+                "p50_latency_ratio": _ratio(asgi["latency_ms"]["p50"], wsgi["latency_ms"]["p50"]),
+                "p99_latency_ratio": _ratio(asgi["latency_ms"]["p99"], wsgi["latency_ms"]["p99"]),
+            }
+
+        text = json.dumps(result, indent=2)
+        if opts["output"]:
+            Path(opts["output"]).write_text(text + "\n")
+        self.stdout.write(text)
+
+
+def _ratio(a, b):
+    return round(a / b, 3) if a is not None and b else None
@@ -0,0 +1,106 @@
+import json
+import shutil
+import sqlite3
+import tempfile
+from functools import partial
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bench.perf import loadgen, servers
+
+# name -> server environment
+SQLITE_MODES = {
+    # Rollback journal, a connection per request, deferred BEGIN, every
+    # read on "default" (the setup before core.sqlite / core.routers)
+    "stock": {"BENCH_SQLITE_TUNING": "0"},
+    "tuned": {"BENCH_SQLITE_TUNING": "1"},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent ingest and reads against gunicorn twice, with the "
+        "stock SQLite setup and with WAL + busy timeout + the read-only "
+        "alias (BENCH_SQLITE_TUNING), and report both plus the tuned/stock "
+        "ratios as JSON. Errors include 'database is locked' failures."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4,
+                            help="Gunicorn worker processes (writers) for both runs.")
+        parser.add_argument("--server", choices=servers.MODES, default="wsgi")
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=16,
+                            help="Concurrent client connections.")
+        parser.add_argument("--mix", default="ingest=4,batch=1,data=4,data_points=1,dashboard=1")
+        parser.add_argument("--batch-size", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=100)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("-o", "--output", help="Also write the JSON report here.")
+
+    def handle(self, *args, **opts):
+        try:
+            mix = loadgen.parse_mix(opts["mix"], loadgen.scenarios())
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        run = partial(
+            loadgen.run,
+            mix=mix,
+            requests=opts["requests"],
+            concurrency=opts["concurrency"],
+            batch_size=opts["batch_size"],
+            warmup=opts["warmup"],
+            seed=opts["seed"],
+        )
+
+        reports = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            template_db = Path(tmp) / "template.sqlite3"
+            servers.migrate(template_db)
+            for name, env in SQLITE_MODES.items():
+                mode_db = Path(tmp) / f"{name}.sqlite3"
+                shutil.copyfile(template_db, mode_db)
+                # The journal mode is stored in the file; start each run from
+                # the mode it benchmarks.
+                with sqlite3.connect(mode_db) as conn:
+                    conn.execute("PRAGMA journal_mode = " + ("DELETE" if name == "stock" else "WAL"))
+                self.stderr.write(f"Benchmarking {name} SQLite ({opts['workers']} workers)...")
+                try:
+                    with servers.serve(opts["server"], opts["workers"], mode_db, env=env) as url:
+                        reports[name] = run(partial(loadgen.HttpTransport, url))
+                except RuntimeError as exc:
+                    raise CommandError(str(exc))
+
+        stock, tuned = reports["stock"], reports["tuned"]
+        result = {
+            "server": opts["server"],
+            "workers": opts["workers"],
+            "modes": reports,
+            "tuned_vs_stock": {
+                "ok_throughput_ratio": _ratio(
+                    tuned["overall"]["ok_throughput_rps"], stock["overall"]["ok_throughput_rps"],
+                ),
+                "p99_latency_ratio": _ratio(
+                    tuned["overall"]["latency_ms"]["p99"], stock["overall"]["latency_ms"]["p99"],
+                ),
+                "errors": {name: reports[name]["overall"]["errors"] for name in reports},
+                "scenario_ok_throughput_ratio": {
+                    scenario: _ratio(
+                        tuned["scenarios"][scenario]["ok_throughput_rps"],
+                        stock["scenarios"][scenario]["ok_throughput_rps"],
+                    )
+                    for scenario in tuned["scenarios"]
+                },
+            },
+        }
+
+        text = json.dumps(result, indent=2)
+        if opts["output"]:
+            Path(opts["output"]).write_text(text + "\n")
+        self.stdout.write(text)
+
+
+def _ratio(a, b):
+    return round(a / b, 3) if a is not None and b else None
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bench import caching, regressions, rollups, stats
+from bench.dedupe import delete_duplicates, duplicate_groups
+from bench.models import Metric
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete repeated submissions of the same CI run (source, workflow, "
+        "run_id, run_attempt), keeping the first, and rebuild the rollups, "
+        "sketches and regression baselines."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only report how many rows would be deleted.")
+        parser.add_argument(
+            "--rebuild", action="store_true",
+            help="Rebuild the derived tables even if nothing is deleted (e.g. after "
+                 "the migration that adds the unique constraint removed duplicates).",
+        )
+
+    def handle(self, *args, **opts):
+        groups = duplicate_groups(Metric)
+        extra = sum(group["n"] - 1 for group in groups)
+        self.stdout.write(f"{len(groups)} runs stored more than once ({extra} extra rows)")
+        if opts["dry_run"]:
+            return
+
+        with transaction.atomic():
+            deleted = delete_duplicates(Metric)
+            if deleted or opts["rebuild"]:
+                rollups.rebuild()
+                stats.rebuild()
+                regressions.rebuild()
+                caching.bump_version()
+        self.stdout.write(f"Deleted {deleted} rows")
+        if deleted or opts["rebuild"]:
+            self.stdout.write("Rebuilt rollups, sketches and regression baselines")
@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bench import spool
+
+
+class Command(BaseCommand):
+    help = "Replay ingest spool segments into the Metric table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Drain what is currently spooled and exit.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=5000,
+            help="Rows inserted per transaction (default: 5000).",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=1.0,
+            help="Seconds to sleep when the spool is empty (default: 1.0).",
+        )
+        parser.add_argument(
+            "--dir", default=None,
+            help="Spool directory (default: BENCH_INGEST_SPOOL_DIR).",
+        )
+
+    def handle(self, *args, **opts):
+        directory = opts["dir"] or settings.BENCH_INGEST_SPOOL_DIR
+        while True:
+            stored = spool.drain(directory, batch_size=opts["batch_size"])
+            if stored:
+                self.stdout.write(f"Drained {stored} rows from {directory}")
+            if opts["once"]:
+                break
+            if not stored:
+                time.sleep(opts["interval"])
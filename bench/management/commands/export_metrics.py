@@ -0,0 +1,48 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bench import archive, export
+from bench.filters import FILTER_PARAMS, filter_metrics
+from bench.models import Metric
+
+
+class Command(BaseCommand):
+    help = "Stream Metric rows to a CSV or NDJSON file (optionally gzipped)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=export.FORMATS, default="csv")
+        parser.add_argument("--gzip", action="store_true", help="Gzip the output.")
+        parser.add_argument(
+            "-o", "--output", default="-",
+            help="Output file path (default: stdout).",
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        for name in FILTER_PARAMS:
+            parser.add_argument(f"--{name.replace('_', '-')}", dest=name)
+        parser.add_argument("--start", help="ISO datetime (inclusive).")
+        parser.add_argument("--end", help="ISO datetime (exclusive).")
+
+    def handle(self, *args, **opts):
+        try:
+            qs = filter_metrics(Metric.objects.all(), opts)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        chunks = export.stream(
+            qs, opts["format"], gzip=opts["gzip"], chunk_size=opts["chunk_size"],
+            archived=archive.query(opts),
+        )
+        if opts["output"] == "-":
+            out = sys.stdout.buffer
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
+            return
+
+        written = 0
+        with open(opts["output"], "wb") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+                written += len(chunk)
+        self.stderr.write(f"Wrote {written} bytes to {opts['output']}")
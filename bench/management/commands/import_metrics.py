@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bench import importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Import historical metrics from JSONL/NDJSON or CSV files (optionally "
+        ".gz). Parsing runs in a process pool; rows are written in large "
+        "batches and progress is checkpointed, so re-running the command "
+        "resumes an interrupted import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Files to import.")
+        parser.add_argument("--format", choices=importer.FORMATS,
+                            help="Input format (default: from the file extension).")
+        parser.add_argument("--workers", type=int,
+                            help="Parser processes (default: CPU count - 1; 1 parses inline).")
+        parser.add_argument("--chunk-rows", type=int, default=10000,
+                            help="Records per parse chunk and per commit.")
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Rows per bulk_create statement.")
+        parser.add_argument("--restart", action="store_true",
+                            help="Ignore saved progress and start every file from the beginning.")
+
+    def handle(self, *args, **opts):
+        if not opts["format"]:
+            try:
+                for path in opts["paths"]:
+                    importer.detect_format(path)
+            except ValueError as exc:
+                raise CommandError(str(exc))
+
+        run = importer.Importer(
+            fmt=opts["format"],
+            workers=opts["workers"],
+            chunk_rows=opts["chunk_rows"],
+            batch_size=opts["batch_size"],
+            restart=opts["restart"],
+            report=self._progress,
+        )
+        try:
+            results = run.run(opts["paths"])
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        for stats in results:
+            for number, message in stats.pop("errors"):
+                self.stderr.write(f"{stats['file']}: record {number}: {message}")
+            self.stdout.write(json.dumps(stats))
+
+    def _progress(self, stats):
+        self.stderr.write(
+            f"{stats['file']}: {stats['records']} records "
+            f"({stats['records_per_s']} records/s, {stats['stored']} stored)"
+        )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from bench import regressions, rollups, stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the MetricRollup and MetricSketch tables (and, with --baselines, "
+        "the regression baselines) from the raw Metric rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--granularity", action="append", choices=rollups.GRANULARITIES,
+            help="Only rebuild this granularity (repeatable; default: all).",
+        )
+        parser.add_argument(
+            "--baselines", action="store_true",
+            help="Also replay the history through fresh regression baselines "
+                 "(replaces the flagged regressions).",
+        )
+
+    def handle(self, *args, **opts):
+        granularities = opts["granularity"] or rollups.GRANULARITIES
+        created = rollups.rebuild(granularities)
+        self.stdout.write(f"Rebuilt {created} rollup rows ({', '.join(granularities)})")
+        sketches = stats.rebuild(granularities)
+        self.stdout.write(f"Rebuilt {sketches} sketch rows")
+        if opts["baselines"]:
+            flagged = regressions.rebuild()
+            self.stdout.write(f"Rebuilt regression baselines ({flagged} regressions flagged)")
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("bench", "0005_add_short_metric_fields"),
+    ]
+
+    # 0004 renamed the metric columns to their short names, but the Metric
+    # model (and the views) kept using the long names. Rename them back so a
+    # freshly migrated database matches the model.
+    operations = [
+        migrations.RenameField(
+            model_name="metric",
+            old_name="lce",
+            new_name="layer_cache_efficiency",
+        ),
+        migrations.RenameField(
+            model_name="metric",
+            old_name="prt",
+            new_name="pipeline_recovery_time",
+        ),
+        migrations.RenameField(
+            model_name="metric",
+            old_name="smo",
+            new_name="secrets_mgmt_overhead",
+        ),
+        migrations.RenameField(
+            model_name="metric",
+            old_name="dept",
+            new_name="dynamic_env_time",
+        ),
+        migrations.RenameField(
+            model_name="metric",
+            old_name="clbc",
+            new_name="cross_layer_consistency",
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bench', '0007_ingest_spool'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=8)),
+                ('bucket', models.DateTimeField()),
+                ('source', models.CharField(max_length=32)),
+                ('workflow', models.CharField(blank=True, default='', max_length=128)),
+                ('branch', models.CharField(blank=True, default='', max_length=128)),
+                ('count', models.BigIntegerField(default=0)),
+                ('lce_sum', models.FloatField(default=0.0)),
+                ('lce_min', models.FloatField(default=0.0)),
+                ('lce_max', models.FloatField(default=0.0)),
+                ('prt_sum', models.FloatField(default=0.0)),
+                ('prt_min', models.FloatField(default=0.0)),
+                ('prt_max', models.FloatField(default=0.0)),
+                ('smo_sum', models.FloatField(default=0.0)),
+                ('smo_min', models.FloatField(default=0.0)),
+                ('smo_max', models.FloatField(default=0.0)),
+                ('dept_sum', models.FloatField(default=0.0)),
+                ('dept_min', models.FloatField(default=0.0)),
+                ('dept_max', models.FloatField(default=0.0)),
+                ('clbc_sum', models.FloatField(default=0.0)),
+                ('clbc_min', models.FloatField(default=0.0)),
+                ('clbc_max', models.FloatField(default=0.0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'source', 'bucket'], name='bench_rollup_source_bucket'), models.Index(fields=['granularity', 'bucket'], name='bench_rollup_bucket')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='metricrollup',
+            constraint=models.UniqueConstraint(fields=('granularity', 'source', 'workflow', 'branch', 'bucket'), name='bench_rollup_unique_bucket'),
+        ),
+    ]
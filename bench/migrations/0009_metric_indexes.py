@@ -0,0 +1,29 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bench', '0008_metric_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='metric',
+            index=models.Index(fields=['created_at', 'id'], name='bench_metric_created'),
+        ),
+        migrations.AddIndex(
+            model_name='metric',
+            index=models.Index(fields=['source', 'created_at', 'id'], name='bench_metric_src_created'),
+        ),
+        migrations.AddIndex(
+            model_name='metric',
+            index=models.Index(fields=['workflow', 'branch', 'created_at'], name='bench_metric_wf_br_created'),
+        ),
+        migrations.AddIndex(
+            model_name='metric',
+            index=models.Index(fields=['commit_sha'], name='bench_metric_commit'),
+        ),
+    ]
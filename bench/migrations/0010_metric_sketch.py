@@ -0,0 +1,32 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bench', '0009_metric_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=8)),
+                ('bucket', models.DateTimeField()),
+                ('source', models.CharField(max_length=32)),
+                ('workflow', models.CharField(blank=True, default='', max_length=128)),
+                ('count', models.BigIntegerField(default=0)),
+                ('data', models.JSONField(default=dict)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['granularity', 'bucket'], name='bench_sketch_bucket')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='metricsketch',
+            constraint=models.UniqueConstraint(fields=('granularity', 'source', 'workflow', 'bucket'), name='bench_sketch_unique_bucket'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bench', '0010_metric_sketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricBaseline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=32)),
+                ('workflow', models.CharField(blank=True, default='', max_length=128)),
+                ('metric', models.CharField(max_length=8)),
+                ('count', models.BigIntegerField(default=0)),
+                ('mean', models.FloatField(default=0.0)),
+                ('variance', models.FloatField(default=0.0)),
+                ('cusum', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MetricRegression',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('source', models.CharField(max_length=32)),
+                ('workflow', models.CharField(blank=True, default='', max_length=128)),
+                ('metric', models.CharField(max_length=8)),
+                ('value', models.FloatField()),
+                ('baseline_mean', models.FloatField()),
+                ('baseline_std', models.FloatField()),
+                ('score', models.FloatField()),
+                ('detector', models.CharField(choices=[('ewma', 'EWMA z-score'), ('cusum', 'CUSUM shift')], max_length=8)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='metricbaseline',
+            constraint=models.UniqueConstraint(fields=('source', 'workflow', 'metric'), name='bench_baseline_unique_key'),
+        ),
+        migrations.AddField(
+            model_name='metricregression',
+            name='sample',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='regressions', to='bench.metric'),
+        ),
+        migrations.AddIndex(
+            model_name='metricregression',
+            index=models.Index(fields=['source', 'created_at'], name='bench_regr_src_created'),
+        ),
+        migrations.AddIndex(
+            model_name='metricregression',
+            index=models.Index(fields=['created_at'], name='bench_regr_created'),
+        ),
+    ]
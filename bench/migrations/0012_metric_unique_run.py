@@ -0,0 +1,43 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:10
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+RUN_KEY = ("source", "workflow", "run_id", "run_attempt")
+
+
+def remove_duplicate_runs(apps, schema_editor):
+    # The constraint can't be added while repeated runs exist. Rollups and
+    # baselines still count the removed rows: run `manage.py dedupe_metrics
+    # --rebuild` afterwards (or dedupe_metrics before migrating).
+    # A frozen copy of bench.dedupe.delete_duplicates as of this migration.
+    Metric = apps.get_model("bench", "Metric")
+    groups = (
+        Metric.objects.exclude(run_id="")
+        .order_by()
+        .values(*RUN_KEY)
+        .annotate(n=Count("id"), keep=Min("id"))
+        .filter(n__gt=1)
+    )
+    for group in list(groups):
+        key = {name: group[name] for name in RUN_KEY}
+        ids = list(
+            Metric.objects.filter(**key).exclude(id=group["keep"]).values_list("id", flat=True)
+        )
+        for i in range(0, len(ids), 500):
+            Metric.objects.filter(id__in=ids[i:i + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bench', '0011_regression_baselines'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_runs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='metric',
+            constraint=models.UniqueConstraint(condition=models.Q(('run_id', ''), _negated=True), fields=('source', 'workflow', 'run_id', 'run_attempt'), name='bench_metric_unique_run'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bench', '0013_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='metric',
+            name='app_latency',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='metricrollup',
+            name='app_lat_max',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='metricrollup',
+            name='app_lat_min',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='metricrollup',
+            name='app_lat_sum',
+            field=models.FloatField(default=0.0),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:26
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMinute
+
+# Frozen copy of METRIC_FIELDS at this migration
+METRIC_FIELDS = (
+    ("lce", "layer_cache_efficiency"),
+    ("prt", "pipeline_recovery_time"),
+    ("smo", "secrets_mgmt_overhead"),
+    ("dept", "dynamic_env_time"),
+    ("clbc", "cross_layer_consistency"),
+    ("app_lat", "app_latency"),
+)
+
+
+def rebuild_rollups(apps, schema_editor):
+    # Existing buckets have no sums of squares yet; recompute them all
+    # (same GROUP BY as bench.rollups.rebuild, on the historical models).
+    Metric = apps.get_model("bench", "Metric")
+    MetricRollup = apps.get_model("bench", "MetricRollup")
+    MetricRollup.objects.all().delete()
+    for granularity, trunc in (("minute", TruncMinute), ("hour", TruncHour), ("day", TruncDay)):
+        aggregates = {"count": Count("id")}
+        for short_key, long_key in METRIC_FIELDS:
+            aggregates[f"{short_key}_sum"] = Sum(long_key)
+            aggregates[f"{short_key}_min"] = Min(long_key)
+            aggregates[f"{short_key}_max"] = Max(long_key)
+            aggregates[f"{short_key}_sumsq"] = Sum(F(long_key) * F(long_key))
+        rows = (
+            Metric.objects.order_by()
+            .annotate(bucket=trunc("created_at"))
+            .values("source", "workflow", "branch", "bucket")
+            .annotate(**aggregates)
+        )
+        batch = []
+        for row in rows.iterator(chunk_size=2000):
+            batch.append(MetricRollup(granularity=granularity, **row))
+            if len(batch) >= 2000:
+                MetricRollup.objects.bulk_create(batch)
+                batch = []
+        MetricRollup.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bench', '0014_metric_app_latency'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='metricrollup',
+            name='app_lat_sumsq',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='metricrollup',
+            name='clbc_sumsq',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='metricrollup',
+            name='dept_sumsq',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='metricrollup',
+            name='lce_sumsq',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='metricrollup',
+            name='prt_sumsq',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='metricrollup',
+            name='smo_sumsq',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(rebuild_rollups, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,15 @@
 from django.db import models
+from django.utils import timezone
+
+# (short key used in the JSON APIs, long model field name)
+METRIC_FIELDS = (
+    ("lce", "layer_cache_efficiency"),
+    ("prt", "pipeline_recovery_time"),
+    ("smo", "secrets_mgmt_overhead"),
+    ("dept", "dynamic_env_time"),
+    ("clbc", "cross_layer_consistency"),
+    ("app_lat", "app_latency"),
+)
 
 
 class Metric(models.Model):
@@ -13,7 +24,8 @@ class Metric(models.Model):
         (SOURCE_CODEPIPELINE, "AWS CodePipeline"),
     ]
 
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set on ingest; replayed/imported rows keep their original receive time
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     # CI/CD context
     source = models.CharField(
@@ -33,14 +45,247 @@ class Metric(models.Model):
     secrets_mgmt_overhead = models.FloatField(default=0.0)
     dynamic_env_time = models.FloatField(default=0.0)
     cross_layer_consistency = models.FloatField(default=0.0)
+    # Application latency (s), also carried over from core.CICDRun.APP_LAT
+    app_latency = models.FloatField(default=0.0)
 
     notes = models.CharField(max_length=255, blank=True, default="")
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Newest-first reads and (created_at, id) keyset pagination
+            models.Index(fields=["created_at", "id"], name="bench_metric_created"),
+            models.Index(fields=["source", "created_at", "id"], name="bench_metric_src_created"),
+            models.Index(
+                fields=["workflow", "branch", "created_at"],
+                name="bench_metric_wf_br_created",
+            ),
+            models.Index(fields=["commit_sha"], name="bench_metric_commit"),
+        ]
+        constraints = [
+            # One row per CI run attempt; retried submissions are ignored
+            # (see bench.ingest.store_metrics). Rows without a run_id are
+            # not deduplicated.
+            models.UniqueConstraint(
+                fields=["source", "workflow", "run_id", "run_attempt"],
+                condition=~models.Q(run_id=""),
+                name="bench_metric_unique_run",
+            ),
+        ]
 
     def __str__(self):
         return (
             f"{self.created_at:%Y-%m-%d %H:%M:%S} "
             f"[{self.source}] LCE={self.layer_cache_efficiency}"
         )
+
+
+class IngestSpoolCheckpoint(models.Model):
+    """Drain progress for one ingest spool segment (see bench.spool)."""
+
+    segment = models.CharField(max_length=64, unique=True)
+    offset = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.segment} @ {self.offset}"
+
+
+class ImportCheckpoint(models.Model):
+    """Progress of ``manage.py import_metrics`` through one input file."""
+
+    path = models.CharField(max_length=1024, unique=True)
+    # size and mtime of the file when the import started; a changed file
+    # is imported again from the beginning
+    fingerprint = models.CharField(max_length=64)
+    offset = models.BigIntegerField(default=0)  # bytes of (decompressed) input consumed
+    records = models.BigIntegerField(default=0)  # records consumed, rejected ones included
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.path} @ {self.offset}"
+
+
+class RetentionState(models.Model):
+    """
+    How far ``manage.py compact_metrics`` has archived one source.
+
+    Raw rows of ``source`` older than ``archived_before`` (a UTC day
+    boundary) live in the bench.archive files; their hour/day rollups and
+    sketches are kept, minute rollups are dropped.
+    """
+
+    source = models.CharField(max_length=32, unique=True)
+    archived_before = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source} < {self.archived_before:%Y-%m-%d}"
+
+
+class MetricRollup(models.Model):
+    """
+    Pre-aggregated Metric values per (source, workflow, branch, time bucket).
+
+    Maintained incrementally by bench.rollups on ingest; rebuild with
+    ``manage.py rebuild_rollups``.
+    """
+
+    GRANULARITY_MINUTE = "minute"
+    GRANULARITY_HOUR = "hour"
+    GRANULARITY_DAY = "day"
+
+    GRANULARITY_CHOICES = [
+        (GRANULARITY_MINUTE, "Minute"),
+        (GRANULARITY_HOUR, "Hour"),
+        (GRANULARITY_DAY, "Day"),
+    ]
+
+    granularity = models.CharField(max_length=8, choices=GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()
+
+    source = models.CharField(max_length=32)
+    workflow = models.CharField(max_length=128, blank=True, default="")
+    branch = models.CharField(max_length=128, blank=True, default="")
+
+    count = models.BigIntegerField(default=0)
+
+    lce_sum = models.FloatField(default=0.0)
+    lce_min = models.FloatField(default=0.0)
+    lce_max = models.FloatField(default=0.0)
+    lce_sumsq = models.FloatField(default=0.0)  # sum of squares, for the std
+    prt_sum = models.FloatField(default=0.0)
+    prt_min = models.FloatField(default=0.0)
+    prt_max = models.FloatField(default=0.0)
+    prt_sumsq = models.FloatField(default=0.0)
+    smo_sum = models.FloatField(default=0.0)
+    smo_min = models.FloatField(default=0.0)
+    smo_max = models.FloatField(default=0.0)
+    smo_sumsq = models.FloatField(default=0.0)
+    dept_sum = models.FloatField(default=0.0)
+    dept_min = models.FloatField(default=0.0)
+    dept_max = models.FloatField(default=0.0)
+    dept_sumsq = models.FloatField(default=0.0)
+    clbc_sum = models.FloatField(default=0.0)
+    clbc_min = models.FloatField(default=0.0)
+    clbc_max = models.FloatField(default=0.0)
+    clbc_sumsq = models.FloatField(default=0.0)
+    app_lat_sum = models.FloatField(default=0.0)
+    app_lat_min = models.FloatField(default=0.0)
+    app_lat_max = models.FloatField(default=0.0)
+    app_lat_sumsq = models.FloatField(default=0.0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["granularity", "source", "workflow", "branch", "bucket"],
+                name="bench_rollup_unique_bucket",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["granularity", "source", "bucket"],
+                name="bench_rollup_source_bucket",
+            ),
+            models.Index(fields=["granularity", "bucket"], name="bench_rollup_bucket"),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket:%Y-%m-%d %H:%M} [{self.source}] n={self.count}"
+
+
+class MetricSketch(models.Model):
+    """
+    Mergeable value distributions per (source, workflow, time bucket).
+
+    ``data`` maps each metric short key to a serialized bench.stats.Histogram.
+    Maintained on ingest; quantiles over a window merge a handful of rows.
+    """
+
+    granularity = models.CharField(max_length=8, choices=MetricRollup.GRANULARITY_CHOICES)
+    bucket = models.DateTimeField()
+
+    source = models.CharField(max_length=32)
+    workflow = models.CharField(max_length=128, blank=True, default="")
+
+    count = models.BigIntegerField(default=0)
+    data = models.JSONField(default=dict)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["granularity", "source", "workflow", "bucket"],
+                name="bench_sketch_unique_bucket",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["granularity", "bucket"], name="bench_sketch_bucket"),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket:%Y-%m-%d %H:%M} [{self.source}] n={self.count}"
+
+
+class MetricBaseline(models.Model):
+    """
+    Rolling baseline of one metric per (source, workflow).
+
+    Exponentially weighted mean/variance plus a one-sided CUSUM of the
+    standardized deviations; updated per ingested row by bench.regressions.
+    """
+
+    source = models.CharField(max_length=32)
+    workflow = models.CharField(max_length=128, blank=True, default="")
+    metric = models.CharField(max_length=8)  # short key, e.g. "prt"
+
+    count = models.BigIntegerField(default=0)
+    mean = models.FloatField(default=0.0)
+    variance = models.FloatField(default=0.0)
+    cusum = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source", "workflow", "metric"],
+                name="bench_baseline_unique_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"[{self.source}] {self.workflow or '-'} {self.metric} mean={self.mean:.2f} n={self.count}"
+
+
+class MetricRegression(models.Model):
+    """A metric sample that was worse than its baseline allowed."""
+
+    DETECTOR_CHOICES = [
+        ("ewma", "EWMA z-score"),
+        ("cusum", "CUSUM shift"),
+    ]
+
+    # Cleared when the raw row is archived (bench.retention); the fields
+    # below keep the regression readable without it.
+    sample = models.ForeignKey(
+        Metric, on_delete=models.SET_NULL, null=True, related_name="regressions",
+    )
+    created_at = models.DateTimeField()  # copied from the sample
+    source = models.CharField(max_length=32)
+    workflow = models.CharField(max_length=128, blank=True, default="")
+    metric = models.CharField(max_length=8)
+
+    value = models.FloatField()
+    baseline_mean = models.FloatField()
+    baseline_std = models.FloatField()
+    score = models.FloatField()
+    detector = models.CharField(max_length=8, choices=DETECTOR_CHOICES)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["source", "created_at"], name="bench_regr_src_created"),
+            models.Index(fields=["created_at"], name="bench_regr_created"),
+        ]
+
+    def __str__(self):
+        return f"[{self.source}] {self.metric}={self.value} ({self.detector} {self.score:.1f})"
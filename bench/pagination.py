@@ -0,0 +1,62 @@
+"""
+Keyset (cursor) pagination over Metric on (created_at, id).
+
+Pages are fetched with ``WHERE (created_at, id) < cursor ORDER BY
+created_at DESC, id DESC LIMIT n``, which the (created_at, id) and
+(source, created_at, id) indexes answer directly. Unlike OFFSET, page N
+costs the same as page 1.
+"""
+
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class CursorError(ValueError):
+    """Raised for cursors that were not produced by encode_cursor."""
+
+
+def encode_cursor(created_at, pk):
+    raw = json.dumps([created_at.isoformat(), pk], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded))
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, TypeError):
+        raise CursorError("Invalid cursor") from None
+    if created_at is None:
+        raise CursorError("Invalid cursor")
+    return created_at, pk
+
+
+def keyset_page(qs, cursor=None, limit=100, merge=None):
+    """
+    Return (rows, next_cursor) for one newest-first page of ``qs``.
+
+    ``qs`` must be a values() queryset that includes ``id`` and
+    ``created_at``. ``next_cursor`` is None on the last page.
+
+    ``merge(rows, limit, after)``, if given, adds rows from elsewhere (the
+    archive, see bench.archive.newest) older than the ``after`` cursor key
+    and returns the newest ``limit`` of them.
+    """
+    after = None
+    if cursor:
+        after = created_at, pk = decode_cursor(cursor)
+        qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+
+    rows = list(qs.order_by("-created_at", "-id")[: limit + 1])
+    if merge is not None:
+        rows = merge(rows, limit + 1, after=after)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last["created_at"], last["id"])
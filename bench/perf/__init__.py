@@ -0,0 +1,5 @@
+"""
+Self-benchmarks for this app's own ingest and read paths.
+
+See bench.perf.loadgen and ``manage.py bench_server``.
+"""
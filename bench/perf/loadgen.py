@@ -0,0 +1,329 @@
+"""
+Load generator for the ingest, read and dashboard endpoints.
+
+Requests are drawn from a weighted mix of scenarios and sent by a pool of
+worker threads through a transport:
+
+* InProcessTransport - Django test client in this process; also counts the
+  DB queries each request runs (via a connection execute wrapper).
+* HttpTransport      - persistent HTTP connection to a live server
+  (e.g. a local gunicorn), one per worker thread.
+
+``SlowClients`` adds background connections that send their request body
+slowly, to show how the server copes with slow uploaders.
+
+``run()`` returns a JSON-serializable report with throughput and latency
+percentiles per scenario and overall.
+"""
+
+import http.client
+import json
+import random
+import socket
+import threading
+import time
+from contextlib import ExitStack
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.test import Client
+
+from ..models import METRIC_FIELDS, Metric
+
+SOURCES = [value for value, _label in Metric.SOURCE_CHOICES]
+WORKFLOWS = ["ci", "deploy", "nightly"]
+BRANCHES = ["main", "dev", "feature/x"]
+
+PAYLOAD_SHAPES = ("short", "long")
+
+
+def make_payload(rng, shape="short"):
+    """A realistic ingest payload using short or long metric keys."""
+    payload = {
+        "source": rng.choice(SOURCES),
+        "workflow": rng.choice(WORKFLOWS),
+        "run_id": str(rng.randrange(10**9)),
+        "run_attempt": "1",
+        "branch": rng.choice(BRANCHES),
+        "commit_sha": "%040x" % rng.getrandbits(160),
+    }
+    values = {
+        "lce": rng.uniform(0, 100),
+        "prt": rng.lognormvariate(4, 0.6),
+        "smo": rng.uniform(0, 5),
+        "dept": rng.lognormvariate(3.5, 0.5),
+        "clbc": rng.uniform(80, 100),
+        "app_lat": rng.lognormvariate(-1.5, 0.5),
+    }
+    for short_key, long_key in METRIC_FIELDS:
+        payload[short_key if shape == "short" else long_key] = round(values[short_key], 3)
+    return payload
+
+
+def _json_post(path, body):
+    return ("POST", path, json.dumps(body).encode("utf-8"), {
+        "Content-Type": "application/json",
+        "X-Bench-Key": settings.BENCH_API_KEY,
+    })
+
+
+def scenarios(shape="short", batch_size=100):
+    """name -> callable(rng) returning (method, path, body, headers)."""
+    def ingest(rng):
+        return _json_post("/api/metrics/ingest", make_payload(rng, shape))
+
+    def batch(rng):
+        return _json_post(
+            "/api/metrics/ingest/batch",
+            [make_payload(rng, shape) for _ in range(batch_size)],
+        )
+
+    def data(rng):
+        return ("GET", f"/api/metrics/data?source={rng.choice(SOURCES)}", None, {})
+
+    def data_points(rng):
+        return ("GET", f"/api/metrics/data?source={rng.choice(SOURCES)}&points=400", None, {})
+
+    def history(rng):
+        return ("GET", f"/api/metrics/history?source={rng.choice(SOURCES)}", None, {})
+
+    def stats(rng):
+        return ("GET", f"/api/metrics/stats?source={rng.choice(SOURCES)}", None, {})
+
+    def dashboard(rng):
+        return ("GET", "/", None, {})
+
+    return {
+        "ingest": ingest,
+        "batch": batch,
+        "data": data,
+        "data_points": data_points,
+        "history": history,
+        "stats": stats,
+        "dashboard": dashboard,
+    }
+
+
+def parse_mix(text, available):
+    """Parse "ingest=5,data=3" into [(name, weight), ...]."""
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in available:
+            raise ValueError(f"Unknown scenario {name!r} (choose from {', '.join(available)})")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+class InProcessTransport:
+    """Send requests through django.test.Client, counting DB queries."""
+
+    def __init__(self):
+        self.client = Client()
+
+    def request(self, method, path, body, headers):
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        extra = {
+            "HTTP_" + name.upper().replace("-", "_"): value
+            for name, value in headers.items()
+            if name != "Content-Type"
+        }
+        with ExitStack() as stack:
+            # Some views read through the "read" alias (core.routers)
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(count))
+            if method == "POST":
+                response = self.client.post(
+                    path, data=body, content_type=headers.get("Content-Type"), **extra
+                )
+            else:
+                response = self.client.get(path, **extra)
+            size = len(b"".join(response.streaming_content) if response.streaming else response.content)
+        return response.status_code, size, queries
+
+    def close(self):
+        connections.close_all()
+
+
+class HttpTransport:
+    """Persistent HTTP/1.1 connection to a live server."""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        conn_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.conn = conn_cls(parts.hostname, parts.port, timeout=timeout)
+        self.prefix = parts.path.rstrip("/")
+
+    def request(self, method, path, body, headers):
+        try:
+            self.conn.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            size = len(response.read())
+        except (OSError, http.client.HTTPException):
+            self.conn.close()  # reconnect on next request
+            return 0, 0, None
+        return response.status, size, None
+
+    def close(self):
+        self.conn.close()
+
+
+class SlowClients:
+    """
+    Background clients that each trickle an ingest request to a live server
+    over ``seconds`` seconds, again and again, while a benchmark runs.
+
+    A sync worker is tied up reading such a request the whole time; an
+    async server keeps serving other connections meanwhile.
+    """
+
+    def __init__(self, base_url, clients, seconds=1.0, shape="short", seed=0):
+        parts = urlsplit(base_url)
+        self.address = (parts.hostname, parts.port or 80)
+        self.prefix = parts.path.rstrip("/")
+        self.clients = clients
+        self.seconds = seconds
+        self.shape = shape
+        self.seed = seed
+        self.completed = 0
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _request(self, rng):
+        body = json.dumps(make_payload(rng, self.shape)).encode("utf-8")
+        head = (
+            f"POST {self.prefix}/api/metrics/ingest HTTP/1.1\r\n"
+            f"Host: {self.address[0]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"X-Bench-Key: {settings.BENCH_API_KEY}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("ascii")
+        pieces = 10
+        step = -(-len(body) // pieces)
+        with socket.create_connection(self.address, timeout=self.seconds + 30) as sock:
+            sock.sendall(head)
+            for i in range(0, len(body), step):
+                if self._stop.wait(self.seconds / pieces):
+                    return
+                sock.sendall(body[i:i + step])
+            while sock.recv(65536):
+                pass
+        self.completed += 1
+
+    def _loop(self, index):
+        rng = random.Random(self.seed * 1000 + 500 + index)
+        while not self._stop.is_set():
+            try:
+                self._request(rng)
+            except OSError:
+                self._stop.wait(0.1)
+
+    def __enter__(self):
+        for index in range(self.clients):
+            thread = threading.Thread(target=self._loop, args=(index,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def summarize(samples, elapsed):
+    """samples: list of (latency_s, status, size, queries)."""
+    latencies = sorted(s[0] for s in samples)
+    queries = [s[3] for s in samples if s[3] is not None]
+    errors = sum(1 for s in samples if not 200 <= s[1] < 400)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else None,
+        # Failed requests are often fast ("database is locked"); count only the rest
+        "ok_throughput_rps": round((len(samples) - errors) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            name: round(percentile(latencies, q) * 1000, 3) if latencies else None
+            for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+        },
+        "mean_response_bytes": round(sum(s[2] for s in samples) / len(samples), 1) if samples else 0,
+        "db_queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def run(transport_factory, mix, requests=1000, concurrency=4, shape="short",
+        batch_size=100, warmup=0, seed=0):
+    """Drive ``requests`` requests over ``concurrency`` threads and report."""
+    available = scenarios(shape, batch_size)
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+
+    lock = threading.Lock()
+    budget = {"left": requests + warmup}
+    samples = {name: [] for name in names}
+    started = threading.Barrier(concurrency + 1)
+    errors = []
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        transport = transport_factory()
+        started.wait()
+        try:
+            while True:
+                with lock:
+                    if budget["left"] <= 0:
+                        return
+                    budget["left"] -= 1
+                    is_warmup = budget["left"] >= requests
+                name = rng.choices(names, weights)[0]
+                method, path, body, headers = available[name](rng)
+                t0 = time.perf_counter()
+                status, size, queries = transport.request(method, path, body, headers)
+                latency = time.perf_counter() - t0
+                if not is_warmup:
+                    with lock:
+                        samples[name].append((latency, status, size, queries))
+        except Exception as exc:  # surfaced in the report instead of killing the run
+            errors.append(repr(exc))
+        finally:
+            transport.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    started.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    everything = [s for per_name in samples.values() for s in per_name]
+    return {
+        "config": {
+            "requests": requests,
+            "concurrency": concurrency,
+            "mix": dict(mix),
+            "payload_shape": shape,
+            "batch_size": batch_size,
+            "warmup": warmup,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "overall": summarize(everything, elapsed),
+        "scenarios": {name: summarize(s, elapsed) for name, s in samples.items()},
+        "worker_errors": errors,
+    }
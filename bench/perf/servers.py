@@ -0,0 +1,99 @@
+"""
+Local gunicorn servers for benchmarks.
+
+``serve()`` starts gunicorn on a free port with either the sync WSGI
+workers the image used to run or uvicorn ASGI workers (the two
+BENCH_SERVER modes of entrypoint.sh, preloaded as there), pointed at a
+scratch SQLite file, and stops it again afterwards.
+"""
+
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+MODES = {
+    "wsgi": ["webapp.wsgi:application"],
+    "asgi": ["webapp.asgi:application", "-k", "uvicorn.workers.UvicornWorker"],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def migrate(db_path):
+    """Create an empty, fully migrated database at ``db_path``."""
+    subprocess.run(
+        [sys.executable, "manage.py", "migrate", "--noinput", "--skip-checks"],
+        cwd=settings.BASE_DIR,
+        env=dict(os.environ, BENCH_DB_PATH=str(db_path)),
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def _wait_ready(url, proc, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with status {proc.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server did not answer {url} within {timeout}s")
+
+
+@contextmanager
+def serve(mode, workers, template_db, timeout=30, env=None):
+    """
+    Run gunicorn in ``mode`` ("wsgi" or "asgi") on a copy of
+    ``template_db``; yields the base URL. ``env`` adds environment
+    variables (settings) for the server.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "db.sqlite3"
+        shutil.copyfile(template_db, db_path)
+        port = free_port()
+        env = dict(
+            os.environ,
+            BENCH_DB_PATH=str(db_path),
+            BENCH_SERVER=mode,
+            BENCH_PROMETHEUS_DIR=str(Path(tmp) / "prometheus"),
+            BENCH_CACHE_DIR=str(Path(tmp) / "cache"),  # shared, as entrypoint.sh does
+            **(env or {}),
+        )
+        log_path = Path(tmp) / "server.log"
+        with open(log_path, "wb") as log:
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "gunicorn", *MODES[mode],
+                 "--workers", str(workers), "--bind", f"127.0.0.1:{port}",
+                 "--preload", "--log-level", "warning"],
+                cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+            )
+            url = f"http://127.0.0.1:{port}"
+            try:
+                try:
+                    _wait_ready(url + "/health", proc, timeout)
+                except RuntimeError as exc:
+                    raise RuntimeError(f"{mode}: {exc}\n{log_path.read_text()}") from None
+                yield url
+            finally:
+                proc.terminate()
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+                    proc.wait()
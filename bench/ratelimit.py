@@ -0,0 +1,290 @@
+"""
+Per-key rate limiting and backpressure for the ingest endpoints.
+
+Each ingest key (BENCH_API_KEYS) has a token bucket: BENCH_INGEST_RATE_LIMITS
+gives its refill rate (requests per second) and burst size. On top of
+that the server sheds ingest load while it is saturated: when
+BENCH_INGEST_MAX_IN_FLIGHT writes are already running across all workers,
+or when recent writes took longer than BENCH_INGEST_MAX_WRITE_MS. Both
+answer 429 with Retry-After.
+
+The state lives in one small mmap'd file (BENCH_RATELIMIT_PATH) shared
+by every gunicorn worker:
+
+    header   magic, hash of the configured key names
+    latency  EWMA of write duration (ms), time of the last update
+    workers  MAX_WORKERS x (pid, writes in flight)
+    buckets  one (tokens, last refill) pair per key, in sorted name order
+
+A bucket update takes a POSIX record lock on its own 16 bytes only, and a
+worker's in-flight count is only ever written by that worker, so a check
+is a couple of syscalls and struct reads: microseconds, and cheap enough
+to run directly on the event loop under ASGI.
+"""
+
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+
+from core.metrics import get_registry
+from core.process import pid_alive
+
+MAGIC = b"BRL1"
+MAX_WORKERS = 64
+
+_HEADER = struct.Struct("<4s4xQ")  # magic, names hash
+_PAIR = struct.Struct("<dd")
+_WORKER = struct.Struct("<qq")  # pid, in flight
+_LATENCY_AT = _HEADER.size
+_WORKERS_AT = _LATENCY_AT + _PAIR.size
+_BUCKETS_AT = _WORKERS_AT + MAX_WORKERS * _WORKER.size
+
+# Weight of the newest write in the latency average
+_EWMA_ALPHA = 0.2
+# Latency older than this no longer sheds load, so a quiet server (or one
+# shedding everything) measures again
+_LATENCY_STALE = 1.0
+
+
+class Throttled(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Limiter:
+    """Token buckets and write accounting in a file shared between workers."""
+
+    def __init__(self, path, names, limits, max_in_flight=0, max_write_ms=0.0):
+        self.path = path
+        self.names = sorted(names)
+        self.limits = {
+            name: limits.get(name, limits.get("*"))
+            for name in self.names
+        }
+        self.max_in_flight = max_in_flight
+        self.max_write_ms = max_write_ms
+        self._slots = {name: _BUCKETS_AT + i * _PAIR.size for i, name in enumerate(self.names)}
+        self._size = _BUCKETS_AT + len(self.names) * _PAIR.size
+        self._lock = threading.Lock()  # record locks don't exclude threads of one process
+        self._pid = None
+        self._worker_at = None
+        self._workers = None
+
+    def _map(self):
+        pid = os.getpid()
+        if self._pid != pid:  # first use, or we are a freshly forked worker
+            with self._lock:
+                if self._pid != pid:
+                    self._open()
+                    self._pid = pid
+        return self._m
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        digest = hashlib.sha1("\n".join(self.names).encode("utf-8")).digest()
+        names_hash = int.from_bytes(digest[:8], "little")
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < self._size:
+                os.ftruncate(self._fd, self._size)
+            self._m = mmap.mmap(self._fd, self._size)
+            if _HEADER.unpack_from(self._m, 0) != (MAGIC, names_hash):
+                # New file, or the keys changed since it was written
+                self._m[:] = bytes(self._size)
+                _HEADER.pack_into(self._m, 0, MAGIC, names_hash)
+            self._worker_at = self._claim_worker_slot()
+            # (pid, in flight) pairs as one flat int64 array
+            self._workers = memoryview(self._m)[_WORKERS_AT:_BUCKETS_AT].cast("q")
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _claim_worker_slot(self):
+        pid = os.getpid()
+        free = None
+        for i in range(MAX_WORKERS):
+            at = _WORKERS_AT + i * _WORKER.size
+            slot_pid, _ = _WORKER.unpack_from(self._m, at)
+            if slot_pid == pid:
+                free = at
+                break
+            if free is None and (slot_pid == 0 or not pid_alive(slot_pid)):
+                free = at
+        if free is None:
+            raise RuntimeError(f"More than {MAX_WORKERS} processes share {self.path}")
+        _WORKER.pack_into(self._m, free, pid, 0)
+        return free
+
+    def take(self, name, cost=1.0, now=None):
+        """Take ``cost`` tokens from ``name``'s bucket or raise Throttled."""
+        limit = self.limits.get(name)
+        if limit is None:
+            return
+        rate, burst = limit
+        m = self._map()
+        at = self._slots[name]
+        now = time.time() if now is None else now
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, _PAIR.size, at)
+            try:
+                tokens, last = _PAIR.unpack_from(m, at)
+                if last == 0.0:
+                    tokens = burst
+                tokens = min(burst, tokens + max(0.0, now - last) * rate)
+                if tokens >= cost:
+                    _PAIR.pack_into(m, at, tokens - cost, now)
+                    return
+                _PAIR.pack_into(m, at, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, _PAIR.size, at)
+        raise Throttled(f"Rate limit exceeded for key {name!r}", (cost - tokens) / rate if rate else 60.0)
+
+    def in_flight(self):
+        """Ingest writes running in all workers."""
+        self._map()
+        return sum(self._workers[1::2])
+
+    def _live_in_flight(self):
+        # Slow path: don't count writes of workers that died mid-request
+        self._map()
+        workers = self._workers
+        return sum(
+            workers[i + 1] for i in range(0, len(workers), 2)
+            if workers[i + 1] and (workers[i] == self._pid or pid_alive(workers[i]))
+        )
+
+    def admit(self, now=None):
+        """Raise Throttled if the server is too busy to take another write."""
+        if self.max_in_flight and self.in_flight() >= self.max_in_flight:
+            if self._live_in_flight() >= self.max_in_flight:
+                raise Throttled("Server busy: too many writes in flight", 1.0)
+        if self.max_write_ms:
+            latency, updated = _PAIR.unpack_from(self._map(), _LATENCY_AT)
+            now = time.time() if now is None else now
+            if latency > self.max_write_ms and now - updated < _LATENCY_STALE:
+                raise Throttled("Server busy: database writes are slow", _LATENCY_STALE)
+
+    def _add_in_flight(self, delta):
+        m = self._map()
+        with self._lock:
+            pid, count = _WORKER.unpack_from(m, self._worker_at)
+            _WORKER.pack_into(m, self._worker_at, pid, count + delta)
+
+    def record_write(self, seconds, now=None):
+        """Fold one write duration into the shared latency average."""
+        m = self._map()
+        now = time.time() if now is None else now
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, _PAIR.size, _LATENCY_AT)
+            try:
+                latency, updated = _PAIR.unpack_from(m, _LATENCY_AT)
+                ms = seconds * 1000.0
+                if now - updated >= _LATENCY_STALE:
+                    latency = ms
+                else:
+                    latency += _EWMA_ALPHA * (ms - latency)
+                _PAIR.pack_into(m, _LATENCY_AT, latency, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, _PAIR.size, _LATENCY_AT)
+
+    def writing(self):
+        """Context manager counting one write in flight and timing it."""
+        return _Writing(self)
+
+
+class _Writing:
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    def __enter__(self):
+        self.limiter._add_in_flight(1)
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.limiter._add_in_flight(-1)
+        if self.limiter.max_write_ms:
+            self.limiter.record_write(time.perf_counter() - self.t0)
+
+
+_limiter = None
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        _limiter = Limiter(
+            settings.BENCH_RATELIMIT_PATH,
+            set(settings.BENCH_API_KEYS.values()),
+            settings.BENCH_INGEST_RATE_LIMITS,
+            max_in_flight=settings.BENCH_INGEST_MAX_IN_FLIGHT,
+            max_write_ms=settings.BENCH_INGEST_MAX_WRITE_MS,
+        )
+    return _limiter
+
+
+def _throttled(exc, name):
+    get_registry().inc("ingest_throttled_total", {"key": name, "reason": exc.reason.split(":")[0]})
+    response = JsonResponse({"error": exc.reason}, status=429)
+    response["Retry-After"] = str(max(1, math.ceil(exc.retry_after)))
+    return response
+
+
+def rate_limited(key_name):
+    """
+    Apply the key's token bucket and the global backpressure to a view.
+
+    ``key_name(request)`` returns the name of the request's ingest key, or
+    None; unauthenticated requests pass through (the view answers 403).
+    Works for sync and async views.
+    """
+
+    def check(request):
+        name = key_name(request)
+        if name is None or request.method != "POST":
+            return None, None
+        limiter = get_limiter()
+        try:
+            # Shed load first: a request turned away as busy keeps its token
+            limiter.admit()
+            limiter.take(name)
+        except Throttled as exc:
+            return limiter, _throttled(exc, name)
+        return limiter, None
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                limiter, throttled = check(request)
+                if throttled is not None:
+                    return throttled
+                if limiter is None:
+                    return await view(request, *args, **kwargs)
+                with limiter.writing():
+                    return await view(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            limiter, throttled = check(request)
+            if throttled is not None:
+                return throttled
+            if limiter is None:
+                return view(request, *args, **kwargs)
+            with limiter.writing():
+                return view(request, *args, **kwargs)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,175 @@
+"""
+Online regression detection against rolling per-workflow baselines.
+
+Every (source, workflow, metric) has a MetricBaseline row holding an
+exponentially weighted mean and variance and a one-sided CUSUM of the
+standardized deviations in the "worse" direction of that metric. A new
+sample is scored against the baseline before it is folded in, and flagged
+as a MetricRegression when
+
+* ewma  - its z-score exceeds BENCH_REGRESSION_Z (one bad run), or
+* cusum - the accumulated drift exceeds BENCH_REGRESSION_CUSUM_H (a
+          sustained shift where no single run stands out).
+
+Scoring and updating are O(1) per sample, so detection runs inside the
+ingest transaction (see bench.ingest.store_metrics) rather than as a batch
+job over the Metric table.
+"""
+
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import METRIC_FIELDS, Metric, MetricBaseline, MetricRegression
+
+# Direction in which each metric gets worse: +1 higher is worse, -1 lower is worse
+WORSE = {"lce": -1, "prt": 1, "smo": 1, "dept": 1, "clbc": -1, "app_lat": 1}
+
+# The std used for scoring is at least this fraction of the mean, so a
+# series of identical values doesn't flag the first tiny change.
+REL_STD_FLOOR = 0.01
+
+
+class Detector:
+    """EWMA z-score + CUSUM scoring of samples against a MetricBaseline."""
+
+    def __init__(self, alpha=0.05, z=3.0, k=0.5, h=5.0, warmup=20):
+        self.alpha = alpha
+        self.z = z
+        self.k = k
+        self.h = h
+        self.warmup = warmup
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            alpha=settings.BENCH_REGRESSION_ALPHA,
+            z=settings.BENCH_REGRESSION_Z,
+            k=settings.BENCH_REGRESSION_CUSUM_K,
+            h=settings.BENCH_REGRESSION_CUSUM_H,
+            warmup=settings.BENCH_REGRESSION_WARMUP,
+        )
+
+    def step(self, baseline, value):
+        """
+        Score ``value`` against ``baseline``, then fold it in.
+
+        Returns None or (detector, score, baseline mean, baseline std).
+        """
+        flag = None
+        mean = baseline.mean
+        std = max(math.sqrt(baseline.variance), REL_STD_FLOOR * abs(mean))
+        scored = baseline.count >= self.warmup and std > 0
+        if scored:
+            z = WORSE[baseline.metric] * (value - mean) / std
+            baseline.cusum = max(0.0, baseline.cusum + z - self.k)
+            if z > self.z:
+                flag = ("ewma", z, mean, std)
+            elif baseline.cusum > self.h:
+                flag = ("cusum", baseline.cusum, mean, std)
+            if flag is not None:
+                baseline.cusum = 0.0
+            # Clip outliers so one extreme run doesn't blow up the variance
+            value = min(max(value, mean - self.z * std), mean + self.z * std)
+
+        # Plain running mean until the EWMA weight takes over
+        alpha = max(self.alpha, 1.0 / (baseline.count + 1))
+        diff = value - mean
+        incr = alpha * diff
+        baseline.mean = mean + incr
+        baseline.variance = (1 - alpha) * (baseline.variance + diff * incr)
+        baseline.count += 1
+        return flag
+
+
+def _existing_baselines(keys, chunk=200):
+    """Fetch (and lock) the baselines for ``keys``, a few hundred per query."""
+    existing = {}
+    keys = list(keys)
+    for i in range(0, len(keys), chunk):
+        q = Q()
+        for source, workflow in keys[i:i + chunk]:
+            q |= Q(source=source, workflow=workflow)
+        for b in MetricBaseline.objects.select_for_update().filter(q):
+            existing[(b.source, b.workflow, b.metric)] = b
+    return existing
+
+
+def _score(metrics, baselines, detector, created):
+    """Run ``metrics`` (oldest first) through the detector; yield regressions."""
+    for m in metrics:
+        for short_key, long_key in METRIC_FIELDS:
+            key = (m.source, m.workflow, short_key)
+            baseline = baselines.get(key)
+            if baseline is None:
+                baseline = baselines[key] = MetricBaseline(
+                    source=m.source, workflow=m.workflow, metric=short_key,
+                )
+                created.append(baseline)
+            value = getattr(m, long_key)
+            flag = detector.step(baseline, value)
+            if flag is not None:
+                detector_name, score, mean, std = flag
+                yield MetricRegression(
+                    sample_id=m.pk, created_at=m.created_at, source=m.source,
+                    workflow=m.workflow, metric=short_key, value=value,
+                    baseline_mean=mean, baseline_std=std, score=score,
+                    detector=detector_name,
+                )
+
+
+def apply(metrics):
+    """Score freshly stored metrics and update their baselines."""
+    metrics = sorted(metrics, key=lambda m: (m.created_at, m.pk))
+    if not metrics:
+        return []
+    with transaction.atomic():
+        baselines = _existing_baselines({(m.source, m.workflow) for m in metrics})
+        created = []
+        found = list(_score(metrics, baselines, Detector.from_settings(), created))
+
+        now = timezone.now()
+        for baseline in baselines.values():
+            baseline.updated_at = now
+        is_new = set(map(id, created))
+        MetricBaseline.objects.bulk_update(
+            [b for b in baselines.values() if id(b) not in is_new],
+            ["count", "mean", "variance", "cusum", "updated_at"],
+            batch_size=500,
+        )
+        MetricBaseline.objects.bulk_create(created, batch_size=500)
+        return MetricRegression.objects.bulk_create(found, batch_size=500)
+
+
+def rebuild(chunk_size=5000):
+    """
+    Replay the whole Metric history through fresh baselines.
+
+    Regressions whose sample has been archived can't be replayed and are
+    kept.
+    """
+    fields = ["id", "created_at", "source", "workflow"] + [
+        long_key for _, long_key in METRIC_FIELDS
+    ]
+    rows = (
+        Metric.objects.order_by("created_at", "id").only(*fields).iterator(chunk_size=chunk_size)
+    )
+    detector = Detector.from_settings()
+    baselines, created = {}, []
+    with transaction.atomic():
+        MetricRegression.objects.filter(sample__isnull=False).delete()
+        MetricBaseline.objects.all().delete()
+        batch = []
+        flagged = 0
+        for regression in _score(rows, baselines, detector, created):
+            batch.append(regression)
+            if len(batch) >= chunk_size:
+                MetricRegression.objects.bulk_create(batch)
+                flagged += len(batch)
+                batch = []
+        MetricRegression.objects.bulk_create(batch)
+        MetricBaseline.objects.bulk_create(created, batch_size=500)
+    return flagged + len(batch)
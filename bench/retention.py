@@ -0,0 +1,87 @@
+"""
+Retention of raw Metric rows.
+
+BENCH_RETENTION_DAYS sets how many days of raw rows each source keeps.
+compact() moves older rows, oldest first and ``chunk_size`` rows per
+transaction, into bench.archive segment files and deletes them from the
+database. Their rollups and sketches stay: that is where the aggregates
+past the window come from, and window edges that are not hour-aligned
+are still answered from minute buckets (bench.rollups), which are small
+next to the raw rows. The per-source horizon is recorded in RetentionState so
+rebuilds keep those aggregates and the read APIs know when to look in
+the archive.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import archive, caching
+from .models import Metric, RetentionState
+from .rollups import DAY, floor_bucket
+
+
+def policy():
+    """source -> days of raw rows to keep, for the sources that expire."""
+    configured = settings.BENCH_RETENTION_DAYS
+    days = {}
+    for source, _label in Metric.SOURCE_CHOICES:
+        keep = configured.get(source, configured.get("*"))
+        if keep is not None:
+            days[source] = keep
+    return days
+
+
+def cutoff(keep_days, now=None):
+    """Start of the oldest UTC day whose raw rows are kept."""
+    return floor_bucket((now or timezone.now()) - timedelta(days=keep_days), DAY)
+
+
+def compact_source(source, keep_days, now=None, chunk_size=5000, report=None):
+    """Archive the raw rows of ``source`` older than ``keep_days``; returns stats."""
+    before = cutoff(keep_days, now)
+    state = RetentionState.objects.filter(source=source).first()
+    if state is not None:
+        # A longer retention doesn't bring archived rows back
+        before = max(before, state.archived_before)
+
+    stats = {"source": source, "archived_before": before.isoformat(),
+             "archived": 0, "segments": 0}
+    expired = (
+        Metric.objects.filter(source=source, created_at__lt=before)
+        .order_by("created_at", "id")
+        .values(*archive.FIELDS)
+    )
+    while True:
+        rows = list(expired[:chunk_size])
+        if not rows:
+            break
+        by_day = {}
+        for row in rows:
+            by_day.setdefault(floor_bucket(row["created_at"], DAY), []).append(row)
+        # Files first: if we stop before the delete commits, the next run
+        # finds the same segments and only deletes the rows.
+        for day, day_rows in by_day.items():
+            archive.write_segment(source, day, day_rows)
+
+        with transaction.atomic():
+            RetentionState.objects.update_or_create(
+                source=source, defaults={"archived_before": before},
+            )
+            Metric.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+            caching.bump_version()
+        stats["archived"] += len(rows)
+        stats["segments"] += len(by_day)
+        if report:
+            report(stats)
+    return stats
+
+
+def compact(now=None, chunk_size=5000, report=None):
+    """Apply the retention policy to every source; returns per-source stats."""
+    return [
+        compact_source(source, keep_days, now=now, chunk_size=chunk_size, report=report)
+        for source, keep_days in policy().items()
+    ]
@@ -0,0 +1,354 @@
+"""
+Incrementally maintained rollups of Metric values.
+
+Every stored Metric is folded into one MetricRollup row per granularity
+(minute, hour, day), keyed by (source, workflow, branch, bucket). Window
+aggregates are then answered from rollups: whole days from day buckets and
+the partial edges from hour and minute buckets, so a query reads a number of
+rows proportional to the buckets in the window, not to the runs in it.
+"""
+
+import math
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import Greatest, Least, TruncDay, TruncHour, TruncMinute
+
+from .archive import archived_q
+from .models import METRIC_FIELDS, Metric, MetricRollup
+
+MINUTE = MetricRollup.GRANULARITY_MINUTE
+HOUR = MetricRollup.GRANULARITY_HOUR
+DAY = MetricRollup.GRANULARITY_DAY
+
+GRANULARITIES = (MINUTE, HOUR, DAY)
+
+STEP = {
+    MINUTE: timedelta(minutes=1),
+    HOUR: timedelta(hours=1),
+    DAY: timedelta(days=1),
+}
+
+_TRUNC = {MINUTE: TruncMinute, HOUR: TruncHour, DAY: TruncDay}
+
+
+def floor_bucket(dt, granularity):
+    """Truncate an aware datetime to the start of its (UTC) bucket."""
+    dt = dt.astimezone(dt_timezone.utc).replace(second=0, microsecond=0)
+    if granularity in (HOUR, DAY):
+        dt = dt.replace(minute=0)
+    if granularity == DAY:
+        dt = dt.replace(hour=0)
+    return dt
+
+
+def ceil_bucket(dt, granularity):
+    floored = floor_bucket(dt, granularity)
+    return floored if floored == dt else floored + STEP[granularity]
+
+
+def apply(metrics):
+    """
+    Fold freshly stored metrics into the rollup tables.
+
+    Metrics are first combined in memory per (granularity, source, workflow,
+    branch, bucket) key. Existing buckets are incremented in place with one
+    UPDATE each; new buckets are inserted with a single bulk_create.
+    """
+    combined = {}
+    for m in metrics:
+        values = [getattr(m, long_key) for _, long_key in METRIC_FIELDS]
+        for granularity in GRANULARITIES:
+            key = (granularity, m.source, m.workflow, m.branch,
+                   floor_bucket(m.created_at, granularity))
+            agg = combined.get(key)
+            if agg is None:
+                combined[key] = [1, list(values), list(values), list(values),
+                                 [v * v for v in values]]
+                continue
+            agg[0] += 1
+            for i, v in enumerate(values):
+                agg[1][i] += v
+                agg[2][i] = min(agg[2][i], v)
+                agg[3][i] = max(agg[3][i], v)
+                agg[4][i] += v * v
+
+    if not combined:
+        return
+
+    existing = _existing_keys(combined)
+    fresh = [key for key in combined if key not in existing]
+    for key in existing:
+        _update(key, *combined[key])
+
+    try:
+        with transaction.atomic():
+            MetricRollup.objects.bulk_create(
+                [_new_rollup(key, *combined[key]) for key in fresh]
+            )
+    except IntegrityError:
+        # Another writer created some of these buckets meanwhile.
+        for key in fresh:
+            if not _update(key, *combined[key]):
+                _new_rollup(key, *combined[key]).save()
+
+
+def _existing_keys(combined):
+    by_granularity = {}
+    for granularity, source, _workflow, _branch, bucket in combined:
+        sources, buckets = by_granularity.setdefault(granularity, (set(), set()))
+        sources.add(source)
+        buckets.add(bucket)
+
+    q = Q()
+    for granularity, (sources, buckets) in by_granularity.items():
+        q |= Q(granularity=granularity, source__in=sources, bucket__in=buckets)
+    rows = MetricRollup.objects.filter(q).values_list(
+        "granularity", "source", "workflow", "branch", "bucket"
+    )
+    return {row for row in rows if row in combined}
+
+
+def _lookup(key):
+    granularity, source, workflow, branch, bucket = key
+    return dict(granularity=granularity, source=source, workflow=workflow,
+                branch=branch, bucket=bucket)
+
+
+def _update(key, count, sums, mins, maxs, sumsqs):
+    updates = {"count": F("count") + count}
+    for i, (short_key, _) in enumerate(METRIC_FIELDS):
+        updates[f"{short_key}_sum"] = F(f"{short_key}_sum") + sums[i]
+        updates[f"{short_key}_sumsq"] = F(f"{short_key}_sumsq") + sumsqs[i]
+        updates[f"{short_key}_min"] = Least(F(f"{short_key}_min"), mins[i])
+        updates[f"{short_key}_max"] = Greatest(F(f"{short_key}_max"), maxs[i])
+    return MetricRollup.objects.filter(**_lookup(key)).update(**updates)
+
+
+def _new_rollup(key, count, sums, mins, maxs, sumsqs):
+    values = {"count": count}
+    for i, (short_key, _) in enumerate(METRIC_FIELDS):
+        values[f"{short_key}_sum"] = sums[i]
+        values[f"{short_key}_sumsq"] = sumsqs[i]
+        values[f"{short_key}_min"] = mins[i]
+        values[f"{short_key}_max"] = maxs[i]
+    return MetricRollup(**_lookup(key), **values)
+
+
+def rebuild(granularities=GRANULARITIES):
+    """
+    Recompute rollups from the raw Metric table with one
+    INSERT ... SELECT ... GROUP BY each: the rows never pass through
+    Python, where building model instances was most of the cost.
+
+    Buckets before a source's archive horizon (bench.retention) are kept
+    as they are: their raw rows are no longer in the table.
+    """
+    created = 0
+    with transaction.atomic():
+        MetricRollup.objects.filter(granularity__in=granularities).exclude(
+            archived_q("bucket")
+        ).delete()
+        for granularity in granularities:
+            created += _insert_grouped(
+                granularity, Metric.objects.exclude(archived_q("created_at"))
+            )
+    return created
+
+
+def refresh(rows, chunk=200):
+    """
+    Recompute only the buckets holding ``rows``, (source, workflow, branch,
+    created_at) tuples of metrics that were changed or deleted.
+
+    Counts and sums could be subtracted in place, but a bucket's min and max
+    cannot, so each touched bucket is dropped and regrouped from the raw rows
+    still in it. Buckets left without rows disappear.
+    """
+    keys = {
+        (granularity, source, workflow, branch, floor_bucket(created_at, granularity))
+        for source, workflow, branch, created_at in rows
+        for granularity in GRANULARITIES
+    }
+    keys = list(keys)
+    created = 0
+    with transaction.atomic():
+        for i in range(0, len(keys), chunk):
+            buckets, raw = Q(), {granularity: Q() for granularity in GRANULARITIES}
+            for key in keys[i:i + chunk]:
+                granularity, source, workflow, branch, bucket = key
+                buckets |= Q(**_lookup(key))
+                raw[granularity] |= Q(source=source, workflow=workflow, branch=branch,
+                                      created_at__gte=bucket,
+                                      created_at__lt=bucket + STEP[granularity])
+            MetricRollup.objects.filter(buckets).delete()
+            for granularity, q in raw.items():
+                if q:
+                    created += _insert_grouped(granularity, Metric.objects.filter(q))
+    return created
+
+
+def _insert_grouped(granularity, metrics):
+    """INSERT ... SELECT the ``granularity`` buckets of ``metrics``; returns the row count."""
+    qn = connection.ops.quote_name
+    aggregates = {"count": Count("id")}
+    for short_key, long_key in METRIC_FIELDS:
+        aggregates[f"{short_key}_sum"] = Sum(long_key)
+        aggregates[f"{short_key}_sumsq"] = Sum(F(long_key) * F(long_key))
+        aggregates[f"{short_key}_min"] = Min(long_key)
+        aggregates[f"{short_key}_max"] = Max(long_key)
+
+    grouped = (
+        metrics.order_by()
+        .annotate(bucket=_TRUNC[granularity]("created_at"))
+        .values("source", "workflow", "branch", "bucket")
+        .annotate(**aggregates)
+    )
+    sql, params = grouped.query.sql_with_params()
+    names = ["source", "workflow", "branch", "bucket", *aggregates]
+    columns = ", ".join(qn(MetricRollup._meta.get_field(name).column) for name in names)
+    selected = ", ".join(qn(name) for name in names)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {qn(MetricRollup._meta.db_table)} ({qn('granularity')}, {columns}) "
+            f"SELECT %s, {selected} FROM ({sql}) grouped",
+            [granularity, *params],
+        )
+        return cursor.rowcount
+
+
+def _plan(start, end, granularities):
+    """
+    Split [start, end) into bucket-aligned ranges, coarsest first.
+
+    ``granularities`` is ordered finest to coarsest. Returns (granularity,
+    lo, hi) tuples; None means unbounded. Edges that do not align to the
+    finest granularity are widened to its enclosing bucket.
+    """
+    granularity = granularities[-1]
+    if len(granularities) == 1:
+        lo = None if start is None else floor_bucket(start, granularity)
+        hi = None if end is None else ceil_bucket(end, granularity)
+        return [(granularity, lo, hi)]
+
+    finer = granularities[:-1]
+    lo = None if start is None else ceil_bucket(start, granularity)
+    hi = None if end is None else floor_bucket(end, granularity)
+    if lo is not None and hi is not None and lo >= hi:
+        return _plan(start, end, finer)
+
+    plan = [(granularity, lo, hi)]
+    if start is not None and start < lo:
+        plan += _plan(start, lo, finer)
+    if end is not None and hi < end:
+        plan += _plan(hi, end, finer)
+    return plan
+
+
+def window_filter(start=None, end=None, granularities=GRANULARITIES):
+    """Q selecting the bucket rows that exactly cover [start, end)."""
+    q = Q()
+    for granularity, lo, hi in _plan(start, end, granularities):
+        part = Q(granularity=granularity)
+        if lo is not None:
+            part &= Q(bucket__gte=lo)
+        if hi is not None:
+            part &= Q(bucket__lt=hi)
+        q |= part
+    return q
+
+
+def _totals():
+    aggregates = {"count": Sum("count")}
+    for short_key, _ in METRIC_FIELDS:
+        aggregates[f"{short_key}_sum"] = Sum(f"{short_key}_sum")
+        aggregates[f"{short_key}_min"] = Min(f"{short_key}_min")
+        aggregates[f"{short_key}_max"] = Max(f"{short_key}_max")
+        aggregates[f"{short_key}_sumsq"] = Sum(f"{short_key}_sumsq")
+    return aggregates
+
+
+def _aggregate_query(source, start, end):
+    qs = MetricRollup.objects.filter(window_filter(start, end))
+    if source:
+        qs = qs.filter(source=source)
+    return qs, _totals()
+
+
+def _std(count, total, sumsq):
+    """Sample standard deviation from a count, sum and sum of squares."""
+    if count < 2:
+        return 0.0
+    # Rounding can leave a tiny negative variance for constant series
+    return math.sqrt(max(0.0, (sumsq - total * total / count) / (count - 1)))
+
+
+def _fold_totals(totals):
+    count = totals["count"] or 0
+    result = {"count": count}
+    for short_key, _ in METRIC_FIELDS:
+        total = totals[f"{short_key}_sum"] or 0.0
+        result[short_key] = {
+            "avg": total / count if count else 0.0,
+            "std": _std(count, total, totals[f"{short_key}_sumsq"] or 0.0),
+            "min": totals[f"{short_key}_min"] if count else 0.0,
+            "max": totals[f"{short_key}_max"] if count else 0.0,
+        }
+    return result
+
+
+def aggregate(source=None, start=None, end=None):
+    """
+    Count, mean, std, min and max of every metric over a time window.
+
+    Returns {"count": n, "lce": {"avg":..., "std":..., "min":..., "max":...}, ...}.
+    """
+    qs, aggregates = _aggregate_query(source, start, end)
+    return _fold_totals(qs.aggregate(**aggregates))
+
+
+async def aaggregate(source=None, start=None, end=None):
+    """Async version of aggregate()."""
+    qs, aggregates = _aggregate_query(source, start, end)
+    return _fold_totals(await qs.aaggregate(**aggregates))
+
+
+def grouped(group_by=("source",), start=None, end=None, **filters):
+    """
+    aggregate() per group, from one GROUP BY over the rollup buckets.
+
+    ``group_by`` names rollup key columns (source, workflow, branch);
+    ``filters`` are extra rollup lookups such as ``source__in``. Returns
+    [{"source": ..., "count": n, "lce": {...}, ...}] ordered by the groups.
+    """
+    rows = (
+        MetricRollup.objects.filter(window_filter(start, end), **filters)
+        .values(*group_by)
+        .annotate(**_totals())
+        .order_by(*group_by)
+    )
+    return [
+        {**{name: row[name] for name in group_by}, **_fold_totals(row)}
+        for row in rows
+    ]
+
+
+def _flatten(totals):
+    data = {"count": totals["count"]}
+    for short_key, _ in METRIC_FIELDS:
+        agg = totals[short_key]
+        data[f"avg_{short_key}"] = round(agg["avg"], 2)
+        data[f"min_{short_key}"] = agg["min"]
+        data[f"max_{short_key}"] = agg["max"]
+    return data
+
+
+def summary(source=None, start=None, end=None):
+    """Flat aggregate payload (count, avg_*, min_*, max_*) used by the APIs."""
+    return _flatten(aggregate(source=source, start=start, end=end))
+
+
+async def asummary(source=None, start=None, end=None):
+    """Async version of summary()."""
+    return _flatten(await aaggregate(source=source, start=start, end=end))
@@ -0,0 +1,221 @@
+"""
+Durable on-disk spool for the ingest endpoint.
+
+When BENCH_INGEST_SPOOL is enabled, api_ingest appends each accepted payload
+to an append-only segment file and returns 202 without touching the
+database. ``manage.py drain_ingest_spool`` replays the segments into Metric.
+
+Layout of BENCH_INGEST_SPOOL_DIR:
+
+    <time_ns>-<pid>.open   segment currently being written by worker <pid>
+    <time_ns>-<pid>.seg    sealed segment (rotated, no more writes)
+
+Each record is one JSON line: {"t": <received epoch seconds>, "p": <payload>}.
+Every gunicorn worker writes its own segments, so no cross-process locking
+is needed. Concurrent requests inside a worker share fsync calls (group
+commit): a request only returns once an fsync covering its record finished.
+
+The drain worker stores its read offset per segment in
+IngestSpoolCheckpoint, updated in the same transaction as the inserted
+rows, so a crash at any point never loses or duplicates records.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from core.process import pid_alive
+
+from .ingest import PayloadError, build_metric, store_metrics
+from .models import IngestSpoolCheckpoint
+
+logger = logging.getLogger(__name__)
+
+OPEN_SUFFIX = ".open"
+SEALED_SUFFIX = ".seg"
+
+
+class SpoolWriter:
+    """Append-only segment writer with group-commit fsync."""
+
+    def __init__(self, directory, segment_bytes=16 * 1024 * 1024, commit_delay=0.0):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.commit_delay = commit_delay
+        self._cond = threading.Condition()
+        self._fd = None
+        self._path = None
+        self._size = 0
+        self._written = 0  # sequence number of the last appended record
+        self._synced = 0  # highest sequence number covered by an fsync
+        self._syncing = False
+
+    def append(self, payload, received_at=None):
+        """Append one payload and block until it is durable on disk."""
+        record = {"t": time.time() if received_at is None else received_at, "p": payload}
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+
+        with self._cond:
+            if self._fd is None:
+                self._open_segment()
+            os.write(self._fd, line)
+            self._size += len(line)
+            self._written += 1
+            seq = self._written
+
+            while self._synced < seq:
+                if self._syncing:
+                    # Another request is flushing; its fsync may cover us.
+                    self._cond.wait()
+                    continue
+                self._flush()
+
+            if self._size >= self.segment_bytes and self._synced == self._written:
+                self._seal_segment()
+
+    def close(self):
+        with self._cond:
+            while self._syncing:
+                self._cond.wait()
+            if self._fd is not None:
+                self._flush()
+                os.close(self._fd)
+                self._fd = None
+
+    # -- internals (called with the condition held) --------------------------
+
+    def _flush(self):
+        self._syncing = True
+        fd = self._fd
+        self._cond.release()
+        try:
+            if self.commit_delay:
+                # Let concurrent requests join this fsync.
+                time.sleep(self.commit_delay)
+            with self._cond:
+                target = self._written
+            os.fsync(fd)
+        finally:
+            self._cond.acquire()
+            self._syncing = False
+            self._cond.notify_all()
+        self._synced = max(self._synced, target)
+
+    def _open_segment(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{time.time_ns():020d}-{os.getpid()}{OPEN_SUFFIX}"
+        self._path = self.directory / name
+        self._fd = os.open(self._path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self._size = 0
+
+    def _seal_segment(self):
+        os.close(self._fd)
+        os.replace(self._path, self._path.with_suffix(SEALED_SUFFIX))
+        self._fd = None
+        self._path = None
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """Return the per-process SpoolWriter configured from settings."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = SpoolWriter(
+                    settings.BENCH_INGEST_SPOOL_DIR,
+                    segment_bytes=settings.BENCH_INGEST_SPOOL_SEGMENT_BYTES,
+                    commit_delay=settings.BENCH_INGEST_SPOOL_COMMIT_DELAY_MS / 1000.0,
+                )
+    return _writer
+
+
+def _segment_pid(path):
+    try:
+        return int(path.stem.rsplit("-", 1)[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def list_segments(directory):
+    directory = Path(directory)
+    if not directory.exists():
+        return []
+    paths = [
+        p for p in directory.iterdir()
+        if p.suffix in (OPEN_SUFFIX, SEALED_SUFFIX)
+    ]
+    return sorted(paths, key=lambda p: p.stem)
+
+
+def _decode(line):
+    record = json.loads(line)
+    received_at = datetime.fromtimestamp(record["t"], tz=dt_timezone.utc)
+    return build_metric(record["p"], created_at=received_at)
+
+
+def drain_segment(path, batch_size=5000):
+    """
+    Replay complete records from one segment, starting at its checkpoint.
+
+    Returns the number of rows stored. A trailing partial line (a write
+    still in progress) is left for the next pass.
+    """
+    checkpoint, _ = IngestSpoolCheckpoint.objects.get_or_create(segment=path.stem)
+    offset = checkpoint.offset
+    stored = 0
+
+    with open(path, "rb") as fh:
+        fh.seek(offset)
+        while True:
+            metrics = []
+            consumed = 0
+            for _ in range(batch_size):
+                line = fh.readline()
+                if not line.endswith(b"\n"):
+                    break
+                consumed += len(line)
+                try:
+                    metrics.append(_decode(line))
+                except (ValueError, KeyError, TypeError, PayloadError) as exc:
+                    logger.warning("Skipping bad spool record in %s: %s", path.name, exc)
+            if not consumed:
+                break
+
+            with transaction.atomic():
+                inserted = store_metrics(metrics)
+                offset += consumed
+                IngestSpoolCheckpoint.objects.filter(pk=checkpoint.pk).update(offset=offset)
+            stored += len(inserted)
+
+    if offset == path.stat().st_size:
+        sealed = path.suffix == SEALED_SUFFIX
+        pid = _segment_pid(path)
+        if sealed or (pid is not None and pid != os.getpid() and not pid_alive(pid)):
+            path.unlink()
+            IngestSpoolCheckpoint.objects.filter(pk=checkpoint.pk).delete()
+
+    return stored
+
+
+def drain(directory=None, batch_size=5000):
+    """Drain every segment in the spool directory once; return rows stored."""
+    directory = settings.BENCH_INGEST_SPOOL_DIR if directory is None else directory
+    total = 0
+    for path in list_segments(directory):
+        try:
+            total += drain_segment(path, batch_size=batch_size)
+        except FileNotFoundError:
+            # Sealed (renamed) by its writer meanwhile; picked up next pass.
+            continue
+    return total
@@ -0,0 +1,304 @@
+"""
+Percentile and distribution statistics for the novel metrics.
+
+Values are counted in log-spaced buckets whose width is a fixed fraction of
+the value (DDSketch-style), so every quantile estimate is within
+RELATIVE_ACCURACY of a real sample and two histograms merge by adding
+bucket counts. One MetricSketch row per (source, workflow, hour/day bucket)
+holds a histogram for each metric; a window quantile merges the rows that
+cover it instead of sorting raw Metric rows.
+"""
+
+import math
+
+from django.db import transaction
+from django.db.models import Q
+
+from .archive import archived_q
+from .models import METRIC_FIELDS, Metric, MetricSketch
+from .rollups import DAY, HOUR, STEP, floor_bucket, window_filter
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(GAMMA)
+
+# Values closer to zero than this are counted in the zero bucket
+MIN_INDEXABLE = 1e-9
+
+SKETCH_GRANULARITIES = (HOUR, DAY)
+
+QUANTILES = (("p50", 0.5), ("p90", 0.9), ("p95", 0.95), ("p99", 0.99))
+
+
+class Histogram:
+    """Log-bucketed histogram with bounded relative error."""
+
+    __slots__ = ("pos", "neg", "zero", "count", "min", "max")
+
+    def __init__(self):
+        self.pos = {}  # bucket index -> count, for values > 0
+        self.neg = {}  # same, for abs(value) of values < 0
+        self.zero = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    @staticmethod
+    def _index(magnitude):
+        return math.ceil(math.log(magnitude) / _LOG_GAMMA)
+
+    @staticmethod
+    def _value(index):
+        # Midpoint (in relative terms) of (GAMMA**(i-1), GAMMA**i]
+        return 2 * GAMMA ** index / (GAMMA + 1)
+
+    def add(self, value, n=1):
+        if value > MIN_INDEXABLE:
+            i = self._index(value)
+            self.pos[i] = self.pos.get(i, 0) + n
+        elif value < -MIN_INDEXABLE:
+            i = self._index(-value)
+            self.neg[i] = self.neg.get(i, 0) + n
+        else:
+            self.zero += n
+        self.count += n
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        for i, c in other.pos.items():
+            self.pos[i] = self.pos.get(i, 0) + c
+        for i, c in other.neg.items():
+            self.neg[i] = self.neg.get(i, 0) + c
+        self.zero += other.zero
+        self.count += other.count
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def _ordered(self):
+        """(representative value, count) for every non-empty bucket, ascending."""
+        for i in sorted(self.neg, reverse=True):
+            yield -self._value(i), self.neg[i]
+        if self.zero:
+            yield 0.0, self.zero
+        for i in sorted(self.pos):
+            yield self._value(i), self.pos[i]
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = 0
+        for value, c in self._ordered():
+            seen += c
+            if seen > rank:
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def bins(self, n=None):
+        """
+        Histogram bins as [{"lo", "hi", "count"}].
+
+        Without ``n`` the native log buckets are returned; otherwise counts
+        are re-binned into ``n`` equal-width bins between min and max.
+        """
+        if not self.count:
+            return []
+        if n is None:
+            out = []
+            for i in sorted(self.neg, reverse=True):
+                out.append({"lo": -GAMMA ** i, "hi": -GAMMA ** (i - 1), "count": self.neg[i]})
+            if self.zero:
+                out.append({"lo": 0.0, "hi": 0.0, "count": self.zero})
+            for i in sorted(self.pos):
+                out.append({"lo": GAMMA ** (i - 1), "hi": GAMMA ** i, "count": self.pos[i]})
+            return out
+
+        width = (self.max - self.min) / n or 1.0
+        counts = [0] * n
+        for value, c in self._ordered():
+            value = min(max(value, self.min), self.max)
+            counts[min(int((value - self.min) / width), n - 1)] += c
+        return [
+            {"lo": self.min + k * width, "hi": self.min + (k + 1) * width, "count": c}
+            for k, c in enumerate(counts)
+        ]
+
+    def summary(self, bins=None):
+        out = {"count": self.count, "min": self.min, "max": self.max}
+        for name, q in QUANTILES:
+            out[name] = self.quantile(q)
+        out["histogram"] = self.bins(bins)
+        return out
+
+    def to_dict(self):
+        return {
+            "p": {str(i): c for i, c in self.pos.items()},
+            "n": {str(i): c for i, c in self.neg.items()},
+            "z": self.zero,
+            "c": self.count,
+            "lo": self.min,
+            "hi": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        h = cls()
+        h.pos = {int(i): c for i, c in data.get("p", {}).items()}
+        h.neg = {int(i): c for i, c in data.get("n", {}).items()}
+        h.zero = data.get("z", 0)
+        h.count = data.get("c", 0)
+        h.min = data.get("lo")
+        h.max = data.get("hi")
+        return h
+
+
+def _combine(rows, granularities):
+    """Group (source, workflow, created_at, values) rows into sketch keys."""
+    combined = {}
+    for source, workflow, created_at, values in rows:
+        for granularity in granularities:
+            key = (granularity, source, workflow, floor_bucket(created_at, granularity))
+            hists = combined.get(key)
+            if hists is None:
+                hists = combined[key] = {short_key: Histogram() for short_key, _ in METRIC_FIELDS}
+            for (short_key, _), value in zip(METRIC_FIELDS, values):
+                hists[short_key].add(value)
+    return combined
+
+
+def _existing_sketches(keys, chunk=200):
+    """Fetch (and lock) the stored sketches for ``keys``, a few hundred per query."""
+    existing = {}
+    keys = list(keys)
+    for i in range(0, len(keys), chunk):
+        q = Q()
+        for granularity, source, workflow, bucket in keys[i:i + chunk]:
+            q |= Q(granularity=granularity, source=source, workflow=workflow, bucket=bucket)
+        for s in MetricSketch.objects.select_for_update().filter(q):
+            existing[(s.granularity, s.source, s.workflow, s.bucket)] = s
+    return existing
+
+
+def _save(combined):
+    if not combined:
+        return
+    with transaction.atomic():
+        existing = _existing_sketches(combined)
+        updated, created = [], []
+        for key, hists in combined.items():
+            sketch = existing.get(key)
+            if sketch is None:
+                granularity, source, workflow, bucket = key
+                sketch = MetricSketch(granularity=granularity, source=source,
+                                      workflow=workflow, bucket=bucket, data={})
+                created.append(sketch)
+            else:
+                updated.append(sketch)
+            for short_key, hist in hists.items():
+                if short_key in sketch.data:
+                    hist.merge(Histogram.from_dict(sketch.data[short_key]))
+                sketch.data[short_key] = hist.to_dict()
+            sketch.count = hists[METRIC_FIELDS[0][0]].count
+
+        MetricSketch.objects.bulk_update(updated, ["count", "data"], batch_size=500)
+        MetricSketch.objects.bulk_create(created, batch_size=500)
+
+
+def apply(metrics):
+    """Fold freshly stored metrics into the sketches."""
+    rows = (
+        (m.source, m.workflow, m.created_at,
+         [getattr(m, long_key) for _, long_key in METRIC_FIELDS])
+        for m in metrics
+    )
+    _save(_combine(rows, SKETCH_GRANULARITIES))
+
+
+def rebuild(granularities=SKETCH_GRANULARITIES, chunk_size=5000):
+    """Recompute sketches from the raw Metric table, keeping archived buckets."""
+    granularities = [g for g in granularities if g in SKETCH_GRANULARITIES]
+    if not granularities:
+        return 0
+    fields = ["source", "workflow", "created_at"] + [long_key for _, long_key in METRIC_FIELDS]
+    rows = (
+        (r[0], r[1], r[2], r[3:])
+        for r in (
+            Metric.objects.order_by().exclude(archived_q("created_at"))
+            .values_list(*fields).iterator(chunk_size=chunk_size)
+        )
+    )
+    combined = _combine(rows, granularities)
+    sketches = []
+    for (granularity, source, workflow, bucket), hists in combined.items():
+        sketches.append(MetricSketch(
+            granularity=granularity, source=source, workflow=workflow, bucket=bucket,
+            count=hists[METRIC_FIELDS[0][0]].count,
+            data={short_key: hist.to_dict() for short_key, hist in hists.items()},
+        ))
+    with transaction.atomic():
+        MetricSketch.objects.filter(granularity__in=granularities).exclude(
+            archived_q("bucket")
+        ).delete()
+        MetricSketch.objects.bulk_create(sketches, batch_size=500)
+    return len(sketches)
+
+
+def refresh(rows, chunk=200):
+    """
+    Recompute only the sketches holding ``rows``, (source, workflow,
+    created_at) tuples of metrics that were changed or deleted.
+
+    A histogram bucket count could be decremented, but not its min and max,
+    so each touched sketch is regrouped from the raw rows still in it.
+    """
+    keys = list({
+        (granularity, source, workflow, floor_bucket(created_at, granularity))
+        for source, workflow, created_at in rows
+        for granularity in SKETCH_GRANULARITIES
+    })
+    fields = ["source", "workflow", "created_at"] + [long_key for _, long_key in METRIC_FIELDS]
+    created = 0
+    with transaction.atomic():
+        for i in range(0, len(keys), chunk):
+            sketches, raw = Q(), {granularity: Q() for granularity in SKETCH_GRANULARITIES}
+            for granularity, source, workflow, bucket in keys[i:i + chunk]:
+                sketches |= Q(granularity=granularity, source=source, workflow=workflow,
+                              bucket=bucket)
+                raw[granularity] |= Q(source=source, workflow=workflow,
+                                      created_at__gte=bucket,
+                                      created_at__lt=bucket + STEP[granularity])
+            MetricSketch.objects.filter(sketches).delete()
+            for granularity, q in raw.items():
+                if not q:
+                    continue
+                combined = _combine(
+                    ((r[0], r[1], r[2], r[3:])
+                     for r in Metric.objects.filter(q).order_by().values_list(*fields)),
+                    [granularity],
+                )
+                _save(combined)
+                created += len(combined)
+    return created
+
+
+def window_histograms(source=None, workflow=None, start=None, end=None):
+    """Merge the sketches covering [start, end) into one Histogram per metric."""
+    qs = MetricSketch.objects.filter(window_filter(start, end, SKETCH_GRANULARITIES))
+    if source:
+        qs = qs.filter(source=source)
+    if workflow:
+        qs = qs.filter(workflow=workflow)
+
+    merged = {short_key: Histogram() for short_key, _ in METRIC_FIELDS}
+    for data in qs.values_list("data", flat=True).iterator():
+        for short_key, hist in merged.items():
+            if short_key in data:
+                hist.merge(Histogram.from_dict(data[short_key]))
+    return merged
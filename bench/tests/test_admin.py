@@ -0,0 +1,101 @@
+import csv
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from bench import admin as bench_admin
+from bench.ingest import build_metric, store_metrics
+from bench.models import Metric, MetricRollup, MetricSketch
+
+URL = "/admin/bench/metric/"
+T0 = datetime(2024, 1, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def metrics(db):
+    store_metrics([
+        build_metric({"source": "jenkins" if i % 2 else "github", "workflow": f"wf{i % 3}",
+                      "branch": "main", "run_id": str(i), "prt": i},
+                     created_at=T0 + timedelta(days=i))
+        for i in range(12)
+    ])
+
+
+def metric_sql(queries):
+    return [q["sql"] for q in queries if '"bench_metric"' in q["sql"]]
+
+
+def test_changelist_queries_are_bounded(admin_client, metrics):
+    with CaptureQueriesContext(connection) as ctx:
+        resp = admin_client.get(URL)
+    assert resp.status_code == 200
+    body = resp.content.decode()
+    assert "PRT" in body and ">11.0<" in body
+    assert "wf2" in body  # filter choice from the rollups
+    sql = metric_sql(ctx.captured_queries)
+    # Small table: the MIN/MAX(id) estimate is below the cap, so count up to it
+    assert all("LIMIT 10001" in q for q in sql if "COUNT(" in q)
+    assert not any("django_datetime_trunc" in q for q in sql)
+
+    with CaptureQueriesContext(connection) as ctx:
+        resp = admin_client.get(URL, {"created_at__year": "2024", "workflow": "wf1"})
+    assert resp.status_code == 200
+    sql = metric_sql(ctx.captured_queries)
+    assert not any("django_datetime_trunc" in q for q in sql)
+    [count] = [q for q in sql if "COUNT(" in q]
+    assert "LIMIT 10001" in count
+    # Months with data in 2024: January (day 0-1) ... February
+    assert "February" in resp.content.decode()
+
+
+def test_paginator_caps_filtered_counts(metrics, monkeypatch):
+    monkeypatch.setattr(bench_admin.EstimatedCountPaginator, "cap", 5)
+    assert bench_admin.EstimatedCountPaginator(Metric.objects.all(), 2).count == 12
+    jenkins = Metric.objects.filter(source="jenkins")
+    assert bench_admin.EstimatedCountPaginator(jenkins, 2).count == 5
+
+
+def test_paginator_counts_small_tables_across_id_gaps(metrics, monkeypatch):
+    monkeypatch.setattr(bench_admin.EstimatedCountPaginator, "cap", 5)
+    # The middle ten rows deleted: the id span still claims 12 rows, over the cap
+    ids = sorted(Metric.objects.values_list("pk", flat=True))
+    Metric.objects.filter(pk__in=ids[1:-1]).delete()
+    assert bench_admin.EstimatedCountPaginator(Metric.objects.all(), 2).count == 2
+    assert bench_admin.EstimatedCountPaginator(Metric.objects.all(), 2).num_pages == 1
+
+
+def test_bulk_actions_run_in_chunks(admin_client, metrics, monkeypatch):
+    monkeypatch.setattr(bench_admin, "ACTION_CHUNK", 4)
+    jenkins = list(Metric.objects.filter(source="jenkins").values_list("pk", flat=True))
+
+    resp = admin_client.post(URL, {"action": "export_csv", "_selected_action": jenkins})
+    rows = list(csv.DictReader(io.StringIO(b"".join(resp.streaming_content).decode())))
+    assert sorted(int(r["run_id"]) for r in rows) == list(range(1, 12, 2))
+
+    with CaptureQueriesContext(connection) as ctx:
+        admin_client.post(URL, {"action": "delete_in_chunks", "_selected_action": jenkins})
+    assert sum(q["sql"].startswith('DELETE FROM "bench_metric" WHERE') for q in ctx.captured_queries) == 2
+    assert set(Metric.objects.values_list("source", flat=True)) == {"github"}
+    day = MetricRollup.objects.filter(granularity="day")
+    assert set(day.values_list("source", flat=True)) == {"github"}
+
+
+def test_delete_regroups_only_touched_buckets(admin_client, metrics):
+    store_metrics([
+        build_metric({"source": "github", "workflow": "wf0", "branch": "main",
+                      "run_id": "late", "prt": 50}, created_at=T0 + timedelta(hours=6)),
+    ])
+    [late] = Metric.objects.filter(run_id="late").values_list("pk", flat=True)
+    untouched = MetricRollup.objects.get(granularity="day", bucket=T0 + timedelta(days=2))
+
+    admin_client.post(URL, {"action": "delete_in_chunks", "_selected_action": [late]})
+
+    day = MetricRollup.objects.get(granularity="day", bucket=T0)
+    assert (day.count, day.prt_min, day.prt_max, day.prt_sum) == (1, 0, 0, 0)
+    assert not MetricRollup.objects.filter(bucket=T0 + timedelta(hours=6)).exists()
+    assert MetricRollup.objects.get(pk=untouched.pk).count == 1
+    sketch = MetricSketch.objects.get(granularity="day", bucket=T0)
+    assert sketch.count == 1 and sketch.data["prt"]["hi"] == 0
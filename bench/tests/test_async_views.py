@@ -0,0 +1,38 @@
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import AsyncClient
+
+from bench.models import Metric
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_ingest_and_data():
+    async def scenario():
+        client = AsyncClient()
+        for lce in (10, 30):
+            response = await client.post(
+                "/api/metrics/ingest", data=json.dumps({"source": "jenkins", "lce": lce}),
+                content_type="application/json", headers={"X-Bench-Key": settings.BENCH_API_KEY},
+            )
+            assert response.status_code == 200
+        rows = await client.get("/api/metrics/data", {"source": "jenkins"})
+        series = await client.get("/api/metrics/data", {"source": "jenkins", "points": "10"})
+        columnar = await client.get("/api/metrics/data", {"source": "jenkins", "format": "columnar"})
+        cached = await client.get(
+            "/api/metrics/data", {"source": "jenkins"}, headers={"If-None-Match": rows["ETag"]},
+        )
+        return rows, series, columnar, cached
+
+    rows, series, columnar, cached = async_to_sync(scenario)()
+
+    assert Metric.objects.filter(source="jenkins").count() == 2
+    data = rows.json()
+    assert data["count"] == 2 and data["avg_lce"] == 20.0
+    assert [r["lce"] for r in data["rows"]] == [10.0, 30.0]
+    assert series.json()["series"]["lce"]["v"] == [10.0, 30.0]
+    columns = columnar.json()["rows"]
+    assert columns["lce"] == [10.0, 30.0] and columns["t"] == [r["t"] for r in data["rows"]]
+    assert cached.status_code == 304
@@ -0,0 +1,44 @@
+import io
+from datetime import datetime, timezone
+
+import pytest
+from django.core.management import call_command
+from django.test import Client
+
+from bench.models import Metric, MetricRollup
+from core.models import CICDRun
+
+T0 = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+
+
+def backfill(**opts):
+    out = io.StringIO()
+    call_command("backfill_cicd_runs", stdout=out, stderr=io.StringIO(), **opts)
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+def test_backfill_moves_runs_once():
+    runs = CICDRun.objects.bulk_create(
+        CICDRun(LCE=i, PRT=10 * i, APP_LAT=0.1 * i, source="GitHub" if i % 2 else "jenkins",
+                pipeline_ref="deploy", commit_sha=f"c{i}")
+        for i in range(5)
+    )
+    CICDRun.objects.create(source="travis", PRT=99)
+    CICDRun.objects.update(timestamp=T0)
+
+    assert "Copied 5 of 6" in backfill(chunk_size=2)
+    m = Metric.objects.get(run_id=f"cicdrun-{runs[3].pk}")
+    assert (m.source, m.workflow, m.commit_sha, m.created_at) == ("github", "deploy", "c3", T0)
+    assert (m.pipeline_recovery_time, m.app_latency) == (30, pytest.approx(0.3))
+
+    # Re-running copies nothing new; --delete then removes the copied rows
+    assert "Copied 0 of 6 CICDRun rows (5 already copied" in backfill(delete=True)
+    assert list(CICDRun.objects.values_list("source", flat=True)) == ["travis"]
+    assert Metric.objects.count() == 5
+
+    day = MetricRollup.objects.filter(granularity="day")
+    assert sum(day.values_list("count", flat=True)) == 5
+    assert sum(day.values_list("app_lat_sum", flat=True)) == pytest.approx(1.0)
+    data = Client().get("/api/metrics/data", {"source": "github"}).json()
+    assert data["avg_app_lat"] == pytest.approx(0.2)
@@ -0,0 +1,71 @@
+import json
+import multiprocessing
+
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from bench import caching
+
+URL = "/api/metrics/data"
+
+
+def ingest(client, **payload):
+    return client.post(
+        "/api/metrics/ingest", data=json.dumps(payload),
+        content_type="application/json", HTTP_X_BENCH_KEY=settings.BENCH_API_KEY,
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cached_response_etag_and_invalidation():
+    c = Client()
+    ingest(c, source="github", lce=10)
+
+    first = c.get(URL, {"source": "github"})
+    etag = first["ETag"]
+    assert etag.startswith('"') and not etag.startswith('W/')
+
+    with CaptureQueriesContext(connection) as ctx:
+        again = c.get(URL, {"source": "github"})
+        not_modified = c.get(URL, {"source": "github"}, HTTP_IF_NONE_MATCH=etag)
+    assert len(ctx.captured_queries) == 0
+    assert again.content == first.content
+    assert not_modified.status_code == 304 and not_modified.content == b""
+
+    ingest(c, source="github", lce=30)
+    fresh = c.get(URL, {"source": "github"}, HTTP_IF_NONE_MATCH=etag)
+    assert fresh.status_code == 200
+    assert fresh["ETag"] != etag
+    assert json.loads(fresh.content)["avg_lce"] == 20
+
+
+@pytest.mark.django_db
+def test_each_source_filter_is_cached_separately():
+    c = Client()
+    ingest(c, source="jenkins", prt=5)
+    assert c.get(URL, {"source": "jenkins"})["ETag"] != c.get(URL, {"source": "github"})["ETag"]
+    assert c.get(URL, {"start": "nope"}).status_code == 400
+
+
+def _bump_in_other_worker():
+    caching.get_version_file().bump()
+
+
+@pytest.mark.django_db
+def test_version_is_shared_between_worker_processes(settings, tmp_path):
+    settings.BENCH_CACHE_VERSION_PATH = tmp_path / "version"
+    c = Client()
+    c.get(URL)
+    version = caching.data_version()
+
+    child = multiprocessing.get_context("fork").Process(target=_bump_in_other_worker)
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+    assert caching.data_version() != version
+    with CaptureQueriesContext(connection) as ctx:
+        c.get(URL)
+    assert ctx.captured_queries  # this worker's cached copy is no longer used
@@ -0,0 +1,72 @@
+import statistics
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from bench.ingest import build_metric, store_metrics
+
+T0 = datetime(2024, 6, 3, 9, tzinfo=timezone.utc)
+
+PRT = {
+    ("github", "ci"): [50, 55, 60, 65],
+    ("jenkins", "ci"): [80, 90, 100],
+    ("jenkins", "deploy"): [200, 210],
+}
+
+
+@pytest.fixture(autouse=True)
+def seed(db):
+    cache.clear()
+    store_metrics([
+        build_metric({"source": source, "workflow": workflow, "prt": prt, "lce": 70},
+                     created_at=T0 + timedelta(hours=i))
+        for (source, workflow), values in PRT.items()
+        for i, prt in enumerate(values)
+    ])
+
+
+def test_compare_sources_in_one_query():
+    with CaptureQueriesContext(connection) as ctx:
+        data = Client().get("/api/metrics/compare").json()
+    assert sum("bench_metricrollup" in q["sql"] for q in ctx.captured_queries) == 1
+
+    github, jenkins = data["groups"]
+    jenkins_prt = PRT[("jenkins", "ci")] + PRT[("jenkins", "deploy")]
+    assert (github["source"], github["count"], jenkins["count"]) == ("github", 4, 5)
+    assert jenkins["prt"]["avg"] == pytest.approx(statistics.mean(jenkins_prt))
+    assert jenkins["prt"]["std"] == pytest.approx(statistics.stdev(jenkins_prt))
+    assert (jenkins["prt"]["min"], jenkins["prt"]["max"]) == (80, 210)
+
+    [pair] = data["comparisons"]
+    prt = pair["metrics"]["prt"]
+    assert (pair["a"], pair["b"], prt["better"]) == ("github", "jenkins", "github")
+    assert prt["delta"] == pytest.approx(57.5 - 136)
+    assert prt["relative_delta"] == pytest.approx((57.5 - 136) / 136)
+    pooled = ((3 * statistics.variance(PRT[("github", "ci")])
+               + 4 * statistics.variance(jenkins_prt)) / 7) ** 0.5
+    assert prt["effect_size"] == pytest.approx((57.5 - 136) / pooled)
+    # Identical values: no difference, no effect size
+    assert pair["metrics"]["lce"] == {
+        "delta": 0, "relative_delta": 0, "effect_size": None, "better": None,
+    }
+
+
+def test_compare_per_workflow_and_window():
+    c = Client()
+    data = c.get("/api/metrics/compare", {"group": "workflow"}).json()
+    assert [(g["source"], g["workflow"]) for g in data["groups"]] == [
+        ("github", "ci"), ("jenkins", "ci"), ("jenkins", "deploy"),
+    ]
+    assert [(p["a"], p["b"], p["workflow"]) for p in data["comparisons"]] == [
+        ("github", "jenkins", "ci"),
+    ]
+
+    window = {"start": (T0 + timedelta(hours=2)).isoformat(), "sources": "jenkins"}
+    [jenkins] = c.get("/api/metrics/compare", window).json()["groups"]
+    assert (jenkins["count"], jenkins["prt"]["avg"]) == (1, 100)
+    assert c.get("/api/metrics/compare", {"sources": "gitlab"}).status_code == 400
+    assert c.get("/api/metrics/compare", {"group": "branch"}).status_code == 400
@@ -0,0 +1,56 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from bench import views
+from bench.ingest import build_metric, store_metrics
+from bench.models import Metric
+
+URL = "/api/metrics/data"
+
+
+def ingest(*payloads):
+    store_metrics([build_metric(p) for p in payloads])
+    cache.clear()  # bump_version runs on commit, which the test transaction never does
+
+
+@pytest.mark.django_db
+def test_since_returns_only_new_rows_and_a_new_cursor():
+    client = Client()
+    ingest({"source": "github", "lce": 1}, {"source": "jenkins", "lce": 2})
+    full = client.get(URL, {"source": "github"}).json()
+    cursor = full["cursor"]
+    assert cursor == Metric.objects.latest("id").id
+
+    with CaptureQueriesContext(connection) as ctx:
+        idle = client.get(URL, {"source": "github", "since": cursor}).json()
+    assert idle == {"cursor": cursor, "has_more": False, "rows": []}
+    assert len(ctx.captured_queries) == 2  # the cursor and the id range, no aggregates
+
+    ingest({"source": "github", "lce": 3}, {"source": "jenkins", "lce": 4}, {"source": "github", "lce": 5})
+    delta = client.get(URL, {"source": "github", "since": cursor}).json()
+    assert [r["lce"] for r in delta["rows"]] == [3.0, 5.0]
+    assert delta["cursor"] == Metric.objects.latest("id").id
+    assert delta["count"] == 3 and delta["avg_lce"] == 3.0
+    assert client.get(URL, {"source": "github"}).json()["rows"] == full["rows"] + delta["rows"]
+
+    columnar = client.get(URL, {"source": "github", "since": cursor, "format": "columnar"}).json()
+    assert columnar["rows"]["lce"] == [3.0, 5.0]
+    assert client.get(URL, {"since": "x"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_since_pages_through_large_deltas(monkeypatch):
+    monkeypatch.setattr(views, "DELTA_LIMIT", 2)
+    ingest(*({"source": "github", "lce": i} for i in range(5)))
+    client = Client()
+    cursor, seen = 0, []
+    while True:
+        delta = client.get(URL, {"since": cursor}).json()
+        seen += [r["lce"] for r in delta["rows"]]
+        cursor = delta["cursor"]
+        if not delta["has_more"]:
+            break
+    assert seen == [0.0, 1.0, 2.0, 3.0, 4.0]
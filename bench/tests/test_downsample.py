@@ -0,0 +1,72 @@
+import json
+import math
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from bench import downsample
+from bench.ingest import build_metric, store_metrics
+from bench.models import Metric
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    xs = list(range(1000))
+    ys = [math.sin(x / 50) for x in xs]
+    ys[517] = 25.0  # spike must survive
+    keep = downsample.lttb(xs, ys, 50)
+    assert len(keep) == 50
+    assert keep[0] == 0 and keep[-1] == 999
+    assert keep == sorted(keep)
+    assert 517 in keep
+    assert downsample.lttb(xs[:10], ys[:10], 50) == list(range(10))
+
+
+def test_bucket_avg_min_max():
+    xs = [0, 1, 2, 3, 10, 11]
+    ys = [1, 3, 5, 7, 0, 4]
+    out = downsample.bucket(xs, ys, 2)
+    assert out["v"] == [4, 2]
+    assert out["min"] == [1, 0] and out["max"] == [7, 4]
+
+
+@pytest.mark.django_db
+def test_metrics_data_returns_downsampled_series():
+    cache.clear()
+    Metric.objects.bulk_create(
+        Metric(source="github", pipeline_recovery_time=i % 17) for i in range(500)
+    )
+    data = json.loads(Client().get("/api/metrics/data", {"points": 40}).content)
+    assert "rows" not in data
+    assert len(data["series"]["prt"]["t"]) == 40
+
+    avg = json.loads(Client().get("/api/metrics/data", {"points": 10, "method": "avg"}).content)
+    assert len(avg["series"]["lce"]["v"]) <= 10
+    assert Client().get("/api/metrics/data", {"points": 10, "method": "x"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_large_windows_are_downsampled_from_rollups(monkeypatch):
+    cache.clear()
+    t0 = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    store_metrics([
+        build_metric({"source": "github", "lce": i % 10, "prt": i}, created_at=t0 + timedelta(minutes=i))
+        for i in range(600)
+    ])
+    monkeypatch.setattr(downsample, "RAW_ROWS_PER_POINT", 1)  # 600 rows > 1 per point
+
+    with CaptureQueriesContext(connection) as ctx:
+        avg = Client().get("/api/metrics/data", {"points": 10, "method": "avg"}).json()
+        lttb = Client().get("/api/metrics/data", {"points": 5, "source": "github"}).json()
+    assert not [q for q in ctx.captured_queries if '"bench_metric"."created_at"' in q["sql"]]
+
+    prt = avg["series"]["prt"]
+    assert len(prt["v"]) == 10
+    assert prt["min"][0] == 0 and prt["max"][-1] == 599
+    assert sum(prt["v"]) / 10 == pytest.approx(299.5)  # equal-sized buckets
+    # LTTB over the hour buckets: 10 hours of data, capped at 10 buckets per point
+    assert len(lttb["series"]["lce"]["t"]) == 5
+    assert lttb["series"]["prt"]["v"][0] == pytest.approx(29.5)  # mean of the first hour
@@ -0,0 +1,67 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.test import AsyncClient, Client
+
+from bench.models import Metric
+
+
+def seed(n=30):
+    Metric.objects.bulk_create(
+        Metric(source="jenkins" if i % 2 else "github", workflow="ci",
+               layer_cache_efficiency=i, notes=f"run, {i}")
+        for i in range(n)
+    )
+
+
+@pytest.mark.django_db
+def test_csv_export_streams_all_rows():
+    seed()
+    resp = Client().get("/api/metrics/export", {"source": "jenkins"})
+    assert resp.streaming
+    assert resp["Content-Disposition"] == 'attachment; filename="metrics.csv"'
+    rows = list(csv.DictReader(io.StringIO(b"".join(resp.streaming_content).decode())))
+    assert len(rows) == 15
+    assert {r["source"] for r in rows} == {"jenkins"}
+    assert rows[0]["notes"] == "run, 1"
+    assert [float(r["lce"]) for r in rows] == list(range(1, 30, 2))
+
+
+@pytest.mark.django_db
+def test_gzipped_ndjson_export():
+    seed()
+    resp = Client().get("/api/metrics/export", {"format": "ndjson", "gzip": "1"})
+    assert resp["Content-Type"] == "application/gzip"
+    lines = gzip.decompress(b"".join(resp.streaming_content)).decode().splitlines()
+    assert len(lines) == 30
+    assert json.loads(lines[-1])["lce"] == 29
+    assert Client().get("/api/metrics/export", {"format": "xml"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_export_streams_asynchronously_under_asgi():
+    seed()
+
+    async def download():
+        resp = await AsyncClient().get("/api/metrics/export", {"format": "ndjson", "gzip": "1"})
+        return resp, b"".join([chunk async for chunk in resp.streaming_content])
+
+    resp, body = async_to_sync(download)()
+    assert resp.is_async  # a sync iterator would be read into memory first
+    lines = gzip.decompress(body).decode().splitlines()
+    assert [json.loads(line)["lce"] for line in lines] == list(range(30))
+
+
+@pytest.mark.django_db
+def test_export_metrics_command(tmp_path):
+    seed(5)
+    out = tmp_path / "m.ndjson.gz"
+    call_command("export_metrics", format="ndjson", gzip=True, output=str(out),
+                 chunk_size=2, stderr=io.StringIO())
+    lines = gzip.decompress(out.read_bytes()).decode().splitlines()
+    assert [json.loads(line)["lce"] for line in lines] == [0, 1, 2, 3, 4]
@@ -0,0 +1,71 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.db import connection
+from django.test import Client
+
+from bench.models import Metric
+
+URL = "/api/metrics/history"
+T0 = datetime(2025, 11, 1, tzinfo=timezone.utc)
+
+
+def seed():
+    # Pairs of rows share a timestamp to exercise the id tie-breaker.
+    Metric.objects.bulk_create(
+        Metric(
+            created_at=T0 + timedelta(minutes=i // 2),
+            source="jenkins" if i % 3 else "github",
+            branch="main" if i % 2 else "dev",
+            pipeline_recovery_time=i,
+        )
+        for i in range(25)
+    )
+
+
+def pages(params):
+    c = Client()
+    cursor, seen = None, []
+    while True:
+        query = dict(params, **({"cursor": cursor} if cursor else {}))
+        data = json.loads(c.get(URL, query).content)
+        seen.append([r["id"] for r in data["rows"]])
+        cursor = data["next_cursor"]
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.django_db
+def test_keyset_pages_cover_history_exactly_once():
+    seed()
+    seen = pages({"limit": 4})
+    ids = [pk for page in seen for pk in page]
+    expected = list(
+        Metric.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+    )
+    assert ids == expected
+    assert [len(p) for p in seen] == [4] * 6 + [1]
+
+
+@pytest.mark.django_db
+def test_history_filters():
+    seed()
+    seen = pages({"source": "jenkins", "branch": "main", "limit": 3})
+    ids = {pk for page in seen for pk in page}
+    assert ids == set(
+        Metric.objects.filter(source="jenkins", branch="main").values_list("id", flat=True)
+    )
+    assert Client().get(URL, {"cursor": "garbage"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_history_pages_use_index():
+    seed()
+    qs = Metric.objects.filter(source="jenkins").order_by("-created_at", "-id")[:5]
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+    assert "bench_metric_src_created" in plan
+    assert "TEMP B-TREE" not in plan
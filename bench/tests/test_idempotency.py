@@ -0,0 +1,94 @@
+import json
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from bench.models import Metric, MetricRollup
+
+RUN = {"source": "github", "workflow": "ci", "run_id": "42", "run_attempt": "1", "prt": 30}
+
+
+def post(client, path, body, **headers):
+    return client.post(path, data=json.dumps(body), content_type="application/json",
+                       HTTP_X_BENCH_KEY=settings.BENCH_API_KEY, **headers)
+
+
+@pytest.mark.django_db
+def test_repeated_run_is_stored_once():
+    c = Client()
+    first = post(c, "/api/metrics/ingest", RUN).json()
+    again = post(c, "/api/metrics/ingest", dict(RUN, prt=99)).json()
+    rerun = post(c, "/api/metrics/ingest", dict(RUN, run_attempt="2")).json()
+
+    assert first["status"] == "stored"
+    assert again == {"status": "duplicate", "id": first["id"]}
+    assert rerun["status"] == "stored" and rerun["id"] != first["id"]
+    assert Metric.objects.count() == 2
+    assert MetricRollup.objects.get(granularity="day").count == 2
+
+    # Rows without a run_id are never treated as repeats
+    post(c, "/api/metrics/ingest", {"source": "github"})
+    post(c, "/api/metrics/ingest", {"source": "github"})
+    assert Metric.objects.filter(run_id="").count() == 2
+
+
+@pytest.mark.django_db
+def test_batch_reports_duplicates():
+    c = Client()
+    post(c, "/api/metrics/ingest", RUN)
+    other = dict(RUN, run_id="43")
+    data = post(c, "/api/metrics/ingest/batch", [RUN, other, other, {"source": "nope"}]).json()
+
+    assert (data["stored"], data["duplicates"], data["rejected"]) == (1, 2, 1)
+    statuses = [r["status"] for r in data["results"]]
+    assert statuses == ["duplicate", "stored", "duplicate", "error"]
+    assert data["results"][1]["id"] == data["results"][2]["id"]
+
+
+@pytest.mark.django_db
+def test_idempotency_key_replays_without_db_work():
+    c = Client()
+    first = post(c, "/api/metrics/ingest", RUN, HTTP_IDEMPOTENCY_KEY="abc")
+
+    with CaptureQueriesContext(connection) as ctx:
+        retry = post(c, "/api/metrics/ingest", RUN, HTTP_IDEMPOTENCY_KEY="abc")
+    assert len(ctx.captured_queries) == 0
+    assert retry.content == first.content
+    assert retry["Idempotent-Replayed"] == "true"
+
+    reused = post(c, "/api/metrics/ingest", dict(RUN, prt=1), HTTP_IDEMPOTENCY_KEY="abc")
+    assert reused.status_code == 422
+
+    # Nor to another client that picked the same key
+    with override_settings(BENCH_API_KEYS={settings.BENCH_API_KEY: "default", "k2": "other"}):
+        other = c.post("/api/metrics/ingest", data=json.dumps(RUN), content_type="application/json",
+                       HTTP_X_BENCH_KEY="k2", HTTP_IDEMPOTENCY_KEY="abc")
+    assert other.json()["status"] == "duplicate" and not other.has_header("Idempotent-Replayed")
+
+    # Without the API key the cached response is not handed out
+    anonymous = c.post("/api/metrics/ingest", data=json.dumps(RUN),
+                       content_type="application/json", HTTP_IDEMPOTENCY_KEY="abc")
+    assert anonymous.status_code == 403
+
+
+@pytest.mark.django_db
+def test_run_lookup_uses_unique_index():
+    from bench.ingest import _stored_runs
+
+    with CaptureQueriesContext(connection) as ctx:
+        _stored_runs({("github", "ci", "42", "1")})
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + ctx.captured_queries[0]["sql"])
+        plan = " ".join(str(row) for row in cursor.fetchall())
+    assert "bench_metric_unique_run" in plan
+
+
+@pytest.mark.django_db
+def test_dedupe_command_dry_run(capsys):
+    post(Client(), "/api/metrics/ingest", RUN)
+    call_command("dedupe_metrics", "--dry-run")
+    assert "0 runs stored more than once" in capsys.readouterr().out
@@ -0,0 +1,95 @@
+import gzip
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+
+from bench import export, importer
+from bench.models import ImportCheckpoint, Metric
+
+
+def seed(n=6):
+    Metric.objects.bulk_create(
+        Metric(source="jenkins" if i % 2 else "github", workflow="ci", run_id=str(i),
+               run_attempt="1", layer_cache_efficiency=i, notes=f"run, {i}\nretried")
+        for i in range(n)
+    )
+
+
+def import_metrics(*paths, **opts):
+    out = io.StringIO()
+    call_command("import_metrics", *map(str, paths), stdout=out, stderr=io.StringIO(), **opts)
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+@pytest.mark.django_db
+def test_csv_export_round_trips(tmp_path):
+    seed()
+    before = list(export.iter_rows())
+    path = tmp_path / "metrics.csv.gz"
+    path.write_bytes(b"".join(export.stream(None, "csv", gzip=True)))
+    Metric.objects.all().delete()
+
+    [stats] = import_metrics(path, workers=1, chunk_rows=4)
+    assert (stats["format"], stats["records"], stats["stored"]) == ("csv", 6, 6)
+    # Same rows (quoted newlines included) apart from the new ids
+    assert [row[1:] for row in export.iter_rows()] == [row[1:] for row in before]
+
+    # Importing the same runs again stores nothing
+    [stats] = import_metrics(path, workers=1, restart=True)
+    assert (stats["stored"], stats["duplicates"]) == (0, 6)
+
+
+@pytest.mark.django_db
+def test_import_resumes_after_a_failed_chunk(tmp_path, monkeypatch):
+    path = tmp_path / "history.jsonl"
+    rows = [{"source": "github", "workflow": "ci", "run_id": str(i), "prt": i,
+             "t": f"2024-03-01T00:0{i}:00Z"} for i in range(7)]
+    lines = [json.dumps(row) for row in rows]
+    lines.insert(3, '{"source": "gitlab"}')
+    path.write_text("\n".join(lines) + "\n")
+
+    real_store = importer.store_metrics
+    calls = []
+
+    def flaky_store(metrics, **kwargs):
+        calls.append(len(metrics))
+        if len(calls) == 3:
+            raise RuntimeError("disk full")
+        return real_store(metrics, **kwargs)
+
+    monkeypatch.setattr(importer, "store_metrics", flaky_store)
+    with pytest.raises(RuntimeError):
+        importer.Importer(workers=1, chunk_rows=3).import_file(path)
+    assert Metric.objects.count() == 5
+    assert ImportCheckpoint.objects.get().records == 6
+
+    monkeypatch.setattr(importer, "store_metrics", real_store)
+    [stats] = import_metrics(path, workers=1, chunk_rows=3)
+    assert (stats["resumed_at_record"], stats["records"], stats["stored"]) == (6, 2, 2)
+    assert Metric.objects.count() == 7
+    assert sorted(Metric.objects.values_list("pipeline_recovery_time", flat=True)) == list(range(7))
+    assert Metric.objects.get(run_id="6").created_at.minute == 6
+
+
+@pytest.mark.django_db
+def test_rejected_rows_are_reported(tmp_path):
+    path = tmp_path / "bad.ndjson.gz"
+    path.write_bytes(gzip.compress(b'{"lce": 1}\nnot json\n{"lce": "x"}\n\n[1]\n'))
+    err = io.StringIO()
+    call_command("import_metrics", str(path), workers=1, stdout=io.StringIO(), stderr=err)
+    assert Metric.objects.count() == 1
+    assert "record 2:" in err.getvalue() and "record 3: lce must be a number" in err.getvalue()
+    assert "record 5: Row must be a JSON object" in err.getvalue()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parsing_in_a_process_pool(tmp_path):
+    path = tmp_path / "history.jsonl"
+    path.write_text("".join(
+        json.dumps({"source": "jenkins", "run_id": str(i), "smo": i}) + "\n" for i in range(50)
+    ))
+    [stats] = import_metrics(path, workers=2, chunk_rows=7)
+    assert (stats["records"], stats["stored"], stats["rejected"]) == (50, 50, 0)
+    assert sorted(Metric.objects.values_list("secrets_mgmt_overhead", flat=True)) == list(range(50))
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+from django.conf import settings
+from django.test import Client
+
+from bench.models import Metric
+
+URL = "/api/metrics/ingest/batch"
+
+
+def post(body, content_type="application/json"):
+    return Client().post(
+        URL, data=body, content_type=content_type,
+        HTTP_X_BENCH_KEY=settings.BENCH_API_KEY,
+    )
+
+
+@pytest.mark.django_db
+def test_batch_accepts_json_array_with_short_and_long_keys():
+    rows = [
+        {"source": "jenkins", "workflow": "build", "lce": 80, "prt": 12.5},
+        {"source": "github", "layer_cache_efficiency": 70, "dynamic_env_time": 3},
+    ]
+    resp = post(json.dumps(rows))
+    assert resp.status_code == 200
+    data = json.loads(resp.content)
+    assert data["stored"] == 2 and data["rejected"] == 0
+    assert [r["status"] for r in data["results"]] == ["stored", "stored"]
+
+    first = Metric.objects.get(id=data["results"][0]["id"])
+    assert first.source == "jenkins"
+    assert first.layer_cache_efficiency == 80
+    assert first.pipeline_recovery_time == 12.5
+    assert Metric.objects.get(id=data["results"][1]["id"]).dynamic_env_time == 3
+
+
+@pytest.mark.django_db
+def test_batch_ndjson_reports_per_row_errors():
+    body = "\n".join([
+        json.dumps({"source": "github", "lce": 1}),
+        "{not json",
+        json.dumps({"source": "gitlab", "lce": 2}),
+        json.dumps({"source": "codepipeline", "prt": "abc"}),
+        json.dumps({"source": "codepipeline", "prt": "4.5"}),
+    ])
+    resp = post(body, content_type="application/x-ndjson")
+    data = json.loads(resp.content)
+    assert data["stored"] == 2 and data["rejected"] == 3
+    assert [r["status"] for r in data["results"]] == [
+        "stored", "error", "error", "error", "stored",
+    ]
+    assert Metric.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_batch_requires_api_key_and_rows():
+    c = Client()
+    assert c.post(URL, data="[]", content_type="application/json").status_code == 403
+    assert post("[]").status_code == 400
+    assert post("[1, 2").status_code == 400
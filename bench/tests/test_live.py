@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import AsyncClient, Client
+
+from bench import live
+from bench.ingest import build_metric, store_metrics
+
+
+def store(**payload):
+    return store_metrics([build_metric(payload)])[0]
+
+
+def event_names(events):
+    return [line for e in events for line in e.split("\n") if line.startswith("event: ")]
+
+
+def test_stream_needs_asgi():
+    response = Client().get("/api/metrics/stream")
+    assert response.status_code == 501
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_rejects_bad_since():
+    async def request():
+        response = await AsyncClient().get("/api/metrics/stream", {"since": "x"})
+        assert response.status_code == 400
+
+    async_to_sync(request)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_broadcaster_fans_out_and_replays():
+    first = store(source="github", lce=10)
+
+    async def scenario():
+        broadcaster = live.Broadcaster(interval=0.01)
+        everything, _ = await broadcaster.subscribe()
+        jenkins, _ = await broadcaster.subscribe(source="jenkins")
+        broadcaster._task.cancel()
+
+        await sync_to_async(store)(source="jenkins", lce=20)
+        await sync_to_async(store)(source="github", lce=30)
+        assert await broadcaster.poll_once() == 2
+
+        all_events = [everything.get_nowait() for _ in range(everything.qsize())]
+        jenkins_events = [jenkins.get_nowait() for _ in range(jenkins.qsize())]
+
+        # Resuming after the first row replays the two newer ones
+        _, backlog = await broadcaster.subscribe(after_id=first.id)
+        return all_events, jenkins_events, backlog
+
+    all_events, jenkins_events, backlog = async_to_sync(scenario)()
+
+    assert event_names(all_events).count("event: metric") == 2
+    assert event_names(jenkins_events) == ["event: metric", "event: aggregates"]
+    assert '"source":"jenkins"' in jenkins_events[0]
+    assert '"count":1' in jenkins_events[1]
+    assert len(backlog) == 2 and backlog[0].startswith(f"id: {first.id + 1}\n")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_each_subscriber_gets_one_aggregates_event():
+    async def scenario():
+        broadcaster = live.Broadcaster(interval=0.01)
+        queues = [(await broadcaster.subscribe(source))[0] for source in ("github", "github", None)]
+        broadcaster._task.cancel()
+        await sync_to_async(store)(source="github", lce=10)
+        await sync_to_async(store)(source="jenkins", lce=20)
+        assert await broadcaster.poll_once() == 2
+        return [[q.get_nowait() for _ in range(q.qsize())] for q in queues]
+
+    first, second, everything = async_to_sync(scenario)()
+    assert event_names(first) == event_names(second) == ["event: metric", "event: aggregates"]
+    assert event_names(everything) == ["event: metric", "event: metric", "event: aggregates"]
+    assert '"count":2' in everything[-1]  # both sources, not github's
+
+
+@pytest.mark.django_db(transaction=True)
+def test_event_stream_heartbeat():
+    async def first_events():
+        stream = live.event_stream(heartbeat=0.01)
+        try:
+            return [await stream.__anext__(), await stream.__anext__()]
+        finally:
+            await stream.aclose()
+            for task in [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]:
+                task.cancel()
+
+    assert async_to_sync(first_events)() == ["retry: 3000\n\n", ": keep-alive\n\n"]
@@ -0,0 +1,30 @@
+import random
+
+import pytest
+
+from bench.perf import loadgen
+
+
+def test_parse_mix_and_payload_shapes():
+    mix = loadgen.parse_mix("ingest=3, data", loadgen.scenarios())
+    assert mix == [("ingest", 3.0), ("data", 1.0)]
+    with pytest.raises(ValueError):
+        loadgen.parse_mix("nope=1", loadgen.scenarios())
+
+    rng = random.Random(1)
+    assert "lce" in loadgen.make_payload(rng, "short")
+    assert "layer_cache_efficiency" in loadgen.make_payload(rng, "long")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_in_process_run_reports_latency_and_queries():
+    report = loadgen.run(
+        loadgen.InProcessTransport,
+        mix=[("ingest", 1), ("batch", 1), ("data", 1), ("dashboard", 1)],
+        requests=20, concurrency=1, batch_size=5,
+    )
+    overall = report["overall"]
+    assert overall["requests"] == 20 and overall["errors"] == 0
+    assert report["worker_errors"] == []
+    assert overall["latency_ms"]["p50"] <= overall["latency_ms"]["p99"]
+    assert report["scenarios"]["ingest"]["db_queries_per_request"] > 0
@@ -0,0 +1,267 @@
+"""
+Query budgets, query plans and latency baselines for the bench views.
+
+A module-scoped fixture seeds BENCH_PERF_ROWS synthetic metrics (10^4 by
+default; set 10^5 or 10^6 for a real run) with their rollups, sketches
+and regressions. For every endpoint in ENDPOINTS the tests check that
+
+- it runs at most its budget of queries (an N+1 shows up here),
+- every query on the raw bench_metric table uses an index or the primary
+  key (EXPLAIN QUERY PLAN: no bare "SCAN bench_metric"), and the indexes
+  it is meant to use appear in the plans,
+- its median wall-clock time is within BENCH_PERF_TOLERANCE x the stored
+  baseline (perf_baseline.json, per row count).
+
+The query budgets and plans are checked on every run. The timings
+(marked ``perf``) are too noisy for shared CI runners and only run when
+asked for: BENCH_PERF_TIMINGS=1, or any BENCH_PERF_ROWS. Baselines are
+scaled by a calibration workload timed on both machines, so a slower
+machine doesn't fail them all. BENCH_PERF_UPDATE=1 records the current
+timings as the new baseline for this row count.
+"""
+
+import json
+import os
+import random
+import re
+import sqlite3
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.test import Client
+
+from bench import regressions, rollups, stats
+from bench.ingest import build_metric
+from bench.models import Metric
+from bench.perf.loadgen import make_payload
+
+ROWS = int(os.environ.get("BENCH_PERF_ROWS", "10000"))
+REPEAT = int(os.environ.get("BENCH_PERF_REPEAT", "5"))
+TOLERANCE = float(os.environ.get("BENCH_PERF_TOLERANCE", "2.0"))
+# Timings this small are mostly noise; never fail on less than this.
+SLACK_MS = 5.0
+UPDATE = os.environ.get("BENCH_PERF_UPDATE") == "1"
+TIMINGS = UPDATE or os.environ.get("BENCH_PERF_TIMINGS") == "1" or "BENCH_PERF_ROWS" in os.environ
+# Also write this run's timings (JSON) here
+REPORT = os.environ.get("BENCH_PERF_REPORT")
+BASELINE_PATH = Path(__file__).with_name("perf_baseline.json")
+
+T0 = datetime(2025, 1, 1, tzinfo=timezone.utc)
+DAYS = 90
+
+# name -> (path, params, query budget, index (or "INTEGER PRIMARY KEY")
+# each must use on bench_metric). "T0+n" is n days into the data, "LAST-n"
+# the id n rows before the newest. stats, compare and the avg series read
+# only the rollups and sketches.
+ENDPOINTS = {
+    "dashboard": ("/", {}, 0, set()),
+    "data": ("/api/metrics/data", {}, 4, {"bench_metric_created"}),
+    "data_source_window": (
+        "/api/metrics/data", {"source": "github", "start": "T0+30", "end": "T0+60"},
+        4, {"bench_metric_src_created"},
+    ),
+    "data_columnar": (
+        "/api/metrics/data", {"source": "jenkins", "format": "columnar"}, 4, {"bench_metric_src_created"},
+    ),
+    "data_points": ("/api/metrics/data", {"source": "github", "points": "400"}, 4, {"bench_metric_src_created"}),
+    "data_points_avg": ("/api/metrics/data", {"points": "400", "method": "avg"}, 4, set()),
+    "data_since": ("/api/metrics/data", {"since": "LAST-50"}, 3, {"INTEGER PRIMARY KEY"}),
+    "history": ("/api/metrics/history", {"limit": "100"}, 2, {"bench_metric_created"}),
+    "history_filtered": (
+        "/api/metrics/history", {"workflow": "ci", "branch": "main", "limit": "100"},
+        2, {"bench_metric_wf_br_created"},
+    ),
+    "stats": ("/api/metrics/stats", {"source": "github"}, 1, set()),
+    "compare": ("/api/metrics/compare", {"start": "T0+30"}, 1, set()),
+    "regressions": ("/api/metrics/regressions", {"limit": "50"}, 2, {"INTEGER PRIMARY KEY"}),
+    "export_window": (
+        "/api/metrics/export", {"source": "codepipeline", "start": "T0+80"}, 2, {"bench_metric_src_created"},
+    ),
+    "admin_changelist": ("/admin/bench/metric/", {}, 10, {"bench_metric_created"}),
+    "admin_changelist_filtered": (
+        "/admin/bench/metric/", {"source__exact": "github", "workflow": "ci"}, 9, {"bench_metric_src_created"},
+    ),
+}
+
+# Plan steps of a query on bench_metric that read or sort the whole table
+# (an index SCAN is fine: with ORDER BY ... LIMIT it stops early)
+FULL_SCAN = re.compile(r"^SCAN bench_metric$|^USE TEMP B-TREE FOR ORDER BY")
+
+
+def seed(n, chunk=10000):
+    """
+    ``n`` metrics spread over DAYS days, plus their rollups, sketches and
+    regressions. Rows are inserted with executemany: bulk_create spends
+    most of its time preparing model instances, minutes at 10^6 rows.
+    """
+    rng = random.Random(25)
+    span = DAYS * 24 * 3600
+    db = connections[DEFAULT_DB_ALIAS]  # not the proxy: it is read once per value
+    fields = [f for f in Metric._meta.concrete_fields if not f.primary_key]
+    sql = 'INSERT INTO "%s" (%s) VALUES (%s)' % (
+        Metric._meta.db_table,
+        ", ".join(f'"{f.column}"' for f in fields),
+        ", ".join(["%s"] * len(fields)),
+    )
+    with transaction.atomic(), db.cursor() as cursor:
+        for i in range(0, n, chunk):
+            metrics = [
+                build_metric(make_payload(rng), created_at=T0 + timedelta(seconds=rng.randrange(span)))
+                for _ in range(min(chunk, n - i))
+            ]
+            cursor.executemany(sql, [
+                [f.get_db_prep_save(getattr(m, f.attname), db) for f in fields] for m in metrics
+            ])
+        rollups.rebuild()
+        stats.rebuild()
+        regressions.rebuild()
+
+
+@pytest.fixture(scope="module")
+def perf_db(django_db_setup, django_db_blocker):
+    """Seeded for the whole module (committed), emptied again afterwards."""
+    with django_db_blocker.unblock():
+        seed(ROWS)
+        # No password: hashing one per test would dominate the setup time
+        admin = User.objects.create_superuser("perf", password=None)
+        yield admin
+        admin.delete()
+        with connection.constraint_checks_disabled(), connection.cursor() as cursor:
+            for table in connection.introspection.table_names():
+                if table.startswith("bench_"):
+                    cursor.execute(f'DELETE FROM "{table}"')
+
+
+def resolve(params):
+    out = {}
+    for key, value in params.items():
+        if value.startswith("T0+"):
+            value = (T0 + timedelta(days=int(value[3:]))).isoformat()
+        elif value.startswith("LAST-"):
+            value = str(Metric.objects.latest("id").id - int(value[5:]))
+        out[key] = value
+    return out
+
+
+class QueryLog:
+    """execute_wrapper recording (sql, params) of every query."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def get(client, path, params):
+    response = client.get(path, params)
+    if response.streaming:
+        b"".join(response.streaming_content)
+    return response
+
+
+def plans(queries):
+    """EXPLAIN QUERY PLAN details of the SELECTs on bench_metric."""
+    out = []
+    with connection.cursor() as cursor:
+        for sql, params in queries:
+            if not sql.lstrip().upper().startswith("SELECT") or '"bench_metric"' not in sql:
+                continue
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            out.append((sql, [row[-1] for row in cursor.fetchall()]))
+    return out
+
+
+@pytest.fixture
+def client(perf_db):
+    client = Client()
+    client.force_login(perf_db)
+    return client
+
+
+def calibrate():
+    """Milliseconds a fixed SQLite + Python workload takes: the machine's speed."""
+    best = None
+    for _ in range(3):
+        t0 = time.perf_counter()
+        db = sqlite3.connect(":memory:")
+        db.execute("CREATE TABLE t (k INTEGER, v REAL)")
+        db.executemany("INSERT INTO t VALUES (?, ?)", ((i % 97, i * 0.5) for i in range(50000)))
+        db.execute("CREATE INDEX t_k ON t (k)")
+        json.dumps(db.execute("SELECT k, SUM(v), COUNT(*) FROM t GROUP BY k ORDER BY k").fetchall())
+        db.close()
+        ms = (time.perf_counter() - t0) * 1000
+        best = ms if best is None else min(best, ms)
+    return best
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    """(stored baseline for ROWS or None, this run's timings); saves them with BENCH_PERF_UPDATE=1."""
+    stored = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    run = {"calibration_ms": round(calibrate(), 2), "timings_ms": {}}
+    yield stored.get(str(ROWS)), run
+    if UPDATE and run["timings_ms"]:
+        previous = stored.get(str(ROWS), {}).get("timings_ms", {})
+        stored[str(ROWS)] = {**run, "timings_ms": {**previous, **run["timings_ms"]}}
+        BASELINE_PATH.write_text(json.dumps(stored, indent=2, sort_keys=True) + "\n")
+    if REPORT:
+        Path(REPORT).write_text(json.dumps({"rows": ROWS, **run}, indent=2) + "\n")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("name", list(ENDPOINTS))
+def test_query_budget_and_plans(client, name):
+    path, params, budget, indexes = ENDPOINTS[name]
+    params = resolve(params)
+    cache.clear()
+    log = QueryLog()
+    with connection.execute_wrapper(log):
+        response = get(client, path, params)
+    assert response.status_code == 200
+
+    sql = "\n".join(q for q, _ in log.queries)
+    assert len(log.queries) <= budget, f"{len(log.queries)} queries, budget {budget}:\n{sql}"
+    used = set()
+    for query, details in plans(log.queries):
+        for detail in details:
+            assert not FULL_SCAN.search(detail), f"{detail} in the plan of\n{query}"
+            used.update(index for index in indexes if index in detail)
+    assert used == indexes, f"expected {indexes} in the plans of\n{sql}"
+
+
+@pytest.mark.perf
+@pytest.mark.skipif(not TIMINGS, reason="timings are opt-in: set BENCH_PERF_TIMINGS=1")
+@pytest.mark.django_db
+@pytest.mark.parametrize("name", list(ENDPOINTS))
+def test_latency_within_baseline(client, baseline, record_property, name):
+    path, params, _, _ = ENDPOINTS[name]
+    params = resolve(params)
+    get(client, path, params)  # warm up
+    samples = []
+    for _ in range(REPEAT):
+        cache.clear()
+        t0 = time.perf_counter()
+        get(client, path, params)
+        samples.append((time.perf_counter() - t0) * 1000)
+    ms = statistics.median(samples)
+    record_property("median_ms", round(ms, 2))
+    stored, run = baseline
+    run["timings_ms"][name] = round(ms, 2)
+
+    if UPDATE:
+        return
+    if not stored or name not in stored["timings_ms"]:
+        pytest.skip(f"no {ROWS}-row baseline for {name} (record one with BENCH_PERF_UPDATE=1)")
+    # Scaled to this machine's speed
+    expected = stored["timings_ms"][name] * run["calibration_ms"] / stored["calibration_ms"]
+    assert ms <= expected * TOLERANCE + SLACK_MS, (
+        f"{name}: median {ms:.1f} ms, baseline {expected:.1f} ms on this machine"
+    )
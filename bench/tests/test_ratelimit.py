@@ -0,0 +1,100 @@
+import json
+import multiprocessing
+import struct
+
+import pytest
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+
+from bench import ratelimit
+from bench.ratelimit import Limiter, Throttled
+
+
+def make_limiter(tmp_path, **kwargs):
+    kwargs.setdefault("limits", {"ci": (2.0, 3.0)})
+    return Limiter(tmp_path / "ratelimit", {"ci", "other"}, **kwargs)
+
+
+def test_token_bucket_refills_at_rate(tmp_path):
+    limiter = make_limiter(tmp_path)
+    for _ in range(3):  # the burst
+        limiter.take("ci", now=100.0)
+    with pytest.raises(Throttled) as exc:
+        limiter.take("ci", now=100.0)
+    assert exc.value.retry_after == pytest.approx(0.5)
+    limiter.take("ci", now=100.5)
+    for _ in range(10):
+        limiter.take("other", now=100.0)  # no limit configured
+
+
+def _drain(path):
+    limiter = Limiter(path, {"ci", "other"}, {"ci": (2.0, 3.0)})
+    for _ in range(3):
+        limiter.take("ci", now=100.0)
+
+
+def test_buckets_are_shared_between_processes(tmp_path):
+    child = multiprocessing.get_context("fork").Process(target=_drain, args=(tmp_path / "ratelimit",))
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+    with pytest.raises(Throttled):
+        make_limiter(tmp_path).take("ci", now=100.0)
+
+
+def test_backpressure_on_writes_in_flight_and_latency(tmp_path):
+    limiter = make_limiter(tmp_path, max_in_flight=1, max_write_ms=10.0)
+    with limiter.writing():
+        assert limiter.in_flight() == 1
+        with pytest.raises(Throttled):
+            limiter.admit()
+    assert limiter.in_flight() == 0
+
+    # A worker that died mid-write doesn't hold the server busy
+    struct.pack_into("<qq", limiter._m, ratelimit._WORKERS_AT + 16 * 5, 2 ** 22 + 1, 3)
+    limiter.admit()
+
+    limiter.record_write(0.05, now=100.0)
+    with pytest.raises(Throttled) as exc:
+        limiter.admit(now=100.5)
+    assert "slow" in exc.value.reason
+    limiter.admit(now=102.0)  # stale: let a write through to measure again
+
+
+def test_shed_requests_keep_their_tokens(tmp_path, monkeypatch):
+    limiter = make_limiter(tmp_path, limits={"ci": (0.01, 3.0)}, max_in_flight=1)
+    monkeypatch.setattr(ratelimit, "_limiter", limiter)
+    view = ratelimit.rate_limited(lambda request: "ci")(lambda request: HttpResponse())
+    request = RequestFactory().post("/api/metrics/ingest")
+
+    with limiter.writing():
+        responses = [view(request) for _ in range(5)]
+    assert [r.status_code for r in responses] == [429] * 5
+    assert all("busy" in json.loads(r.content)["error"] for r in responses)
+    assert [view(request).status_code for _ in range(3)] == [200] * 3  # the whole burst
+    monkeypatch.setattr(ratelimit, "_limiter", None)
+
+
+@pytest.mark.django_db
+def test_ingest_answers_429_with_retry_after(tmp_path, monkeypatch):
+    monkeypatch.setattr(ratelimit, "_limiter", None)
+    client = Client()
+
+    def ingest(key):
+        return client.post(
+            "/api/metrics/ingest", data=json.dumps({"source": "github", "lce": 1}),
+            content_type="application/json", HTTP_X_BENCH_KEY=key,
+        )
+
+    with override_settings(
+        BENCH_API_KEYS={"k1": "ci", "k2": "other"},
+        BENCH_INGEST_RATE_LIMITS={"ci": (0.01, 2.0)},
+        BENCH_RATELIMIT_PATH=tmp_path / "ratelimit",
+    ):
+        assert [ingest("k1").status_code for _ in range(2)] == [200, 200]
+        throttled = ingest("k1")
+        assert throttled.status_code == 429
+        assert 1 <= int(throttled["Retry-After"]) <= 100
+        assert ingest("k2").status_code == 200
+        assert ingest("nope").status_code == 403
+    monkeypatch.setattr(ratelimit, "_limiter", None)
@@ -0,0 +1,75 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.core.cache import cache
+from django.test import Client
+
+from bench import regressions
+from bench.ingest import build_metric, store_metrics
+from bench.models import MetricBaseline, MetricRegression
+
+T0 = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def baseline(metric, values, detector):
+    b = MetricBaseline(source="github", workflow="ci", metric=metric)
+    flags = [detector.step(b, v) for v in values]
+    return b, flags
+
+
+def test_ewma_flags_only_the_worse_direction():
+    detector = regressions.Detector()
+    history = [98 if i % 2 else 102 for i in range(50)]
+
+    # Higher recovery time is worse, lower is fine
+    _, flags = baseline("prt", history + [130], detector)
+    assert all(f is None for f in flags[:-1])
+    assert flags[-1][0] == "ewma" and flags[-1][1] > 3
+    _, flags = baseline("prt", history + [70], detector)
+    assert flags[-1] is None
+
+    # Lower cache efficiency is worse
+    _, flags = baseline("lce", history + [70], detector)
+    assert flags[-1][0] == "ewma"
+
+
+def test_cusum_catches_a_small_sustained_shift():
+    detector = regressions.Detector()
+    history = [98 if i % 2 else 102 for i in range(100)]
+    shifted = [104 if i % 2 else 105 for i in range(20)]  # about +2 std, never 3
+
+    b, flags = baseline("dept", history + shifted, detector)
+    assert not any(flags[:100])
+    late = [f for f in flags[100:] if f]
+    assert late and {f[0] for f in late} == {"cusum"}
+    assert b.count == 120
+
+
+@pytest.mark.django_db
+def test_ingest_flags_regression_and_api_lists_it():
+    cache.clear()
+    rng = random.Random(3)
+    metrics = [
+        build_metric({"source": "jenkins", "workflow": "ci", "prt": 60 + rng.gauss(0, 1),
+                      "lce": 80, "commit_sha": f"c{i}"},
+                     created_at=T0 + timedelta(minutes=i))
+        for i in range(30)
+    ]
+    store_metrics(metrics[:20])
+    store_metrics(metrics[20:])
+    store_metrics([build_metric({"source": "jenkins", "workflow": "ci", "prt": 120,
+                                 "lce": 80, "commit_sha": "bad"},
+                                created_at=T0 + timedelta(minutes=31))])
+
+    assert MetricBaseline.objects.get(source="jenkins", metric="prt").count == 31
+    flagged = MetricRegression.objects.get(metric="prt")
+    assert flagged.detector == "ewma" and flagged.sample.commit_sha == "bad"
+
+    data = Client().get("/api/metrics/regressions", {"source": "jenkins"}).json()
+    assert [(r["metric"], r["commit_sha"]) for r in data["regressions"]] == [("prt", "bad")]
+    assert {b["metric"] for b in data["baselines"]} == {"lce", "prt", "smo", "dept", "clbc", "app_lat"}
+
+    # Replaying the history gives the same result
+    assert regressions.rebuild() == 1
+    assert MetricRegression.objects.get().sample_id == flagged.sample_id
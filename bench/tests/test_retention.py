@@ -0,0 +1,140 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, override_settings
+
+from bench import archive, regressions, retention, rollups, stats
+from bench.ingest import build_metric, store_metrics
+from bench.models import Metric, MetricRollup, RetentionState
+
+T0 = datetime(2025, 11, 20, 5, 30, tzinfo=timezone.utc)
+NOW = T0 + timedelta(days=10)
+
+
+@pytest.fixture(autouse=True)
+def archive_settings(tmp_path):
+    cache.clear()
+    with override_settings(BENCH_ARCHIVE_DIR=tmp_path, BENCH_RETENTION_DAYS={"github": 5}):
+        yield tmp_path
+    cache.clear()
+
+
+def seed(n=300):
+    rnd = random.Random(3)
+    metrics = [
+        build_metric(
+            {
+                "source": rnd.choice(["github", "jenkins"]),
+                "workflow": rnd.choice(["ci", "deploy"]),
+                "branch": rnd.choice(["main", "dev"]),
+                "run_id": str(i),
+                "lce": rnd.uniform(0, 100),
+                "prt": rnd.uniform(0, 600),
+            },
+            created_at=T0 + timedelta(minutes=rnd.randint(0, 9 * 24 * 60)),
+        )
+        for i in range(n)
+    ]
+    for i in range(0, n, 100):
+        store_metrics(metrics[i:i + 100])
+
+
+def history(client, **params):
+    rows, cursor = [], None
+    while True:
+        query = {**params, "limit": 17, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/api/metrics/history", query).json()
+        rows += page["rows"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return rows
+
+
+def snapshot(client):
+    return {
+        "export": b"".join(client.get("/api/metrics/export", {"format": "ndjson"}).streaming_content),
+        "history": history(client),
+        "github_history": history(client, source="github", branch="main"),
+        "rows": client.get(
+            "/api/metrics/data", {"source": "github", "end": (T0 + timedelta(days=3)).isoformat()},
+        ).json()["rows"],
+        "series": client.get("/api/metrics/data", {"points": "5000"}).json()["series"],
+        "summary": rollups.summary(start=T0, end=NOW),
+        "github_summary": rollups.summary(source="github"),
+    }
+
+
+@pytest.mark.django_db
+def test_compaction_archives_old_rows_and_reads_fall_back():
+    seed()
+    client = Client()
+    before = snapshot(client)
+    cutoff = retention.cutoff(5, NOW)
+    old = Metric.objects.filter(source="github", created_at__lt=cutoff).count()
+    assert old > 0
+
+    [result] = retention.compact(now=NOW, chunk_size=40)
+
+    assert result["archived"] == old
+    assert not Metric.objects.filter(source="github", created_at__lt=cutoff).exists()
+    assert Metric.objects.filter(source="jenkins", created_at__lt=cutoff).exists()
+    assert RetentionState.objects.get(source="github").archived_before == cutoff
+    assert MetricRollup.objects.filter(
+        source="github", granularity=rollups.MINUTE, bucket__lt=cutoff,
+    ).exists()
+    assert before == snapshot(client)
+
+    # Rebuilds keep the archived hour/day aggregates
+    rollups.rebuild()
+    stats.rebuild()
+    regressions.rebuild()
+    assert rollups.summary(source="github") == before["github_summary"]
+
+    # Nothing left to archive
+    assert retention.compact(now=NOW)[0]["archived"] == 0
+
+
+@pytest.mark.django_db
+def test_unaligned_window_aggregates_survive_compaction():
+    store_metrics([
+        build_metric({"source": "github", "prt": i}, created_at=T0 + timedelta(minutes=5 * i))
+        for i in range(200)
+    ])
+    # Edges inside an hour are answered from minute buckets
+    window = {"start": T0 + timedelta(minutes=13), "end": T0 + timedelta(hours=5, minutes=47)}
+    before = rollups.aggregate(source="github", **window)
+    assert before["count"] == 67
+
+    retention.compact_source("github", 1, now=NOW)
+    assert not Metric.objects.filter(source="github").exists()
+    assert rollups.aggregate(source="github", **window) == before
+
+
+@pytest.mark.django_db
+def test_segment_round_trip(archive_settings):
+    seed(50)
+    rows = list(Metric.objects.order_by("created_at", "id").values(*archive.FIELDS))
+    day = rollups.floor_bucket(rows[0]["created_at"], rollups.DAY)
+    path = archive.write_segment("github", day, rows)
+
+    with archive.Segment(path) as segment:
+        assert list(segment.iter_rows()) == [dict(row, source="github") for row in rows]
+        middle = rows[20]["created_at"]
+        assert [r["id"] for r in segment.iter_rows(start=middle)] == [r["id"] for r in rows[20:]]
+        assert list(segment.column("layer_cache_efficiency")) == [r["layer_cache_efficiency"] for r in rows]
+    assert path.parent == archive_settings / "github"
+
+
+@pytest.mark.django_db
+def test_compact_metrics_command(capsys):
+    seed(60)
+    call_command("compact_metrics", "--dry-run")
+    assert Metric.objects.count() == 60
+    assert capsys.readouterr().out.startswith("github: ")
+
+    call_command("compact_metrics", "--chunk-size", "7")
+    assert capsys.readouterr().out.startswith("github: archived ")
+    assert RetentionState.objects.filter(source="github").exists()
@@ -0,0 +1,96 @@
+import json
+import random
+import statistics
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.test import Client
+
+from bench import rollups
+from bench.ingest import build_metric, store_metrics
+from bench.models import Metric, MetricRollup
+
+T0 = datetime(2025, 11, 3, 22, 47, 13, tzinfo=timezone.utc)
+
+
+def seed(n=200, seed=7):
+    rnd = random.Random(seed)
+    metrics = [
+        build_metric(
+            {
+                "source": rnd.choice(["github", "jenkins"]),
+                "workflow": rnd.choice(["ci", "deploy"]),
+                "lce": rnd.uniform(0, 100),
+                "prt": rnd.uniform(0, 600),
+            },
+            created_at=T0 + timedelta(minutes=rnd.randint(0, 3 * 24 * 60)),
+        )
+        for _ in range(n)
+    ]
+    # Store in a few batches so buckets get updated, not only created.
+    for i in range(0, n, 50):
+        store_metrics(metrics[i:i + 50])
+
+
+def raw_stats(source, start, end):
+    qs = Metric.objects.filter(source=source)
+    if start:
+        qs = qs.filter(created_at__gte=start)
+    if end:
+        qs = qs.filter(created_at__lt=end)
+    values = list(qs.values_list("pipeline_recovery_time", flat=True))
+    std = statistics.stdev(values) if len(values) > 1 else 0.0
+    return len(values), statistics.mean(values), std, min(values), max(values)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("start,end", [
+    (None, None),
+    (T0 + timedelta(hours=5, minutes=17), None),
+    (None, T0 + timedelta(days=2, minutes=3)),
+    (T0 + timedelta(minutes=13), T0 + timedelta(days=1, hours=2, minutes=47)),
+    (T0 + timedelta(hours=30, minutes=13), T0 + timedelta(hours=32, minutes=52)),
+])
+def test_window_aggregate_matches_raw_rows(start, end):
+    seed()
+    # Align to whole minutes: rollups have minute resolution.
+    start = start and start.replace(second=0)
+    end = end and end.replace(second=0)
+    totals = rollups.aggregate(source="jenkins", start=start, end=end)
+    count, avg, std, lo, hi = raw_stats("jenkins", start, end)
+    assert totals["count"] == count
+    assert totals["prt"]["avg"] == pytest.approx(avg)
+    assert totals["prt"]["std"] == pytest.approx(std)
+    assert (totals["prt"]["min"], totals["prt"]["max"]) == (lo, hi)
+
+
+@pytest.mark.django_db
+def test_rebuild_reproduces_incremental_rollups():
+    seed(120)
+    fields = [f.name for f in MetricRollup._meta.fields if f.name != "id"]
+
+    def snapshot():
+        return sorted(
+            tuple(round(v, 6) if isinstance(v, float) else v for v in row)
+            for row in MetricRollup.objects.values_list(*fields)
+        )
+
+    incremental = snapshot()
+    assert rollups.rebuild() == len(incremental)
+    assert snapshot() == incremental
+
+
+@pytest.mark.django_db
+def test_metrics_data_reads_aggregates_for_window():
+    seed(60)
+    start = T0 + timedelta(days=1)
+    resp = Client().get(
+        "/api/metrics/data",
+        {"source": "github", "start": start.isoformat().replace("+00:00", "Z")},
+    )
+    data = json.loads(resp.content)
+    count, avg, _std, lo, hi = raw_stats("github", start.replace(second=0), None)
+    assert data["count"] == count
+    assert data["avg_prt"] == round(avg, 2)
+    assert data["max_prt"] == hi
+    assert Client().get("/api/metrics/data", {"start": "yesterday"}).status_code == 400
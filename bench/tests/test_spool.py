@@ -0,0 +1,78 @@
+import json
+import threading
+
+import pytest
+from django.conf import settings as django_settings
+from django.test import Client
+
+from bench import spool
+from bench.models import IngestSpoolCheckpoint, Metric
+
+
+def test_writer_group_commit_appends_every_record(tmp_path):
+    writer = spool.SpoolWriter(tmp_path, commit_delay=0.001)
+    threads = [
+        threading.Thread(target=writer.append, args=({"source": "github", "lce": i},))
+        for i in range(20)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    writer.close()
+
+    (segment,) = spool.list_segments(tmp_path)
+    lines = segment.read_bytes().splitlines()
+    assert sorted(json.loads(line)["p"]["lce"] for line in lines) == list(range(20))
+
+
+def test_writer_seals_full_segments(tmp_path):
+    writer = spool.SpoolWriter(tmp_path, segment_bytes=1)
+    writer.append({"lce": 1})
+    writer.append({"lce": 2})
+    assert [p.suffix for p in spool.list_segments(tmp_path)] == [".seg", ".seg"]
+
+
+@pytest.mark.django_db
+def test_drain_resumes_from_checkpoint_and_skips_partial_lines(tmp_path):
+    writer = spool.SpoolWriter(tmp_path, segment_bytes=10**9)
+    for i in range(5):
+        writer.append({"source": "jenkins", "prt": i}, received_at=1_700_000_000 + i)
+    writer.close()
+    (segment,) = spool.list_segments(tmp_path)
+
+    # Simulate a crash after the first two records were committed.
+    first_two = sum(len(line) for line in segment.read_bytes().splitlines(True)[:2])
+    IngestSpoolCheckpoint.objects.create(segment=segment.stem, offset=first_two)
+    with open(segment, "ab") as fh:
+        fh.write(b'{"t": 1, "p": {"lce"')  # torn write
+
+    assert spool.drain(tmp_path, batch_size=2) == 3
+    assert sorted(Metric.objects.values_list("pipeline_recovery_time", flat=True)) == [2, 3, 4]
+    assert Metric.objects.earliest("created_at").created_at.timestamp() == 1_700_000_002
+    # Writer is still alive (this process), so the open segment is kept.
+    assert segment.exists()
+    assert spool.drain(tmp_path) == 0
+
+
+@pytest.mark.django_db
+def test_drain_removes_finished_sealed_segments(tmp_path):
+    writer = spool.SpoolWriter(tmp_path, segment_bytes=1)
+    writer.append({"source": "github", "lce": 7})
+    assert spool.drain(tmp_path) == 1
+    assert spool.list_segments(tmp_path) == []
+    assert not IngestSpoolCheckpoint.objects.exists()
+
+
+@pytest.mark.django_db
+def test_ingest_returns_202_in_spool_mode(settings, tmp_path, monkeypatch):
+    settings.BENCH_INGEST_SPOOL = True
+    monkeypatch.setattr(spool, "_writer", spool.SpoolWriter(tmp_path))
+    resp = Client().post(
+        "/api/metrics/ingest", data=json.dumps({"source": "github", "lce": 5}),
+        content_type="application/json", HTTP_X_BENCH_KEY=django_settings.BENCH_API_KEY,
+    )
+    assert resp.status_code == 202
+    assert Metric.objects.count() == 0
+    assert spool.drain(tmp_path) == 1
+    assert Metric.objects.get().layer_cache_efficiency == 5
@@ -0,0 +1,91 @@
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client
+
+from bench import stats
+from bench.ingest import build_metric, store_metrics
+from bench.models import Metric, MetricBaseline, MetricSketch
+
+T0 = datetime(2025, 11, 3, 6, 0, tzinfo=timezone.utc)
+
+
+def exact_quantile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+
+def test_histogram_quantiles_within_relative_accuracy():
+    rnd = random.Random(3)
+    values = [rnd.lognormvariate(3, 1) for _ in range(5000)] + [0.0] * 50
+    a, b = stats.Histogram(), stats.Histogram()
+    for i, v in enumerate(values):
+        (a if i % 2 else b).add(v)
+    merged = stats.Histogram.from_dict(json.loads(json.dumps(a.to_dict()))).merge(b)
+
+    assert merged.count == len(values)
+    assert (merged.min, merged.max) == (min(values), max(values))
+    for _, q in stats.QUANTILES:
+        exact = exact_quantile(values, q)
+        assert merged.quantile(q) == pytest.approx(exact, rel=2 * stats.RELATIVE_ACCURACY)
+    assert sum(b["count"] for b in merged.bins()) == len(values)
+    assert sum(b["count"] for b in merged.bins(10)) == len(values)
+
+
+def test_histogram_handles_negative_values():
+    h = stats.Histogram()
+    for v in (-5, -1, 0, 2, 8):
+        h.add(v)
+    assert h.quantile(0) == -5
+    assert h.quantile(0.5) == 0
+    assert h.quantile(1) == 8
+
+
+@pytest.mark.django_db
+def test_stats_api_merges_sketches_over_window():
+    cache.clear()
+    rnd = random.Random(5)
+    values = []
+    metrics = []
+    for i in range(400):
+        v = rnd.uniform(10, 500)
+        when = T0 + timedelta(minutes=7 * i)
+        if when >= T0 + timedelta(days=1):
+            values.append(v)
+        metrics.append(build_metric({"source": "jenkins", "dept": v}, created_at=when))
+    for i in range(0, len(metrics), 100):
+        store_metrics(metrics[i:i + 100])
+
+    assert MetricSketch.objects.filter(granularity="day").count() == 3
+
+    resp = Client().get("/api/metrics/stats", {
+        "source": "jenkins", "metric": "dept", "bins": "5",
+        "start": (T0 + timedelta(days=1)).isoformat(),
+    })
+    data = json.loads(resp.content)["dept"]
+    assert data["count"] == len(values)
+    assert data["p95"] == pytest.approx(exact_quantile(values, 0.95), rel=0.03)
+    assert len(data["histogram"]) == 5
+
+    assert stats.rebuild() == MetricSketch.objects.count()
+    again = json.loads(Client().get("/api/metrics/stats", {"source": "jenkins"}).content)
+    assert again["dept"]["count"] == 400
+    assert Client().get("/api/metrics/stats", {"metric": "xyz"}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_migrate_backfills_sketches_and_baselines():
+    # An upgraded database: metrics stored before these tables existed
+    Metric.objects.bulk_create(
+        Metric(source="github", workflow="ci", created_at=T0 + timedelta(minutes=i), app_latency=i)
+        for i in range(30)
+    )
+    assert not MetricSketch.objects.exists() and not MetricBaseline.objects.exists()
+
+    call_command("migrate", verbosity=0)
+    assert sum(MetricSketch.objects.filter(granularity="day").values_list("count", flat=True)) == 30
+    assert MetricBaseline.objects.get(source="github", workflow="ci", metric="app_lat").count == 30
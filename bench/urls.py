@@ -9,5 +9,12 @@ urlpatterns = [
 
     # Novel metrics APIs
     path("api/metrics/data", views.api_metrics_data, name="api_metrics_data"),
+    path("api/metrics/history", views.api_metrics_history, name="api_metrics_history"),
+    path("api/metrics/stats", views.api_metrics_stats, name="api_metrics_stats"),
+    path("api/metrics/compare", views.api_metrics_compare, name="api_metrics_compare"),
+    path("api/metrics/regressions", views.api_metrics_regressions, name="api_metrics_regressions"),
+    path("api/metrics/export", views.api_metrics_export, name="api_metrics_export"),
+    path("api/metrics/stream", views.api_metrics_stream, name="api_metrics_stream"),
     path("api/metrics/ingest", views.api_ingest, name="api_ingest"),
+    path("api/metrics/ingest/batch", views.api_ingest_batch, name="api_ingest_batch"),
 ]
@@ -1,17 +1,52 @@
 import json
-import statistics
+from functools import partial
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Max
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 
-from .models import Metric
+from core.routers import read_alias, uses_read_db
+
+# compare, export, live and spool are imported by the views that use
+# them: rarely needed, so not worth loading in every worker at start
+from . import archive, downsample, rollups, stats
+from .caching import cached_metrics_view
+from .ingest import (
+    VALID_SOURCES, PayloadError, astore_metrics, build_metric, parse_batch, store_metrics,
+)
+from .models import METRIC_FIELDS, Metric, MetricBaseline, MetricRegression
+from .filters import FILTER_PARAMS, filter_metrics, parse_time
+from .idempotency import idempotent
+from .ratelimit import rate_limited
+from .pagination import keyset_page
+
+
+def _key_name(request):
+    """Name of the request's ingest key (settings.BENCH_API_KEYS), or None."""
+    return settings.BENCH_API_KEYS.get(request.headers.get("X-Bench-Key", ""))
+
+
+def _authorized(request):
+    return _key_name(request) is not None
 
 
 @csrf_exempt
-def api_ingest(request):
-    """Receive metric data from CI/CD pipeline or API client."""
+@rate_limited(_key_name)
+@idempotent(_key_name)
+async def api_ingest(request):
+    """
+    Receive metric data from CI/CD pipeline or API client.
+
+    Async: under the ASGI server a request waiting on the disk or a
+    database lock does not hold a whole worker. A run that is already
+    stored (same source, workflow, run_id, run_attempt) is answered with
+    status "duplicate" and the stored id; see also bench.idempotency.
+    Throttled keys and an overloaded server get 429 (bench.ratelimit).
+    """
     if request.method != "POST":
         return JsonResponse({"error": "POST only"}, status=405)
 
@@ -22,82 +57,481 @@ def api_ingest(request):
         return JsonResponse({"error": "Invalid JSON"}, status=400)
 
     # Simple API key check for security
-    api_key = request.headers.get("X-Bench-Key")
-    if api_key != settings.BENCH_API_KEY:
+    if not _authorized(request):
         return JsonResponse({"error": "Unauthorized"}, status=403)
 
-    # Helper: support both short and long keys in payload
-    def get_metric_val(short_key: str, long_key: str):
-        if short_key in payload:
-            return payload.get(short_key)
-        if long_key in payload:
-            return payload.get(long_key)
-        return None
-
-    metric = Metric.objects.create(
-        source=payload.get("source", "github"),
-        workflow=payload.get("workflow", ""),
-        run_id=payload.get("run_id", ""),
-        run_attempt=payload.get("run_attempt", ""),
-        branch=payload.get("branch", ""),
-        commit_sha=payload.get("commit_sha", ""),
-
-        # ✅ write into long field names that match DB columns
-        layer_cache_efficiency=get_metric_val("lce", "layer_cache_efficiency"),
-        pipeline_recovery_time=get_metric_val("prt", "pipeline_recovery_time"),
-        secrets_mgmt_overhead=get_metric_val("smo", "secrets_mgmt_overhead"),
-        dynamic_env_time=get_metric_val("dept", "dynamic_env_time"),
-        cross_layer_consistency=get_metric_val("clbc", "cross_layer_consistency"),
-
-        notes=payload.get("notes", ""),
+    try:
+        metric = build_metric(payload)
+    except PayloadError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    if settings.BENCH_INGEST_SPOOL:
+        from . import spool
+
+        # Durable on local disk now; drain_ingest_spool writes it to the DB.
+        # Not thread-sensitive, so concurrent appends share one group fsync.
+        await sync_to_async(spool.get_writer().append, thread_sensitive=False)(payload)
+        return JsonResponse({"status": "queued"}, status=202)
+
+    stored = await astore_metrics([metric])
+
+    return JsonResponse({"status": "stored" if stored else "duplicate", "id": metric.id})
+
+
+@csrf_exempt
+@rate_limited(_key_name)
+@idempotent(_key_name)
+def api_ingest_batch(request):
+    """
+    Receive many metrics in one request.
+
+    Body is a JSON array of ingest payloads or NDJSON (one payload per line).
+    Valid rows are written with chunked bulk_create in a single transaction;
+    the response reports a status for every row, in input order
+    ("stored", "duplicate" for an already stored run, or "error").
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST only"}, status=405)
+
+    if not _authorized(request):
+        return JsonResponse({"error": "Unauthorized"}, status=403)
+
+    try:
+        rows = parse_batch(request.body.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    if not rows:
+        return JsonResponse({"error": "Empty batch"}, status=400)
+    if len(rows) > settings.BENCH_INGEST_BATCH_MAX_ROWS:
+        return JsonResponse(
+            {"error": f"Batch too large (max {settings.BENCH_INGEST_BATCH_MAX_ROWS} rows)"},
+            status=413,
+        )
+
+    results = []
+    pending = []  # (result dict, Metric) for rows that passed validation
+    for index, row in enumerate(rows):
+        result = {"index": index}
+        try:
+            if isinstance(row, PayloadError):
+                raise row
+            pending.append((result, build_metric(row)))
+        except PayloadError as exc:
+            result.update(status="error", error=str(exc))
+        results.append(result)
+
+    stored = store_metrics(
+        [metric for _, metric in pending],
+        chunk_size=settings.BENCH_INGEST_BATCH_CHUNK,
     )
+    inserted = {id(metric) for metric in stored}
+    for result, metric in pending:
+        result.update(status="stored" if id(metric) in inserted else "duplicate", id=metric.id)
 
-    return JsonResponse({"status": "stored", "id": metric.id})
+    return JsonResponse(
+        {
+            "stored": len(stored),
+            "duplicates": len(pending) - len(stored),
+            "rejected": len(results) - len(pending),
+            "results": results,
+        }
+    )
 
 
-def api_metrics_data(request):
+@uses_read_db
+@cached_metrics_view
+async def api_metrics_data(request):
     """
     Return aggregated metrics for dashboard display.
-    Optional query param:
+    Optional query params:
       ?source=github|jenkins|codepipeline
+      ?start=<ISO datetime>&end=<ISO datetime>   aggregate window [start, end)
+
+      ?points=400&method=lttb|avg   return the whole window downsampled
+                                    to ~N points per metric as "series"
+                                    instead of the last 100 "rows" (from
+                                    the rollups for avg and for large
+                                    windows; see bench.downsample)
+      ?format=columnar              "rows" as one array per field
+                                    ({"t": [...], "lce": [...], ...})
+                                    instead of one object per row
+      ?since=<cursor>               only the rows ingested after an earlier
+                                    response's "cursor" (up to
+                                    DELTA_LIMIT, oldest first), for
+                                    incremental refreshes; aggregates are
+                                    included only if there are new rows
+
+    Every response carries "cursor", the newest Metric id it accounts for.
+    A delta that hit DELTA_LIMIT has "has_more": fetch again from its
+    cursor, or reload the window.
+
+    Aggregates come from the rollup tables (see bench.rollups), so they
+    cover the whole window, not only the 100 rows returned for the chart.
+    Rows and series reaching past the retention window are read from the
+    archive (see bench.retention). Responses are cached until the next
+    ingest (see bench.caching). A delta costs one primary key range scan
+    over the new rows, whatever the size of the window.
     """
     source = request.GET.get("source")
-    qs = Metric.objects.order_by("-created_at")
+    method = request.GET.get("method", "lttb")
+    fmt = request.GET.get("format", "rows")
+    if fmt not in ("rows", "columnar"):
+        return JsonResponse({"error": "format must be rows or columnar"}, status=400)
+    try:
+        start = parse_time(request.GET.get("start"))
+        end = parse_time(request.GET.get("end"))
+        points = int(request.GET["points"]) if request.GET.get("points") else None
+        since = int(request.GET["since"]) if request.GET.get("since") else None
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    if method not in downsample.METHODS:
+        return JsonResponse({"error": f"method must be one of {', '.join(downsample.METHODS)}"}, status=400)
+
+    # Read the cursor first: rows committed while this request runs are
+    # left for the next delta rather than skipped.
+    cursor = (await Metric.objects.aaggregate(last=Max("id")))["last"] or 0
+    if since is not None:
+        return await _data_delta(since, cursor, source, start, end, fmt)
+
+    qs = Metric.objects.filter(id__lte=cursor).order_by("-created_at")
 
     if source:
         qs = qs.filter(source=source)
+    if start:
+        qs = qs.filter(created_at__gte=start)
+    if end:
+        qs = qs.filter(created_at__lt=end)
+
+    data = await rollups.asummary(source=source, start=start, end=end)
+    series = rows = None
+    if points is not None:
+        points = max(3, min(points, 5000))
+        if downsample.use_raw_rows(data["count"], points, method):
+            xs, columns = await downsample.aload_columns(qs)
+            if await sync_to_async(archive.covers)(source, start):
+                archived = await sync_to_async(downsample.archived_columns)(source, start, end)
+                xs, columns = downsample.merge_columns(archived, (xs, columns))
+            series = downsample.downsample(xs, columns, points, method)
+        else:
+            series = await downsample.arollup_series(source, start, end, points, method)
+    else:
+        long_keys = [long_key for _, long_key in METRIC_FIELDS]
+        recent = [
+            r async for r in qs.order_by("-created_at", "-id").values("id", "created_at", *long_keys)[:100]
+        ]
+        recent = await sync_to_async(archive.newest)(recent, 100, source=source, start=start, end=end)
+        rows = _data_rows(reversed(recent), fmt)
+
+    data["window"] = _window(start, end)
+    data["cursor"] = cursor
+    if series is not None:
+        data["series"] = series
+    else:
+        data["rows"] = rows
+    return JsonResponse(data)
+
 
-    qs = qs[:100]
+# Most rows one ?since= delta returns
+DELTA_LIMIT = 1000
 
+
+def _window(start, end):
+    return {
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+    }
+
+
+def _data_rows(recent, fmt):
     # Read from long field names on the model and expose short keys in JSON
     rows = [
         {
-            "t": m.created_at.isoformat(),
-            "lce": m.layer_cache_efficiency,
-            "prt": m.pipeline_recovery_time,
-            "smo": m.secrets_mgmt_overhead,
-            "dept": m.dynamic_env_time,
-            "clbc": m.cross_layer_consistency,
+            "t": r["created_at"].isoformat(),
+            "lce": r["layer_cache_efficiency"],
+            "prt": r["pipeline_recovery_time"],
+            "smo": r["secrets_mgmt_overhead"],
+            "dept": r["dynamic_env_time"],
+            "clbc": r["cross_layer_consistency"],
+            "app_lat": r["app_latency"],
         }
-        for m in reversed(qs)
+        for r in recent
     ]
+    if fmt == "columnar":
+        keys = ["t"] + [short_key for short_key, _ in METRIC_FIELDS]
+        rows = {key: [row[key] for row in rows] for key in keys}
+    return rows
+
+
+async def _data_delta(since, cursor, source, start, end, fmt):
+    """The ?since= response of api_metrics_data: rows with since < id <= cursor."""
+    long_keys = [long_key for _, long_key in METRIC_FIELDS]
+    # Filtered here rather than in SQL, where SQLite would rather walk the
+    # (source, created_at) index of the whole window than the id range.
+    new = [
+        r async for r in Metric.objects.filter(id__gt=since, id__lte=cursor)
+        .order_by("id").values("id", "source", "created_at", *long_keys)[:DELTA_LIMIT + 1]
+    ]
+    has_more = len(new) > DELTA_LIMIT
+    if has_more:
+        new = new[:DELTA_LIMIT]
+        cursor = new[-1]["id"]
+    new = [
+        r for r in new
+        if (not source or r["source"] == source)
+        and (start is None or r["created_at"] >= start)
+        and (end is None or r["created_at"] < end)
+    ]
+    data = {}
+    if new:
+        data = await rollups.asummary(source=source, start=start, end=end)
+        data["window"] = _window(start, end)
+    data.update(cursor=cursor, has_more=has_more, rows=_data_rows(new, fmt))
+    return JsonResponse(data)
+
+
+@cached_metrics_view
+def api_metrics_history(request):
+    """
+    Page through the full metric history, newest first.
+    Optional query params:
+      ?source=&workflow=&branch=&commit_sha=   exact-match filters
+      ?start=&end=                             ISO datetime window
+      ?limit=100                               page size (max 1000)
+      ?cursor=<next_cursor>                    continue after a previous page
+
+    Pages reaching past the retention window include archived rows.
+    """
+    try:
+        limit = int(request.GET.get("limit", 100))
+    except ValueError:
+        return JsonResponse({"error": "limit must be an integer"}, status=400)
+    limit = max(1, min(limit, 1000))
+
+    fields = ["id", "created_at", "source", "workflow", "run_id", "run_attempt",
+              "branch", "commit_sha"]
+    try:
+        qs = filter_metrics(Metric.objects.all(), request.GET).values(
+            *fields, *(long_key for _, long_key in METRIC_FIELDS)
+        )
+        merge = partial(
+            archive.newest,
+            start=parse_time(request.GET.get("start")),
+            end=parse_time(request.GET.get("end")),
+            **{name: request.GET.get(name) for name in FILTER_PARAMS},
+        )
+        page, next_cursor = keyset_page(qs, request.GET.get("cursor"), limit, merge)
+    except ValueError as exc:  # bad datetime or CursorError
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    rows = []
+    for r in page:
+        row = {name: r[name] for name in fields}
+        row["t"] = row.pop("created_at").isoformat()
+        for short_key, long_key in METRIC_FIELDS:
+            row[short_key] = r[long_key]
+        rows.append(row)
+    return JsonResponse({"rows": rows, "next_cursor": next_cursor})
 
-    def avg(vals):
-        clean = [v for v in vals if v is not None]
-        return round(statistics.fmean(clean), 2) if clean else 0.0
 
+@cached_metrics_view
+def api_metrics_stats(request):
+    """
+    Distribution statistics (p50/p90/p95/p99, min/max, histogram bins).
+    Optional query params:
+      ?source=&workflow=          filters
+      ?start=&end=                ISO datetime window (hour resolution)
+      ?metric=lce|prt|smo|dept|clbc|app_lat   only this metric
+      ?bins=20                    re-bin the histogram into N equal-width bins
+    """
+    short_keys = [short_key for short_key, _ in METRIC_FIELDS]
+    metric = request.GET.get("metric")
+    if metric and metric not in short_keys:
+        return JsonResponse({"error": f"metric must be one of {', '.join(short_keys)}"}, status=400)
+    try:
+        start = parse_time(request.GET.get("start"))
+        end = parse_time(request.GET.get("end"))
+        bins = int(request.GET["bins"]) if request.GET.get("bins") else None
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    if bins is not None:
+        bins = max(1, min(bins, 200))
+
+    merged = stats.window_histograms(
+        source=request.GET.get("source"),
+        workflow=request.GET.get("workflow"),
+        start=start,
+        end=end,
+    )
     data = {
-        "count": Metric.objects.count(),
-        "avg_lce": avg([r["lce"] for r in rows]),
-        "avg_prt": avg([r["prt"] for r in rows]),
-        "avg_smo": avg([r["smo"] for r in rows]),
-        "avg_dept": avg([r["dept"] for r in rows]),
-        "avg_clbc": avg([r["clbc"] for r in rows]),
-        "rows": rows,
+        key: merged[key].summary(bins)
+        for key in ([metric] if metric else short_keys)
     }
+    data["relative_accuracy"] = stats.RELATIVE_ACCURACY
     return JsonResponse(data)
 
 
+@cached_metrics_view
+def api_metrics_compare(request):
+    """
+    Compare sources: per-source count/mean/std/min/max of every metric and,
+    for each pair of sources, delta, relative delta and effect size.
+    Optional query params:
+      ?start=&end=                ISO datetime window
+      ?workflow=                  only this workflow
+      ?sources=github,jenkins     only these sources
+      ?group=workflow             compare sources per workflow
+    """
+    from . import compare
+
+    try:
+        start = parse_time(request.GET.get("start"))
+        end = parse_time(request.GET.get("end"))
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    sources = [s for s in request.GET.get("sources", "").split(",") if s]
+    unknown = [s for s in sources if s not in VALID_SOURCES]
+    if unknown:
+        return JsonResponse({"error": f"Unknown source(s): {', '.join(unknown)}"}, status=400)
+    group = request.GET.get("group", "source")
+    if group not in ("source", "workflow"):
+        return JsonResponse({"error": "group must be source or workflow"}, status=400)
+
+    data = compare.compare(
+        start=start,
+        end=end,
+        workflow=request.GET.get("workflow"),
+        sources=sources,
+        by_workflow=group == "workflow",
+    )
+    data["window"] = _window(start, end)
+    return JsonResponse(data)
+
+
+@cached_metrics_view
+def api_metrics_regressions(request):
+    """
+    Runs flagged as regressions against their rolling baseline, newest first,
+    plus the current baselines (see bench.regressions).
+    Optional query params:
+      ?source=&workflow=              filters
+      ?metric=lce|prt|smo|dept|clbc|app_lat   only this metric
+      ?limit=50                       number of regressions (max 500)
+    """
+    short_keys = [short_key for short_key, _ in METRIC_FIELDS]
+    metric = request.GET.get("metric")
+    if metric and metric not in short_keys:
+        return JsonResponse({"error": f"metric must be one of {', '.join(short_keys)}"}, status=400)
+    try:
+        limit = int(request.GET.get("limit", 50))
+    except ValueError:
+        return JsonResponse({"error": "limit must be an integer"}, status=400)
+    limit = max(1, min(limit, 500))
+
+    filters = {
+        name: request.GET[name]
+        for name in ("source", "workflow", "metric")
+        if request.GET.get(name)
+    }
+    found = MetricRegression.objects.filter(**filters).values(
+        "id", "sample_id", "created_at", "source", "workflow", "metric", "value",
+        "baseline_mean", "baseline_std", "score", "detector",
+        "sample__branch", "sample__commit_sha", "sample__run_id",
+    )[:limit]
+
+    rows = []
+    for r in found:
+        row = {name: r[name] for name in (
+            "id", "source", "workflow", "metric", "value", "baseline_mean",
+            "baseline_std", "score", "detector",
+        )}
+        row["metric_id"] = r["sample_id"]
+        row["t"] = r["created_at"].isoformat()
+        row["branch"] = r["sample__branch"]
+        row["commit_sha"] = r["sample__commit_sha"]
+        row["run_id"] = r["sample__run_id"]
+        rows.append(row)
+
+    baselines = [
+        {
+            "source": b.source,
+            "workflow": b.workflow,
+            "metric": b.metric,
+            "count": b.count,
+            "mean": b.mean,
+            "std": b.variance ** 0.5,
+        }
+        for b in MetricBaseline.objects.filter(**filters).order_by("source", "workflow", "metric")
+    ]
+    return JsonResponse({"regressions": rows, "baselines": baselines})
+
+
+@uses_read_db
+def api_metrics_export(request):
+    """
+    Stream metric history as a file download, oldest first.
+    Query params:
+      ?format=csv|ndjson   (default csv)
+      ?gzip=1              gzip the file (.csv.gz / .ndjson.gz)
+      plus the history filters (source, workflow, branch, commit_sha, start, end)
+
+    Includes the archived rows of the window (see bench.retention).
+    """
+    from . import export
+
+    fmt = request.GET.get("format", "csv")
+    if fmt not in export.FORMATS:
+        return JsonResponse({"error": f"format must be one of {', '.join(export.FORMATS)}"}, status=400)
+    gzip = request.GET.get("gzip") in ("1", "true")
+    try:
+        # Bound explicitly: the rows are read after the view has returned
+        qs = filter_metrics(Metric.objects.using(read_alias()), request.GET)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    filename = f"metrics.{fmt}" + (".gz" if gzip else "")
+    # An async iterator under ASGI, which would buffer a sync one whole
+    stream = export.astream if isinstance(request, ASGIRequest) else export.stream
+    response = StreamingHttpResponse(
+        stream(qs, fmt, gzip=gzip, archived=archive.query(request.GET)),
+        content_type="application/gzip" if gzip else export.CONTENT_TYPES[fmt],
+    )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+async def api_metrics_stream(request):
+    """
+    Live feed of newly ingested metrics as Server-Sent Events.
+    Optional query params:
+      ?source=github|jenkins|codepipeline
+      ?since=<id>   replay rows after this id (same as Last-Event-ID)
+
+    Events: "metric" (one per new row, id = Metric id) followed by
+    "aggregates" (the /api/metrics/data summary for the source). Needs the
+    ASGI server; under WSGI the dashboard falls back to polling.
+    """
+    from . import live
+
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "Streaming requires the ASGI server"}, status=501)
+
+    last_id = request.headers.get("Last-Event-ID") or request.GET.get("since")
+    try:
+        after_id = int(last_id) if last_id else None
+    except ValueError:
+        return JsonResponse({"error": "since must be an integer"}, status=400)
+
+    response = StreamingHttpResponse(
+        live.event_stream(source=request.GET.get("source") or None, after_id=after_id),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let a proxy buffer the stream
+    return response
+
+
+@uses_read_db
 def dashboard(request):
     """
     Render the dashboard shell (HTML/JS).
@@ -0,0 +1,287 @@
+"""
+Container start without redundant work.
+
+entrypoint.sh used to run ``migrate`` and ``collectstatic`` on every
+start: two more interpreters that each pay for django.setup() and then
+find nothing to do. ``python -m core.boot`` fingerprints the inputs of
+both steps and runs a step only when its fingerprint changed:
+
+    migrate        the migration files of every installed app; stored in
+                   the SQLite header (PRAGMA user_version), so it travels
+                   with the database file and a fresh volume migrates
+    collectstatic  the static files of every installed app, the storage
+                   backend and the whitenoise version; stored next to the
+                   manifest in STATIC_ROOT
+
+Checking needs the settings module but not django.setup(), so an
+unchanged start costs milliseconds. Stale steps run in this process,
+which sets up Django once for both. ``--force`` runs both regardless.
+
+``python -m core.boot --profile`` times the startup phases instead (see
+the boot_profile command).
+"""
+
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+STEPS = ("migrate", "collectstatic")
+STATIC_STAMP = ".boot-fingerprint"
+
+
+def _settings():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "webapp.settings")
+    from django.conf import settings
+
+    return settings
+
+
+def app_dirs(installed_apps):
+    """Package directory of each INSTALLED_APPS entry, without importing the apps."""
+    dirs = []
+    for entry in installed_apps:
+        parts = entry.split(".")
+        # An entry may name an AppConfig ("bench.apps.BenchConfig"): use
+        # the longest prefix that is a package.
+        for end in range(len(parts), 0, -1):
+            try:
+                spec = importlib.util.find_spec(".".join(parts[:end]))
+            except ImportError:
+                continue
+            if spec is not None and spec.submodule_search_locations:
+                dirs.append(Path(spec.submodule_search_locations[0]))
+                break
+    return dirs
+
+
+def _hash_files(digest, root, pattern):
+    for path in sorted(root.glob(pattern)):
+        if path.is_file() and "__pycache__" not in path.parts:
+            digest.update(str(path.relative_to(root)).encode("utf-8") + b"\0")
+            digest.update(path.read_bytes())
+
+
+def migrations_fingerprint(dirs):
+    """Positive 31-bit hash of the migration files, to fit PRAGMA user_version."""
+    digest = hashlib.sha1()
+    for app_dir in dirs:
+        digest.update(app_dir.name.encode("utf-8") + b"\0")
+        _hash_files(digest, app_dir / "migrations", "*.py")
+    return int.from_bytes(digest.digest()[:4], "big") >> 1 or 1
+
+
+def static_fingerprint(dirs, settings):
+    digest = hashlib.sha1()
+    storage = settings.STORAGES.get("staticfiles", {}).get("BACKEND", "")
+    digest.update(storage.encode("utf-8") + b"\0")
+    try:  # its post-processing (compression) is part of the output
+        digest.update(importlib.metadata.version("whitenoise").encode("utf-8") + b"\0")
+    except importlib.metadata.PackageNotFoundError:
+        pass
+    for root in [*(d / "static" for d in dirs), *map(Path, settings.STATICFILES_DIRS)]:
+        digest.update(str(root.name).encode("utf-8") + b"\0")
+        _hash_files(digest, root, "**/*")
+    return digest.hexdigest()
+
+
+def database_path(settings):
+    """The default database's file, or None when it isn't a SQLite file."""
+    db = settings.DATABASES["default"]
+    if db["ENGINE"] not in ("django.db.backends.sqlite3", "core.sqlite"):
+        return None
+    name = str(db["NAME"])
+    if name == ":memory:" or name.startswith("file:"):
+        return None
+    return Path(name)
+
+
+def read_db_stamp(path):
+    if path is None or not path.exists():
+        return None
+    try:
+        with sqlite3.connect(path.resolve().as_uri() + "?mode=ro", uri=True) as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+    except sqlite3.Error:
+        return None
+
+
+def write_db_stamp(path, value):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute(f"PRAGMA user_version = {int(value)}")
+    finally:
+        conn.close()
+
+
+def read_static_stamp(static_root):
+    static_root = Path(static_root)
+    if not (static_root / "staticfiles.json").exists():
+        return None  # never collected (or not by the manifest storage)
+    try:
+        return (static_root / STATIC_STAMP).read_text().strip()
+    except OSError:
+        return None
+
+
+def write_static_stamp(static_root, value):
+    path = Path(static_root) / STATIC_STAMP
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(value + "\n")
+    os.replace(tmp, path)
+
+
+def fingerprints(settings):
+    """``{step: fingerprint}`` of the current code."""
+    dirs = app_dirs(settings.INSTALLED_APPS)
+    return {
+        "migrate": migrations_fingerprint(dirs),
+        "collectstatic": static_fingerprint(dirs, settings),
+    }
+
+
+def pending(settings):
+    """
+    ``{step: fingerprint}`` for the steps whose inputs changed since they
+    last ran.
+    """
+    stored = {
+        "migrate": read_db_stamp(database_path(settings)),
+        "collectstatic": read_static_stamp(settings.STATIC_ROOT),
+    }
+    return {
+        name: fingerprint
+        for name, fingerprint in fingerprints(settings).items()
+        if fingerprint != stored[name]
+    }
+
+
+def run_step(name, fingerprint, settings, verbosity=1):
+    """Run one step (Django must be set up) and record its fingerprint."""
+    from django.core.management import call_command
+    from django.db import connections
+
+    call_command(name, interactive=False, verbosity=verbosity)
+    if name == "migrate":
+        connections.close_all()
+        db_path = database_path(settings)
+        if db_path is not None:
+            write_db_stamp(db_path, fingerprint)
+    else:
+        write_static_stamp(settings.STATIC_ROOT, fingerprint)
+
+
+def run(force=False, stdout=sys.stdout):
+    """Bring the database and STATIC_ROOT up to date; returns the steps run."""
+    settings = _settings()
+    steps = fingerprints(settings) if force else pending(settings)
+    for name in STEPS:
+        if name not in steps:
+            stdout.write(f"{name}: up to date, skipped\n")
+    if steps:
+        import django
+
+        django.setup()
+        for name in STEPS:
+            if name in steps:
+                stdout.write(f"{name}: running\n")
+                run_step(name, steps[name], settings)
+    return list(steps)
+
+
+def warm():
+    """
+    Import the URLconf, and with it every view module, now rather than on
+    the first request. Under ``gunicorn --preload`` this happens once in
+    the master and the forked workers share the loaded modules.
+    """
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+
+
+def profile(started=None, dry_run=False):
+    """
+    Run a start in this (fresh) process and time each phase, in order.
+
+    ``started`` is the time.monotonic() at which the parent launched the
+    interpreter. With ``dry_run`` stale steps are reported, not run.
+    """
+    phases = []
+    t = time.monotonic()
+    if started is not None:
+        phases.append(("interpreter", t - started))
+
+    def lap(name):
+        nonlocal t
+        now = time.monotonic()
+        phases.append((name, now - t))
+        t = now
+
+    settings = _settings()
+    settings.INSTALLED_APPS  # imports the settings module
+    lap("settings")
+    steps = pending(settings)
+    lap("fingerprint")
+
+    import django
+    from django.core.wsgi import get_wsgi_application
+
+    django.setup()
+    lap("django_setup")
+    if not dry_run:
+        for name in STEPS:
+            if name in steps:
+                run_step(name, steps[name], settings, verbosity=0)
+                lap(name)
+    application = get_wsgi_application()
+    lap("wsgi_application")
+    warm()
+    lap("urlconf")
+    status = _first_request(application)
+    lap("first_request")
+    return {
+        "phases": [{"phase": name, "ms": round(seconds * 1000, 1)} for name, seconds in phases],
+        "total_ms": round(sum(seconds for _, seconds in phases) * 1000, 1),
+        "steps": {
+            name: ("skipped" if name not in steps else "pending" if dry_run else "ran")
+            for name in STEPS
+        },
+        "first_request_status": status,
+    }
+
+
+def _first_request(application):
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {"PATH_INFO": "/health", "HTTP_HOST": "localhost"}
+    setup_testing_defaults(environ)
+    status = []
+    response = application(environ, lambda s, headers, exc_info=None: status.append(s))
+    b"".join(response)
+    response.close()
+    return int(status[0].split()[0])
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m core.boot", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--force", action="store_true", help="Run every step even if unchanged.")
+    parser.add_argument("--profile", action="store_true", help="Time the startup phases, print JSON.")
+    parser.add_argument("--started", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--dry-run", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.profile:
+        json.dump(profile(args.started, dry_run=args.dry_run), sys.stdout)
+    else:
+        run(force=args.force)
+
+
+if __name__ == "__main__":
+    main()
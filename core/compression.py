@@ -0,0 +1,135 @@
+"""
+Content codings for request bodies and responses.
+
+gzip and deflate are always available; br and zstd are used when the
+optional ``brotli`` / ``zstandard`` packages are installed. Decompression
+is bounded: it stops and raises BodyTooLarge as soon as the output would
+exceed the given limit, so a small compressed body can't expand into
+gigabytes of memory.
+"""
+
+import io
+import re
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+
+class BodyTooLarge(ValueError):
+    """Decompressed body exceeds the configured limit."""
+
+
+class UnsupportedEncoding(ValueError):
+    """Content-Encoding this server can't decode."""
+
+
+# Brotli can't bound its output per call; feed it small input slices.
+_BROTLI_SLICE = 1024
+
+
+def _inflate(wbits):
+    def decompress(data, limit):
+        d = zlib.decompressobj(wbits)
+        out = d.decompress(data, limit + 1)
+        if len(out) > limit or d.unconsumed_tail:
+            raise BodyTooLarge(f"Decompressed body exceeds {limit} bytes")
+        out += d.flush()
+        if len(out) > limit:
+            raise BodyTooLarge(f"Decompressed body exceeds {limit} bytes")
+        if not d.eof:
+            raise ValueError("Truncated compressed body")
+        return out
+    return decompress
+
+
+def _unbrotli(data, limit):
+    d = brotli.Decompressor()
+    out = bytearray()
+    for i in range(0, len(data), _BROTLI_SLICE):
+        out += d.process(data[i:i + _BROTLI_SLICE])
+        if len(out) > limit:
+            raise BodyTooLarge(f"Decompressed body exceeds {limit} bytes")
+    if not d.is_finished():
+        raise ValueError("Truncated compressed body")
+    return bytes(out)
+
+
+def _unzstd(data, limit):
+    with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+        out = reader.read(limit + 1)
+    if len(out) > limit:
+        raise BodyTooLarge(f"Decompressed body exceeds {limit} bytes")
+    return out
+
+
+def _gzip(data, level=6):
+    c = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return c.compress(data) + c.flush()
+
+
+# coding -> decompress(data, limit)
+DECODERS = {
+    "gzip": _inflate(31),
+    "x-gzip": _inflate(31),
+    "deflate": _inflate(15),
+}
+# coding -> compress(data); in order of preference when the client accepts several
+ENCODERS = {}
+
+if zstandard is not None:
+    DECODERS["zstd"] = _unzstd
+    # Compressor objects are not thread safe; make one per response
+    ENCODERS["zstd"] = lambda data: zstandard.ZstdCompressor(level=3).compress(data)
+if brotli is not None:
+    DECODERS["br"] = _unbrotli
+    ENCODERS["br"] = lambda data: brotli.compress(data, quality=4)
+ENCODERS["gzip"] = _gzip
+
+
+def decompress(data, content_encoding, limit):
+    """Undo ``content_encoding`` (possibly a comma-separated chain) on ``data``."""
+    codings = [c.strip().lower() for c in content_encoding.split(",") if c.strip()]
+    for coding in reversed(codings):  # listed in the order they were applied
+        if coding == "identity":
+            continue
+        decoder = DECODERS.get(coding)
+        if decoder is None:
+            raise UnsupportedEncoding(coding)
+        try:
+            data = decoder(data, limit)
+        except (BodyTooLarge, UnsupportedEncoding):
+            raise
+        except Exception as exc:  # zlib.error, brotli.error, zstandard.ZstdError
+            raise ValueError(f"Invalid {coding} body: {exc}") from None
+    return data
+
+
+_ACCEPT_ITEM = re.compile(r"^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?")
+
+
+def negotiate(accept_encoding):
+    """Best coding in ENCODERS the client accepts (q > 0), or None."""
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        match = _ACCEPT_ITEM.match(item)
+        if not match:
+            continue
+        try:
+            q = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+        accepted[match.group(1).lower()] = q
+    best, best_q = None, 0.0
+    for coding in ENCODERS:
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
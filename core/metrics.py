@@ -0,0 +1,226 @@
+"""
+Process-shared Prometheus metrics.
+
+Every process (gunicorn worker) writes its samples into its own mmap'd file
+``<BENCH_PROMETHEUS_DIR>/worker-<pid>.db``, so updates never need a lock
+shared between processes. The /metrics view reads all files and merges
+them: counters and histograms are summed over every file (including workers
+that have exited), gauges only over workers that are still alive.
+
+File layout: an 8-byte "bytes used" header followed by entries of
+``int32 key length | key (padded to 8-byte alignment) | float64 value``.
+Entries are only ever appended or updated in place, and the header is
+written after a new entry, so a reader always sees a consistent prefix.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+from .process import pid_alive
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# name -> (type, help, buckets)
+METRICS = {
+    "http_requests_total": (COUNTER, "HTTP requests handled.", None),
+    "http_requests_in_flight": (GAUGE, "HTTP requests currently being handled.", None),
+    "http_request_duration_seconds": (HISTOGRAM, "Time to produce a response.", LATENCY_BUCKETS),
+    "http_response_size_bytes": (HISTOGRAM, "Response body size (non-streaming).", SIZE_BUCKETS),
+    "http_request_db_queries": (HISTOGRAM, "DB queries run per request.", QUERY_BUCKETS),
+    "db_query_duration_seconds_total": (COUNTER, "Time spent in DB queries.", None),
+    "ingest_throttled_total": (COUNTER, "Ingest requests answered 429 (bench.ratelimit).", None),
+}
+
+_INITIAL_SIZE = 64 * 1024
+_USED = struct.Struct("Q")
+
+
+def _padding(key_len):
+    return (8 - (4 + key_len) % 8) % 8
+
+
+def read_entries(data):
+    """Yield (key, value) from the bytes of one metrics file."""
+    if len(data) < _USED.size:
+        return
+    used = _USED.unpack_from(data, 0)[0]
+    pos = _USED.size
+    while pos < used:
+        (key_len,) = struct.unpack_from("i", data, pos)
+        pos += 4
+        key = bytes(data[pos:pos + key_len]).decode("utf-8")
+        pos += key_len + _padding(key_len)
+        (value,) = struct.unpack_from("d", data, pos)
+        pos += 8
+        yield key, value
+
+
+class MmapedDict:
+    """A str -> float map stored in an mmap'd file, written by one process."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._file = open(path, "a+b")
+        fileno = self._file.fileno()
+        if os.fstat(fileno).st_size == 0:
+            self._file.truncate(_INITIAL_SIZE)
+        self._capacity = os.fstat(fileno).st_size
+        self._m = mmap.mmap(fileno, self._capacity)
+        self._positions = {}
+        self._used = _USED.unpack_from(self._m, 0)[0]
+        if self._used == 0:
+            self._used = _USED.size
+            _USED.pack_into(self._m, 0, self._used)
+        pos = _USED.size
+        for key, _value in read_entries(self._m):
+            encoded_len = len(key.encode("utf-8"))
+            pos += 4 + encoded_len + _padding(encoded_len)
+            self._positions[key] = pos
+            pos += 8
+
+    def _append(self, key):
+        encoded = key.encode("utf-8")
+        padded = encoded + b" " * _padding(len(encoded))
+        entry = struct.pack(f"i{len(padded)}sd", len(encoded), padded, 0.0)
+        while self._used + len(entry) > self._capacity:
+            self._capacity *= 2
+            self._file.truncate(self._capacity)
+            self._m.close()
+            self._m = mmap.mmap(self._file.fileno(), self._capacity)
+        self._m[self._used:self._used + len(entry)] = entry
+        self._positions[key] = self._used + 4 + len(padded)
+        self._used += len(entry)
+        _USED.pack_into(self._m, 0, self._used)
+
+    def inc(self, key, amount=1.0):
+        with self._lock:
+            if key not in self._positions:
+                self._append(key)
+            pos = self._positions[key]
+            (value,) = struct.unpack_from("d", self._m, pos)
+            struct.pack_into("d", self._m, pos, value + amount)
+
+    def close(self):
+        self._m.close()
+        self._file.close()
+
+
+def _key(name, labels):
+    return json.dumps([name, sorted(labels.items())], separators=(",", ":"))
+
+
+class Registry:
+    """Records samples into this process's metrics file."""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._pid = None
+        self._values = None
+        self._lock = threading.Lock()
+
+    def _store(self):
+        pid = os.getpid()
+        if self._pid != pid:  # first use, or we are a freshly forked worker
+            with self._lock:
+                if self._pid != pid:
+                    self.directory.mkdir(parents=True, exist_ok=True)
+                    self._values = MmapedDict(self.directory / f"worker-{pid}.db")
+                    self._pid = pid
+        return self._values
+
+    def inc(self, name, labels=None, amount=1.0):
+        self._store().inc(_key(name, labels or {}), amount)
+
+    def observe(self, name, value, labels=None):
+        """Histogram observation: one bucket count plus _sum and _count."""
+        labels = labels or {}
+        buckets = METRICS[name][2]
+        le = next((b for b in buckets if value <= b), "+Inf")
+        store = self._store()
+        store.inc(_key(name + "_bucket", dict(labels, le=str(le))))
+        store.inc(_key(name + "_sum", labels), value)
+        store.inc(_key(name + "_count", labels))
+
+
+_registry = None
+
+
+def get_registry():
+    global _registry
+    if _registry is None:
+        _registry = Registry(settings.BENCH_PROMETHEUS_DIR)
+    return _registry
+
+
+def collect(directory):
+    """Merge every worker file into {(name, labels tuple): value}."""
+    merged = {}
+    for path in sorted(Path(directory).glob("worker-*.db")):
+        try:
+            pid = int(path.stem.split("-", 1)[1])
+            data = path.read_bytes()
+        except (ValueError, OSError):
+            continue
+        alive = None
+        for key, value in read_entries(data):
+            name, labels = json.loads(key)
+            if METRICS.get(name, (None,))[0] == GAUGE:
+                if alive is None:
+                    alive = pid_alive(pid)
+                if not alive:
+                    continue
+            ident = (name, tuple(tuple(pair) for pair in labels))
+            merged[ident] = merged.get(ident, 0.0) + value
+    return merged
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    body = ",".join(
+        '%s="%s"' % (k, str(v).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for k, v in labels
+    )
+    return "{" + body + "}"
+
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render(directory=None):
+    """Prometheus text exposition format (version 0.0.4)."""
+    merged = collect(settings.BENCH_PROMETHEUS_DIR if directory is None else directory)
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind != HISTOGRAM:
+            for (sample, labels), value in sorted(merged.items()):
+                if sample == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+            continue
+
+        series = sorted({labels for sample, labels in merged if sample == name + "_count"})
+        for labels in series:
+            cumulative = 0.0
+            for le in [str(b) for b in buckets] + ["+Inf"]:
+                cumulative += merged.get((name + "_bucket", tuple(sorted(labels + (("le", le),)))), 0.0)
+                lines.append(
+                    f"{name}_bucket{_format_labels(labels + (('le', le),))} {_number(cumulative)}"
+                )
+            lines.append(f"{name}_sum{_format_labels(labels)} {_number(merged[(name + '_sum', labels)])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {_number(merged[(name + '_count', labels)])}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,238 @@
+import re
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import compression, metrics
+
+
+# {"queries": n, "seconds": s} of the request being handled, if any. A
+# ContextVar so the queries the async ORM and sync_to_async run on other
+# threads count towards the request that made them.
+_request_db = ContextVar("request_db", default=None)
+
+
+def time_queries(execute, sql, params, many, context):
+    db = _request_db.get()
+    if db is None:
+        return execute(sql, params, many, context)
+    t0 = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        db["queries"] += 1
+        db["seconds"] += time.perf_counter() - t0
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """
+    connection_created receiver adding time_queries to every connection,
+    in whichever thread opens it.
+    """
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record per-route latency, response size, DB query count/time and
+    in-flight requests into the process-shared metrics registry.
+
+    Keep it first in MIDDLEWARE so the timings cover the whole stack. It is
+    both sync and async capable, so under ASGI it does not force async
+    views onto a thread. Queries are counted by time_queries, which
+    CoreConfig installs on every database connection.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _start(self):
+        registry = metrics.get_registry()
+        db = {"queries": 0, "seconds": 0.0}
+        registry.inc("http_requests_in_flight")
+        return registry, db, _request_db.set(db), time.perf_counter()
+
+    def _finish(self, request, response, registry, db, elapsed):
+        match = getattr(request, "resolver_match", None)
+        route = {"route": "/" + match.route if match else "<unmatched>"}
+        registry.inc("http_requests_total", {
+            **route, "method": request.method, "status": str(response.status_code),
+        })
+        registry.observe("http_request_duration_seconds", elapsed, route)
+        registry.observe("http_request_db_queries", db["queries"], route)
+        registry.inc("db_query_duration_seconds_total", route, db["seconds"])
+        if not response.streaming:
+            registry.observe("http_response_size_bytes", len(response.content), route)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        registry, db, token, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_db.reset(token)
+            registry.inc("http_requests_in_flight", amount=-1)
+        self._finish(request, response, registry, db, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        registry, db, token, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_db.reset(token)
+            registry.inc("http_requests_in_flight", amount=-1)
+        self._finish(request, response, registry, db, time.perf_counter() - start)
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise, made async capable.
+
+    WhiteNoise's middleware is sync only; in the middle of an otherwise
+    async stack it would make Django hop to a thread and back for every
+    request under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestDecompressionMiddleware:
+    """
+    Accept request bodies sent with Content-Encoding (gzip, deflate, and
+    br / zstd when installed), e.g. from CI runners on slow links.
+
+    The body is decoded before any view reads it, up to
+    BENCH_MAX_DECOMPRESSED_BODY bytes (413 beyond); unknown codings get
+    415 and corrupt bodies 400.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _decode(self, request):
+        coding = request.headers.get("Content-Encoding", "")
+        if not coding or coding.strip().lower() == "identity":
+            return None
+        try:
+            body = compression.decompress(
+                request.body, coding, settings.BENCH_MAX_DECOMPRESSED_BODY,
+            )
+        except compression.BodyTooLarge as exc:
+            return JsonResponse({"error": str(exc)}, status=413)
+        except compression.UnsupportedEncoding as exc:
+            response = JsonResponse({"error": f"Unsupported Content-Encoding: {exc}"}, status=415)
+            response["Accept-Encoding"] = ", ".join(compression.DECODERS)
+            return response
+        except ValueError as exc:
+            return JsonResponse({"error": str(exc)}, status=400)
+        request._body = body
+        request.META.pop("HTTP_CONTENT_ENCODING", None)
+        request.META["CONTENT_LENGTH"] = str(len(body))
+        return None
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self._decode(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        # The body is already in memory when the view runs; decoding a few
+        # MB here is cheaper than a thread hop.
+        return self._decode(request) or await self.get_response(request)
+
+
+_COMPRESSIBLE = re.compile(r"^(text/|application/(json|x-ndjson|javascript)|image/svg)")
+
+
+class ResponseCompressionMiddleware:
+    """
+    Compress responses of at least BENCH_COMPRESS_MIN_BYTES with the best
+    coding the client accepts (zstd / br when installed, else gzip).
+
+    Only buffered text/JSON responses are compressed: streams (the SSE feed,
+    exports that gzip themselves, static files served by WhiteNoise) pass
+    through. Like Django's GZipMiddleware, ETags are made weak so 304s keep
+    working across codings.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _compress(self, request, response):
+        if (
+            response.streaming
+            or response.has_header("Content-Encoding")
+            or len(response.content) < settings.BENCH_COMPRESS_MIN_BYTES
+            or not _COMPRESSIBLE.match(response.get("Content-Type", ""))
+        ):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        coding = compression.negotiate(request.headers.get("Accept-Encoding"))
+        if coding is None:
+            return response
+        compressed = compression.ENCODERS[coding](response.content)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = coding
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self._compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._compress(request, await self.get_response(request))
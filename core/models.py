@@ -1,5 +1,7 @@
 from django.db import models
 
+# Legacy table: bench.Metric is the canonical store (it also carries APP_LAT);
+# copy old rows over with `manage.py backfill_cicd_runs`.
 class CICDRun(models.Model):
     # When the record was ingested
     timestamp = models.DateTimeField(auto_now_add=True)
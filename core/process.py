@@ -0,0 +1,14 @@
+"""Helpers for state shared between the worker processes of one host."""
+
+import os
+
+
+def pid_alive(pid):
+    """Whether a process ``pid`` exists (possibly owned by another user)."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
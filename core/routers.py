@@ -0,0 +1,83 @@
+"""
+Send the reads of selected views to the read-only "read" database alias.
+
+The alias is a second connection to the same SQLite file opened with
+``PRAGMA query_only``; in WAL mode its reads see the last committed data
+and never wait for (or hold up) an ingest transaction on "default".
+Views opt in with ``@uses_read_db``; everything else, and any read made
+while "default" is inside a transaction, stays on "default" so it sees
+its own uncommitted writes.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.db import DEFAULT_DB_ALIAS, connections
+
+READ_ALIAS = "read"
+
+_read_db = ContextVar("read_db", default=False)
+
+
+@contextmanager
+def read_db():
+    """Route the ORM reads made inside the block to READ_ALIAS."""
+    token = _read_db.set(True)
+    try:
+        yield
+    finally:
+        _read_db.reset(token)
+
+
+def uses_read_db(view):
+    """
+    Run ``view`` (sync or async) inside read_db().
+
+    Querysets evaluated after the view returns (streaming responses) are
+    outside the block; bind those with ``.using(read_alias())``.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            with read_db():
+                return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with read_db():
+                return view(request, *args, **kwargs)
+    return wrapper
+
+
+def _read_alias_usable():
+    if READ_ALIAS not in connections.settings:
+        return False
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return False
+    # A shared in-memory database (the test database) has table locks
+    # instead of WAL; a second connection would only add SQLITE_LOCKED.
+    return not connections[READ_ALIAS].is_in_memory_db()
+
+
+def read_alias():
+    """The alias reads should use right now (READ_ALIAS or "default")."""
+    return READ_ALIAS if _read_db.get() and _read_alias_usable() else DEFAULT_DB_ALIAS
+
+
+class ReadDatabaseRouter:
+    def db_for_read(self, model, **hints):
+        if _read_db.get() and _read_alias_usable():
+            return READ_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database file
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != READ_ALIAS
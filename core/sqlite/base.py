@@ -0,0 +1,41 @@
+"""
+SQLite backend for several worker processes writing at once.
+
+Backports two SQLite OPTIONS of Django 5.1 to the pinned 5.0:
+
+* ``init_command`` - ";"-separated statements run on every new connection
+  (the journal/cache pragmas in settings.DATABASES).
+* ``transaction_mode`` - "IMMEDIATE" makes atomic() take the write lock at
+  BEGIN. With the default deferred BEGIN a transaction that reads first
+  and then writes (every ingest does) has to upgrade its lock mid-way,
+  and SQLite fails that upgrade with "database is locked" right away
+  instead of waiting out the busy timeout.
+
+Drop this module and point ENGINE back at django.db.backends.sqlite3 when
+moving to Django 5.1.
+"""
+
+from django.db.backends.sqlite3 import base
+
+# Handled here rather than passed on to sqlite3.connect()
+_BACKPORTED_OPTIONS = ("init_command", "transaction_mode")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        for name in _BACKPORTED_OPTIONS:
+            kwargs.pop(name, None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        init_command = self.settings_dict["OPTIONS"].get("init_command")
+        for statement in (init_command or "").split(";"):
+            if statement.strip():
+                conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict["OPTIONS"].get("transaction_mode")
+        self.cursor().execute(f"BEGIN {mode}" if mode else "BEGIN")
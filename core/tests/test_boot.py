@@ -0,0 +1,65 @@
+import json
+import sqlite3
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.management import call_command
+
+from core import boot
+
+
+def fake_settings(tmp_path, monkeypatch):
+    app = tmp_path / "src" / "bootapp"
+    (app / "migrations").mkdir(parents=True)
+    (app / "static" / "bootapp").mkdir(parents=True)
+    (app / "__init__.py").write_text("")
+    (app / "apps.py").write_text("")
+    (app / "migrations" / "0001_initial.py").write_text("operations = []\n")
+    (app / "static" / "bootapp" / "app.css").write_text("body {}\n")
+    monkeypatch.syspath_prepend(str(tmp_path / "src"))
+    static_root = tmp_path / "static_root"
+    static_root.mkdir()
+    return app, SimpleNamespace(
+        INSTALLED_APPS=[*settings.INSTALLED_APPS, "bootapp.apps.BootappConfig"],
+        STORAGES=settings.STORAGES,
+        STATICFILES_DIRS=[],
+        STATIC_ROOT=static_root,
+        DATABASES={"default": {"ENGINE": "core.sqlite", "NAME": tmp_path / "db.sqlite3"}},
+    )
+
+
+def test_steps_rerun_only_when_their_inputs_change(tmp_path, monkeypatch):
+    app, fake = fake_settings(tmp_path, monkeypatch)
+    assert boot.app_dirs(fake.INSTALLED_APPS)[-1] == app
+    assert set(boot.pending(fake)) == {"migrate", "collectstatic"}  # fresh volume
+
+    sqlite3.connect(tmp_path / "db.sqlite3").close()
+    (fake.STATIC_ROOT / "staticfiles.json").write_text("{}")
+    fingerprints = boot.fingerprints(fake)
+    boot.write_db_stamp(tmp_path / "db.sqlite3", fingerprints["migrate"])
+    boot.write_static_stamp(fake.STATIC_ROOT, fingerprints["collectstatic"])
+    assert boot.pending(fake) == {}
+
+    (app / "migrations" / "0002_more.py").write_text("operations = []\n")
+    assert list(boot.pending(fake)) == ["migrate"]
+    (app / "migrations" / "0002_more.py").unlink()
+
+    (app / "static" / "bootapp" / "app.css").write_text("body { margin: 0 }\n")
+    assert list(boot.pending(fake)) == ["collectstatic"]
+
+    (app / "static" / "bootapp" / "app.css").write_text("body {}\n")
+    (fake.STATIC_ROOT / "staticfiles.json").unlink()
+    assert list(boot.pending(fake)) == ["collectstatic"]  # STATIC_ROOT was wiped
+
+
+def test_boot_profile_command(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("BENCH_DB_PATH", str(tmp_path / "db.sqlite3"))
+    call_command("boot_profile", "--dry-run")
+    report = json.loads(capsys.readouterr().out)
+    assert list(report["phases_ms"]) == [
+        "interpreter", "settings", "fingerprint", "django_setup",
+        "wsgi_application", "urlconf", "first_request",
+    ]
+    assert report["steps"]["migrate"] == "pending"
+    assert report["first_request_status"] == 200
+    assert not (tmp_path / "db.sqlite3").exists()
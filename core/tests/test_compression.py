@@ -0,0 +1,72 @@
+import gzip
+import json
+import zlib
+
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, override_settings
+
+from bench.models import Metric
+from core import compression
+
+KEY = {"HTTP_X_BENCH_KEY": settings.BENCH_API_KEY}
+
+
+def post(body, encoding, url="/api/metrics/ingest/batch"):
+    return Client().post(url, data=body, content_type="application/x-ndjson",
+                         HTTP_CONTENT_ENCODING=encoding, **KEY)
+
+
+@pytest.mark.django_db
+def test_compressed_ingest_bodies():
+    rows = "".join(json.dumps({"source": "jenkins", "run_id": str(i), "prt": i}) + "\n"
+                   for i in range(50)).encode()
+    assert post(gzip.compress(rows), "gzip").json()["stored"] == 50
+    assert post(zlib.compress(rows.replace(b'"jenkins"', b'"github"')), "deflate").json()["stored"] == 50
+    assert Metric.objects.count() == 100
+
+    single = gzip.compress(json.dumps({"source": "github", "lce": 5}).encode())
+    resp = Client().post("/api/metrics/ingest", data=single, content_type="application/json",
+                         HTTP_CONTENT_ENCODING="gzip", **KEY)
+    assert resp.json()["status"] == "stored"
+
+
+@pytest.mark.django_db
+@override_settings(BENCH_MAX_DECOMPRESSED_BODY=10_000)
+def test_bad_compressed_bodies_are_rejected():
+    bomb = gzip.compress(b"\n" * 1_000_000)  # ~1 KB that inflates to 1 MB
+    assert len(bomb) < 10_000 and post(bomb, "gzip").status_code == 413
+    assert post(gzip.compress(b"{}")[:-4], "gzip").status_code == 400
+    unsupported = post(b"{}", "compress")
+    assert unsupported.status_code == 415 and "gzip" in unsupported["Accept-Encoding"]
+    assert Metric.objects.count() == 0
+
+
+def test_negotiate_respects_q_values():
+    assert compression.negotiate("gzip, deflate") == "gzip"
+    assert compression.negotiate("gzip;q=0, identity") is None
+    assert compression.negotiate("*") == next(iter(compression.ENCODERS))
+    assert compression.negotiate("") is None
+
+
+@pytest.mark.django_db
+def test_large_json_responses_are_compressed():
+    cache.clear()
+    Metric.objects.bulk_create(Metric(source="github", layer_cache_efficiency=i) for i in range(100))
+    c = Client()
+
+    plain = c.get("/api/metrics/data", {"source": "github"})
+    assert "Content-Encoding" not in plain and plain["Vary"].endswith("Accept-Encoding")
+
+    packed = c.get("/api/metrics/data", {"source": "github"}, HTTP_ACCEPT_ENCODING="gzip, br;q=0")
+    assert packed["Content-Encoding"] == "gzip"
+    assert len(packed.content) < len(plain.content) / 3
+    assert gzip.decompress(packed.content) == plain.content
+    assert packed["ETag"] == "W/" + plain["ETag"]
+    again = c.get("/api/metrics/data", {"source": "github"}, HTTP_ACCEPT_ENCODING="gzip",
+                  HTTP_IF_NONE_MATCH=packed["ETag"])
+    assert again.status_code == 304
+
+    # Small responses are left alone
+    assert "Content-Encoding" not in c.get("/health", HTTP_ACCEPT_ENCODING="gzip")
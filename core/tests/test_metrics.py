@@ -0,0 +1,84 @@
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import AsyncClient, Client
+
+from core import metrics
+
+DEAD_PID = 2**22 + 12345  # above the default pid_max, never alive
+
+
+@pytest.fixture
+def registry(settings, tmp_path, monkeypatch):
+    settings.BENCH_PROMETHEUS_DIR = tmp_path
+    reg = metrics.Registry(tmp_path)
+    monkeypatch.setattr(metrics, "_registry", reg)
+    return reg
+
+
+def test_mmaped_dict_grows_and_reopens(tmp_path):
+    path = tmp_path / "worker-1.db"
+    d = metrics.MmapedDict(path)
+    for i in range(3000):  # forces several resizes past the initial 64 KiB
+        d.inc(f"key-{i}", i)
+    d.inc("key-7", 0.5)
+    d.close()
+
+    reopened = metrics.MmapedDict(path)
+    reopened.inc("key-7", 1)
+    values = dict(metrics.read_entries(path.read_bytes()))
+    assert len(values) == 3000
+    assert values["key-7"] == 8.5
+    assert values["key-2999"] == 2999
+
+
+def test_collect_sums_workers_and_drops_dead_gauges(tmp_path):
+    for pid in (DEAD_PID, DEAD_PID + 1):
+        d = metrics.MmapedDict(tmp_path / f"worker-{pid}.db")
+        d.inc(metrics._key("http_requests_total", {"route": "/x"}), 2)
+        d.inc(metrics._key("http_requests_in_flight", {}), 1)
+        d.close()
+    live = metrics.Registry(tmp_path)
+    live.inc("http_requests_total", {"route": "/x"})
+    live.inc("http_requests_in_flight")
+
+    merged = metrics.collect(tmp_path)
+    assert merged[("http_requests_total", (("route", "/x"),))] == 5
+    assert merged[("http_requests_in_flight", ())] == 1
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_exposes_request_metrics(registry):
+    c = Client()
+    c.get("/health")
+    c.get("/api/metrics/data")
+    body = c.get("/metrics").content.decode()
+
+    assert 'http_requests_total{method="GET",route="/health",status="200"} 1' in body
+    assert 'http_request_duration_seconds_count{route="/api/metrics/data"} 1' in body
+    assert 'http_request_duration_seconds_bucket{route="/health",le="+Inf"} 1' in body
+    assert 'http_request_db_queries_bucket{route="/health",le="0"} 1' in body
+    # The /metrics request itself is still in flight while rendering.
+    assert "http_requests_in_flight 1" in body
+
+
+@pytest.mark.django_db(transaction=True)
+def test_db_queries_are_counted_under_asgi(registry, settings):
+    settings.BENCH_API_KEYS = {"k": "ci"}
+    # The async ORM runs queries on another thread than the middleware
+    async def requests():
+        c = AsyncClient()
+        await c.get("/api/metrics/data")
+        await c.post(
+            "/api/metrics/ingest", data=json.dumps({"source": "github", "lce": 1}),
+            content_type="application/json", headers={"X-Bench-Key": "k"},
+        )
+
+    cache.clear()
+    async_to_sync(requests)()
+    merged = metrics.collect(registry.directory)
+    for route in ("/api/metrics/data", "/api/metrics/ingest"):
+        queries = merged[("http_request_db_queries_sum", (("route", route),))]
+        assert queries > 0, route
@@ -0,0 +1,93 @@
+import sqlite3
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from bench.models import Metric
+from core.routers import READ_ALIAS, ReadDatabaseRouter, read_alias, read_db, uses_read_db
+from core.sqlite.base import DatabaseWrapper
+
+
+def open_db(alias, path):
+    settings_dict = {**connections[alias].settings_dict, "NAME": str(path)}
+    wrapper = DatabaseWrapper(settings_dict, alias=f"test_{alias}")
+    wrapper.ensure_connection()
+    return wrapper
+
+
+def pragma(wrapper, name):
+    return wrapper.connection.execute(f"PRAGMA {name}").fetchone()[0]
+
+
+@pytest.mark.django_db
+def test_connections_get_wal_pragmas_and_read_alias_is_read_only(tmp_path):
+    path = tmp_path / "db.sqlite3"
+    writer = open_db(DEFAULT_DB_ALIAS, path)
+    reader = open_db(READ_ALIAS, path)
+    try:
+        assert pragma(writer, "journal_mode") == "wal"
+        assert pragma(writer, "synchronous") == 1  # NORMAL
+        assert pragma(writer, "busy_timeout") == 20000
+        assert pragma(writer, "temp_store") == 2  # MEMORY
+        writer.connection.execute("CREATE TABLE t (x)")
+
+        assert pragma(reader, "query_only") == 1
+        assert reader.connection.execute("SELECT count(*) FROM t").fetchone() == (0,)
+        with pytest.raises(sqlite3.OperationalError):
+            reader.connection.execute("INSERT INTO t VALUES (1)")
+    finally:
+        writer.close()
+        reader.close()
+
+
+@pytest.mark.django_db
+def test_transactions_take_the_write_lock_at_begin(tmp_path):
+    path = tmp_path / "db.sqlite3"
+    writer = open_db(DEFAULT_DB_ALIAS, path)
+    try:
+        writer._start_transaction_under_autocommit()
+        # Nothing written yet, but another writer already has to wait
+        with sqlite3.connect(path, timeout=0) as other, pytest.raises(sqlite3.OperationalError):
+            other.execute("BEGIN IMMEDIATE")
+        writer.connection.execute("ROLLBACK")
+    finally:
+        writer.close()
+
+
+def test_router_sends_opted_in_reads_to_read_alias(tmp_path, monkeypatch):
+    router = ReadDatabaseRouter()
+    monkeypatch.setitem(connections[READ_ALIAS].settings_dict, "NAME", str(tmp_path / "db.sqlite3"))
+
+    assert router.db_for_read(Metric) is None
+    with read_db():
+        assert router.db_for_read(Metric) == READ_ALIAS
+    assert router.db_for_write(Metric) == DEFAULT_DB_ALIAS
+    assert router.allow_migrate(READ_ALIAS, "bench") is False
+
+    @uses_read_db
+    def view(request):
+        return read_alias()
+
+    @uses_read_db
+    async def async_view(request):
+        return read_alias()
+
+    assert view(None) == READ_ALIAS
+    assert async_to_sync(async_view)(None) == READ_ALIAS
+    assert read_alias() == DEFAULT_DB_ALIAS
+
+
+@pytest.mark.django_db
+def test_router_keeps_reads_on_default_inside_transactions(tmp_path, monkeypatch):
+    monkeypatch.setitem(connections[READ_ALIAS].settings_dict, "NAME", str(tmp_path / "db.sqlite3"))
+    # The test runs inside a transaction on "default"
+    with read_db():
+        assert read_alias() == DEFAULT_DB_ALIAS
+        assert ReadDatabaseRouter().db_for_read(Metric) is None
+
+
+def test_router_ignores_read_alias_on_in_memory_database():
+    # The test database is a shared in-memory one
+    with read_db():
+        assert read_alias() == DEFAULT_DB_ALIAS
@@ -1,7 +1,13 @@
 from django.http import JsonResponse, HttpResponse
 
+from . import metrics
+
 def health(request):
     return JsonResponse({"status": "ok"})
 
 def index(request):
     return HttpResponse("Django app is running.")
+
+def prometheus_metrics(request):
+    """Request metrics of all workers in Prometheus text format."""
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,11 +1,48 @@
 #!/bin/sh
 set -e
 
-echo "Running database migrations..."
-python manage.py migrate --noinput
+# BENCH_FAST_BOOT=1 (default) runs migrate / collectstatic only when the
+# migrations or static files changed since they last ran (core.boot).
+if [ "${BENCH_FAST_BOOT:-1}" = "1" ]; then
+  echo "Checking migrations and static files..."
+  python -m core.boot
+else
+  echo "Running database migrations..."
+  python manage.py migrate --noinput
 
-echo "Collecting static files..."
-python manage.py collectstatic --noinput
+  echo "Collecting static files..."
+  python manage.py collectstatic --noinput
+fi
+
+# Request metrics are per boot; drop files left by previous workers.
+rm -rf "${BENCH_PROMETHEUS_DIR:-/tmp/cicdbench-prometheus}"
+# Same for the ingest rate limiter state (bench.ratelimit).
+rm -f "${BENCH_RATELIMIT_PATH:-/tmp/cicdbench-ratelimit}"
+
+if [ "${BENCH_INGEST_SPOOL:-0}" = "1" ]; then
+  echo "Starting ingest spool drain worker..."
+  python manage.py drain_ingest_spool &
+fi
+
+# BENCH_SERVER=asgi runs the same gunicorn with uvicorn workers, so the async
+# views (and the /api/metrics/stream live feed) run on an event loop.
+WORKERS="${BENCH_WORKERS:-1}"
+# Idempotency-Key replays (and cached responses) must be visible to every
+# worker, which a per-process LocMemCache is not: share a file-based cache.
+if [ "$WORKERS" -gt 1 ] && [ -z "${BENCH_CACHE_DIR:-}" ]; then
+  export BENCH_CACHE_DIR=/tmp/cicdbench-cache
+fi
+# Load the app once in the master and fork the workers from it, instead of
+# every worker importing Django on its own. BENCH_PRELOAD=0 turns it off.
+PRELOAD="--preload"
+if [ "${BENCH_PRELOAD:-1}" = "0" ]; then
+  PRELOAD=""
+fi
+if [ "${BENCH_SERVER:-wsgi}" = "asgi" ]; then
+  echo "Starting Gunicorn (ASGI, uvicorn workers)..."
+  exec gunicorn webapp.asgi:application -k uvicorn.workers.UvicornWorker \
+    --workers "$WORKERS" --bind 0.0.0.0:8000 $PRELOAD
+fi
 
 echo "Starting Gunicorn..."
-gunicorn webapp.wsgi:application --bind 0.0.0.0:8000
+gunicorn webapp.wsgi:application --workers "$WORKERS" --bind 0.0.0.0:8000 $PRELOAD
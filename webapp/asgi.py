@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'webapp.settings')
 
 application = get_asgi_application()
+
+# Load the URLconf and views now, not on the first request; under
+# gunicorn --preload that is once, in the master (see core.boot).
+from core.boot import warm  # noqa: E402
+
+warm()
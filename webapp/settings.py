@@ -5,6 +5,7 @@ Generated by 'django-admin startproject' using Django 5.1.7.
 
 from pathlib import Path
 import os
+import tempfile
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -52,9 +53,14 @@ INSTALLED_APPS = [
 # Middleware
 # -----------------------------------------------------------------------------
 MIDDLEWARE = [
+    # Outermost so request timings cover the whole stack
+    "core.middleware.RequestMetricsMiddleware",
+    # Before anything that reads or modifies the response body
+    "core.middleware.ResponseCompressionMiddleware",
+    "core.middleware.RequestDecompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    # WhiteNoise should be right after SecurityMiddleware
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # WhiteNoise (async-capable wrapper) should be right after SecurityMiddleware
+    "core.middleware.StaticFilesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -92,10 +98,48 @@ WSGI_APPLICATION = "webapp.wsgi.application"
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "NAME": os.environ.get("BENCH_DB_PATH", BASE_DIR / "db.sqlite3"),
     }
 }
 
+# Several gunicorn workers write to the same file: WAL (readers and the
+# writer don't block each other), write locks taken at BEGIN and waited for
+# up to BENCH_SQLITE_BUSY_TIMEOUT seconds, and a read-only "read" alias for
+# the dashboard reads (core.routers). BENCH_SQLITE_TUNING=0 runs the stock
+# setup; manage.py compare_sqlite_modes benchmarks one against the other.
+BENCH_SQLITE_TUNING = os.environ.get("BENCH_SQLITE_TUNING", "1") == "1"
+if BENCH_SQLITE_TUNING:
+    _SQLITE_PRAGMAS = (
+        "PRAGMA synchronous = NORMAL;"  # WAL is still crash-safe; only fsyncs at checkpoints
+        "PRAGMA cache_size = -32768;"  # KiB
+        "PRAGMA mmap_size = 268435456;"
+        "PRAGMA temp_store = MEMORY"
+    )
+    _SQLITE_BUSY_TIMEOUT = float(os.environ.get("BENCH_SQLITE_BUSY_TIMEOUT", "20"))
+    DATABASES["default"].update(
+        ENGINE="core.sqlite",
+        # Persistent connections are per thread; under ASGI every request
+        # gets a new thread, so they would only pile up there.
+        CONN_MAX_AGE=int(os.environ.get(
+            "BENCH_DB_CONN_MAX_AGE", "0" if os.environ.get("BENCH_SERVER") == "asgi" else "300",
+        )),
+        CONN_HEALTH_CHECKS=True,
+        OPTIONS={
+            "timeout": _SQLITE_BUSY_TIMEOUT,
+            "transaction_mode": "IMMEDIATE",
+            "init_command": "PRAGMA journal_mode = WAL;" + _SQLITE_PRAGMAS,
+        },
+    )
+    DATABASES["read"] = {
+        **DATABASES["default"],
+        "OPTIONS": {
+            "timeout": _SQLITE_BUSY_TIMEOUT,
+            "init_command": _SQLITE_PRAGMAS + ";PRAGMA query_only = ON",
+        },
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_ROUTERS = ["core.routers.ReadDatabaseRouter"]
+
 # -----------------------------------------------------------------------------
 # Password validation
 # -----------------------------------------------------------------------------
@@ -131,3 +175,105 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # -----------------------------------------------------------------------------
 # Your ingest auth key; use env in production
 BENCH_API_KEY = os.environ.get("BENCH_API_KEY", "dev-secret-key-change-me")
+
+# More ingest keys, one per pipeline: BENCH_API_KEYS="github-ci:<secret>,
+# jenkins:<secret>" (BENCH_API_KEY is the key named "default"). Maps
+# secret -> name; the name is what rate limits and metrics refer to.
+BENCH_API_KEYS = dict(
+    reversed(item.strip().split(":", 1))
+    for item in os.environ.get("BENCH_API_KEYS", "").split(",") if ":" in item
+)
+if BENCH_API_KEY:
+    BENCH_API_KEYS[BENCH_API_KEY] = "default"
+
+# Ingest throttling (bench.ratelimit): per-key token buckets as
+# "name=<requests per second>/<burst>" ("*" for the other keys; unset =
+# unlimited), then load shedding once this many writes run across all
+# workers or recent writes averaged over BENCH_INGEST_MAX_WRITE_MS (0 = off).
+# The state is shared by all gunicorn workers through this file.
+BENCH_INGEST_RATE_LIMITS = {
+    name.strip(): tuple(float(value) for value in spec.split("/", 1))
+    for name, spec in (
+        item.split("=", 1) for item in os.environ.get("BENCH_INGEST_RATE_LIMITS", "").split(",") if "=" in item
+    )
+}
+BENCH_INGEST_MAX_IN_FLIGHT = int(os.environ.get("BENCH_INGEST_MAX_IN_FLIGHT", "64"))
+BENCH_INGEST_MAX_WRITE_MS = float(os.environ.get("BENCH_INGEST_MAX_WRITE_MS", "0"))
+BENCH_RATELIMIT_PATH = Path(
+    os.environ.get("BENCH_RATELIMIT_PATH", Path(tempfile.gettempdir()) / "cicdbench-ratelimit")
+)
+
+# Batch ingest (/api/metrics/ingest/batch)
+BENCH_INGEST_BATCH_MAX_ROWS = int(os.environ.get("BENCH_INGEST_BATCH_MAX_ROWS", "5000"))
+BENCH_INGEST_BATCH_CHUNK = int(os.environ.get("BENCH_INGEST_BATCH_CHUNK", "500"))
+
+# Ingest spool: when enabled, api_ingest appends payloads to local segment
+# files and returns 202; `manage.py drain_ingest_spool` loads them into the DB.
+BENCH_INGEST_SPOOL = os.environ.get("BENCH_INGEST_SPOOL", "0") == "1"
+BENCH_INGEST_SPOOL_DIR = Path(os.environ.get("BENCH_INGEST_SPOOL_DIR", BASE_DIR / "spool"))
+BENCH_INGEST_SPOOL_SEGMENT_BYTES = int(os.environ.get("BENCH_INGEST_SPOOL_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+BENCH_INGEST_SPOOL_COMMIT_DELAY_MS = float(os.environ.get("BENCH_INGEST_SPOOL_COMMIT_DELAY_MS", "2"))
+
+# Cache for the metrics read APIs and Idempotency-Key replays. LocMemCache
+# is per process: an ingest still invalidates the responses cached by every
+# worker (the data version is kept in BENCH_CACHE_VERSION_PATH), but each
+# worker computes its own copy. Set BENCH_CACHE_DIR to share a file-based
+# cache between gunicorn workers.
+if os.environ.get("BENCH_CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ["BENCH_CACHE_DIR"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+BENCH_METRICS_CACHE_TTL = int(os.environ.get("BENCH_METRICS_CACHE_TTL", "300"))
+BENCH_CACHE_VERSION_PATH = Path(
+    os.environ.get("BENCH_CACHE_VERSION_PATH", Path(tempfile.gettempdir()) / "cicdbench-cache-version")
+)
+
+# Per-worker metric files for the /metrics endpoint. All gunicorn workers must
+# share this directory; entrypoint.sh clears it on container start.
+BENCH_PROMETHEUS_DIR = Path(
+    os.environ.get("BENCH_PROMETHEUS_DIR", Path(tempfile.gettempdir()) / "cicdbench-prometheus")
+)
+
+# Live dashboard feed (/api/metrics/stream, ASGI only): how often each worker
+# polls for new rows, and the keep-alive interval for idle connections.
+BENCH_LIVE_POLL_INTERVAL = float(os.environ.get("BENCH_LIVE_POLL_INTERVAL", "1"))
+BENCH_LIVE_HEARTBEAT = float(os.environ.get("BENCH_LIVE_HEARTBEAT", "15"))
+
+# Regression detection (bench.regressions): EWMA weight of each new run,
+# z-score that flags a single run, CUSUM slack/threshold (in standard
+# deviations) for sustained shifts, and runs seen before scoring starts.
+BENCH_REGRESSION_ALPHA = float(os.environ.get("BENCH_REGRESSION_ALPHA", "0.05"))
+BENCH_REGRESSION_Z = float(os.environ.get("BENCH_REGRESSION_Z", "3"))
+BENCH_REGRESSION_CUSUM_K = float(os.environ.get("BENCH_REGRESSION_CUSUM_K", "0.5"))
+BENCH_REGRESSION_CUSUM_H = float(os.environ.get("BENCH_REGRESSION_CUSUM_H", "5"))
+BENCH_REGRESSION_WARMUP = int(os.environ.get("BENCH_REGRESSION_WARMUP", "20"))
+
+# How long a response is replayed for retries with the same Idempotency-Key.
+# Needs a shared cache (BENCH_CACHE_DIR) so retries landing on another worker
+# are recognised too; entrypoint.sh sets one when BENCH_WORKERS > 1.
+BENCH_IDEMPOTENCY_TTL = int(os.environ.get("BENCH_IDEMPOTENCY_TTL", str(24 * 3600)))
+
+# Compressed transport (core.compression): largest request body accepted
+# after undoing its Content-Encoding, and smallest response worth compressing.
+BENCH_MAX_DECOMPRESSED_BODY = int(os.environ.get("BENCH_MAX_DECOMPRESSED_BODY", str(16 * 1024 * 1024)))
+BENCH_COMPRESS_MIN_BYTES = int(os.environ.get("BENCH_COMPRESS_MIN_BYTES", "1024"))
+
+# Retention (manage.py compact_metrics): days of raw rows to keep per source,
+# e.g. BENCH_RETENTION_DAYS="github=90,jenkins=30,*=365" ("*" for the other
+# sources; unset keeps everything). Older rows move to columnar files here.
+BENCH_RETENTION_DAYS = {
+    source.strip(): int(days)
+    for source, days in (
+        item.split("=", 1) for item in os.environ.get("BENCH_RETENTION_DAYS", "").split(",") if "=" in item
+    )
+}
+BENCH_ARCHIVE_DIR = Path(os.environ.get("BENCH_ARCHIVE_DIR", BASE_DIR / "archive"))
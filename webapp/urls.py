@@ -2,7 +2,7 @@
 
 from django.contrib import admin
 from django.urls import path, include
-from core.views import health, index
+from core.views import health, index, prometheus_metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -10,6 +10,7 @@ urlpatterns = [
     # Core endpoints
     path("health", health),   # /health
     path("hello", index),     # /hello
+    path("metrics", prometheus_metrics),  # /metrics (Prometheus)
 
     # Bench app (dashboard + metrics APIs)
     path("", include("bench.urls")),
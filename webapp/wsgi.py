@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'webapp.settings')
 
 application = get_wsgi_application()
+
+# Load the URLconf and views now, not on the first request; under
+# gunicorn --preload that is once, in the master (see core.boot).
+from core.boot import warm  # noqa: E402
+
+warm()